@@ -3,6 +3,11 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Run it with uvicorn workers, e.g.
+    uvicorn config.asgi:application --workers 4
+or under gunicorn:
+    gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -12,5 +17,11 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Serve the read-heavy pages with the async views, see SCRAPBOOK_ASYNC_VIEWS
+os.environ.setdefault('SCRAPBOOK_ASYNC_VIEWS', 'True')
+# Django 4.2 does not reliably close connections opened in sync_to_async
+# threads at the end of a request (ticket #33497), so persistent ones would
+# pile up; open a connection per request instead, see DATABASE_CONN_MAX_AGE
+os.environ.setdefault('DATABASE_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -75,7 +75,9 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'scrapbook.middleware.WhiteNoiseMiddleware',
+    'scrapbook.timing.ServerTimingMiddleware',
+    'scrapbook.routers.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -89,7 +91,7 @@ ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'scrapbook.timing.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -116,11 +118,59 @@ if 'test' in sys.argv:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
-        }
+            # A file rather than the in-memory default, so tests can open
+            # several connections at once (see ConcurrentSlugTest)
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+        },
+        # Stands in for a read replica in the routing tests
+        'replica': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'TEST': {'MIRROR': 'default'},
+        },
     }
+    SCRAPBOOK_REPLICAS = []
 else:
     DATABASES = {
         'default': dj_database_url.parse(os.environ.get('DATABASE_URL'))}
+    # Read replicas, as a comma-separated list of database URLs. Safe
+    # reads of the public and detail pages are spread over them (see
+    # scrapbook.routers). Locally, two SQLite files will do, e.g.
+    # DATABASE_URL=sqlite:///primary.sqlite3 and
+    # DATABASE_REPLICA_URLS=sqlite:///replica.sqlite3, with the replica a
+    # copy of the migrated primary.
+    SCRAPBOOK_REPLICAS = []
+    for number, url in enumerate(filter(None, os.environ.get(
+            'DATABASE_REPLICA_URLS', '').split(',')), 1):
+        DATABASES[f'replica{number}'] = dj_database_url.parse(url.strip())
+        SCRAPBOOK_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['scrapbook.routers.ReplicaRouter']
+
+# Seconds a client keeps reading from the primary after a write, so it
+# sees its own changes while the replicas catch up.
+SCRAPBOOK_REPLICA_PIN_SECONDS = int(
+    os.environ.get('SCRAPBOOK_REPLICA_PIN_SECONDS', 10))
+
+# Database connections are kept open between requests for
+# DATABASE_CONN_MAX_AGE seconds (0 opens one per request) and, with
+# DATABASE_CONN_HEALTH_CHECKS, checked before their first use in a request
+# so a connection dropped by the server is replaced instead of failing the
+# request. Set DATABASE_POOLER=pgbouncer when DATABASE_URL points at
+# PgBouncer in transaction pooling mode, which shares a few server
+# connections between all workers; server-side cursors do not work there.
+DATABASE_CONN_MAX_AGE = int(os.environ.get('DATABASE_CONN_MAX_AGE', 60))
+DATABASE_CONN_HEALTH_CHECKS = (
+    os.environ.get('DATABASE_CONN_HEALTH_CHECKS', 'True') == 'True')
+DATABASE_POOLER = os.environ.get('DATABASE_POOLER', '')
+
+for database in DATABASES.values():
+    database.update({
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': DATABASE_CONN_HEALTH_CHECKS,
+    })
+    if DATABASE_POOLER == 'pgbouncer':
+        database['DISABLE_SERVER_SIDE_CURSORS'] = True
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -177,11 +227,112 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static'), ]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Uploaded files, used by the local image storage backend. Outside DEBUG the
+# site does not serve them: point the web server or a CDN at MEDIA_ROOT.
+MEDIA_URL = os.environ.get('MEDIA_URL', '/media/')
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache used for card fragments and shared access sets. Defaults to an
+# in-process LocMem cache; point CACHE_BACKEND and CACHE_LOCATION at a
+# shared backend such as Redis or Memcached when running several workers.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'remineez'),
+    }
+}
+
+# Seconds to keep rendered scrapbook and post cards in the cache.
+SCRAPBOOK_CARD_CACHE_TIMEOUT = int(
+    os.environ.get('SCRAPBOOK_CARD_CACHE_TIMEOUT', 3600))
+
+# Seconds to cache whole pages of the public feed and public detail pages
+# for anonymous visitors. 0 disables the page cache; it is also disabled
+# in tests, which share one LocMem cache across test cases.
+SCRAPBOOK_PAGE_CACHE_TIMEOUT = 0 if 'test' in sys.argv else int(
+    os.environ.get('SCRAPBOOK_PAGE_CACHE_TIMEOUT', 300))
+
+# Image ingest. Uploads of up to SCRAPBOOK_MAX_UPLOAD_SIZE bytes are
+# accepted, downscaled to SCRAPBOOK_IMAGE_MAX_EDGE pixels on the longest
+# edge and re-encoded as SCRAPBOOK_IMAGE_FORMAT (WEBP or JPEG) without
+# EXIF data before they are stored.
+SCRAPBOOK_MAX_UPLOAD_SIZE = int(
+    os.environ.get('SCRAPBOOK_MAX_UPLOAD_SIZE', 20 * 1024 * 1024))
+SCRAPBOOK_IMAGE_MAX_EDGE = int(
+    os.environ.get('SCRAPBOOK_IMAGE_MAX_EDGE', 2048))
+SCRAPBOOK_IMAGE_FORMAT = os.environ.get('SCRAPBOOK_IMAGE_FORMAT', 'WEBP')
+SCRAPBOOK_IMAGE_QUALITY = int(os.environ.get('SCRAPBOOK_IMAGE_QUALITY', 82))
+
+# Widths of the smaller renditions stored alongside each image, used to
+# build the srcset of scrapbook and post cards.
+SCRAPBOOK_IMAGE_RENDITIONS = {'thumb': 480, 'medium': 1024}
+
+# Where scrapbook and post images are stored: 'cloudinary', 'local' (files
+# under MEDIA_ROOT, served from MEDIA_URL) or the dotted path of a Storage
+# class.
+SCRAPBOOK_IMAGE_STORAGE = os.environ.get(
+    'SCRAPBOOK_IMAGE_STORAGE', 'cloudinary')
+
+# Seconds to cache each user's shares in a scrapbook across requests.
+# 0 disables the cache; entries are invalidated when SharedAccess changes.
+SCRAPBOOK_ACCESS_CACHE_TIMEOUT = int(
+    os.environ.get('SCRAPBOOK_ACCESS_CACHE_TIMEOUT', 0))
+
+# Use keyset (cursor) pagination for every scrapbook and post listing.
+# Individual requests can also opt in with a ?cursor= query parameter.
+SCRAPBOOK_CURSOR_PAGINATION = (
+    os.environ.get('SCRAPBOOK_CURSOR_PAGINATION', 'False') == 'True')
+
+# Most users returned by one search of the share form's recipient typeahead.
+SCRAPBOOK_RECIPIENT_LIMIT = int(
+    os.environ.get('SCRAPBOOK_RECIPIENT_LIMIT', 10))
+
+# Background jobs, run by `python manage.py run_jobs`. Failed jobs are
+# retried after SCRAPBOOK_JOB_RETRY_DELAY seconds, doubling each time, and
+# jobs running for longer than SCRAPBOOK_JOB_TIMEOUT seconds are handed to
+# another worker. Tests run jobs inline instead of queueing them.
+SCRAPBOOK_JOBS_EAGER = 'test' in sys.argv or (
+    os.environ.get('SCRAPBOOK_JOBS_EAGER', 'False') == 'True')
+SCRAPBOOK_JOB_RETRY_DELAY = int(
+    os.environ.get('SCRAPBOOK_JOB_RETRY_DELAY', 30))
+SCRAPBOOK_JOB_TIMEOUT = int(os.environ.get('SCRAPBOOK_JOB_TIMEOUT', 600))
+
+# Per-request timings (SQL, templates, cache lookups and total time), sent
+# in a Server-Timing header and logged by scrapbook.timing for a sample of
+# SCRAPBOOK_TIMING_SAMPLE_RATE (0 to 1) of the requests. Off in tests.
+SCRAPBOOK_TIMING = 'test' not in sys.argv and (
+    os.environ.get('SCRAPBOOK_TIMING', 'True') == 'True')
+SCRAPBOOK_TIMING_SAMPLE_RATE = float(
+    os.environ.get('SCRAPBOOK_TIMING_SAMPLE_RATE', 0.1))
+
+# Serve the public feed and the scrapbook and post detail pages with the
+# async views in scrapbook.async_views. Defaults to on when the site runs
+# under ASGI (config.asgi) and off under WSGI, where async views would run
+# in a thread of their own for every request.
+SCRAPBOOK_ASYNC_VIEWS = (
+    os.environ.get('SCRAPBOOK_ASYNC_VIEWS', 'False') == 'True')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'scrapbook.timing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
 
 MESSAGE_TAGS = {
@@ -14,6 +14,7 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from scrapbook.views import (
@@ -21,6 +22,7 @@ from scrapbook.views import (
     custom_permission_denied_view,
     custom_error_view,
     custom_bad_request_view,
+    serve_image,
 )
 
 # Custom error handlers
@@ -38,3 +40,12 @@ urlpatterns = [
     path('summernote/', include('django_summernote.urls')),
     path("", include("scrapbook.urls"), name='scrapbook-urls'),
 ]
+
+# Serve locally stored images from MEDIA_URL during development. In
+# production the web server or a CDN in front of the site serves them, so
+# the route never shadows the scrapbook URLs it must come before.
+if (settings.DEBUG and settings.SCRAPBOOK_IMAGE_STORAGE == 'local' and
+        settings.MEDIA_URL.startswith('/')):
+    urlpatterns.insert(0, path(
+        settings.MEDIA_URL.lstrip('/') + '<path:path>', serve_image,
+        name='serve_image'))
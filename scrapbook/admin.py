@@ -1,10 +1,121 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
 from django_summernote.admin import SummernoteModelAdmin
-from .models import Scrapbook, Post, SharedAccess
+from django.utils import timezone
+from .models import Job, Scrapbook, Post, SharedAccess
+from .page_cache import invalidate_public_pages
+from .pagination import EstimatedCountPaginator
+from .search import MAX_QUERY_LENGTH, search_matches
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    List filter for a foreign key that picks the related object with the
+    admin's autocomplete widget.
+
+    The standard related filter lists every related object in the sidebar,
+    which means loading the whole users or scrapbooks table on each
+    changelist. This filter only loads the selected object, and searches
+    the others through the related admin's search_fields as the user types
+    (see static/js/autocomplete-filter.js).
+    """
+    template = 'admin/scrapbook/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        self.lookup_val = params.get(self.lookup_kwarg)
+        super().__init__(
+            field, request, params, model, model_admin, field_path)
+        formfield = forms.ModelChoiceField(
+            queryset=field.remote_field.model._default_manager.all(),
+            to_field_name=field.target_field.name,
+            widget=AutocompleteSelect(field, model_admin.admin_site),
+            required=False)
+        self.widget = formfield.widget.render(
+            self.lookup_kwarg, self.lookup_val,
+            attrs={
+                'id': f'autocomplete_filter_{field_path}',
+                'style': 'width: 100%'})
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': changelist.get_query_string(
+                remove=[self.lookup_kwarg]),
+            'display': 'All',
+        }
+
+
+class LargeTableAdminMixin:
+    """
+    Changelist settings for tables with millions of rows.
+
+    Pages are counted with EstimatedCountPaginator and the unfiltered total
+    is not counted at all. Includes the scripts of AutocompleteFilter.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        # The autocomplete scripts do not depend on the field
+        return (
+            super().media +
+            AutocompleteSelect(None, self.admin_site).media +
+            forms.Media(js=['js/autocomplete-filter.js']))
+
+
+class FullTextSearchMixin:
+    """
+    Search the changelist with the full-text index of scrapbook.search,
+    instead of a substring scan of the title column.
+
+    The autocomplete widgets search as the user types, so their requests
+    keep the search_fields matching, which also finds partial words.
+    """
+    def get_search_results(self, request, queryset, search_term):
+        if 'field_name' in request.GET:
+            return super().get_search_results(
+                request, queryset, search_term)
+        text = ' '.join(search_term.split())[:MAX_QUERY_LENGTH]
+        if not text:
+            return queryset, False
+        matches = search_matches(self.model, text).values('id')
+        return queryset.filter(id__in=matches), False
+
+
+class PublishActionsMixin:
+    """
+    Bulk actions that change the status of the selected rows.
+
+    Each action is a single UPDATE, however many rows are selected. It also
+    sets updated_on, which refreshes the cached cards of the rows (their
+    cache entries are stamped with it), and clears the public page cache.
+    """
+    actions = ['publish', 'unpublish']
+
+    def update_rows(self, request, queryset, message, **values):
+        count = queryset.update(updated_on=timezone.now(), **values)
+        invalidate_public_pages()
+        self.message_user(request, f'{count} {message}.')
+
+    @admin.action(description='Publish selected rows')
+    def publish(self, request, queryset):
+        self.update_rows(request, queryset, 'published', status=2)
+
+    @admin.action(description='Make selected rows private')
+    def unpublish(self, request, queryset):
+        self.update_rows(request, queryset, 'made private', status=1)
 
 
 @admin.register(Scrapbook)
-class ScrapbookAdmin(SummernoteModelAdmin):
+class ScrapbookAdmin(
+        PublishActionsMixin, FullTextSearchMixin, LargeTableAdminMixin,
+        SummernoteModelAdmin):
     """
     Admin class for the Scrapbook model.
 
@@ -12,14 +123,18 @@ class ScrapbookAdmin(SummernoteModelAdmin):
     model.
     """
     list_display = ('title', 'slug', 'status', 'author')
+    list_select_related = ('author',)
     search_fields = ['title']
-    list_filter = ('status',)
+    list_filter = ('status', ('author', AutocompleteFilter))
+    autocomplete_fields = ('author',)
     prepopulated_fields = {'slug': ('title',)}
     summernote_fields = ('content',)
 
 
 @admin.register(Post)
-class PostAdmin(SummernoteModelAdmin):
+class PostAdmin(
+        PublishActionsMixin, FullTextSearchMixin, LargeTableAdminMixin,
+        SummernoteModelAdmin):
     """
     Admin class for the Post model.
 
@@ -27,15 +142,25 @@ class PostAdmin(SummernoteModelAdmin):
 
     """
 
-    list_display = ('title', 'slug', 'status', 'author', 'scrapbook')
+    list_display = (
+        'title', 'slug', 'status', 'approved', 'author', 'scrapbook')
+    list_select_related = ('author', 'scrapbook__author')
     search_fields = ['title']
-    list_filter = ('status',)
+    list_filter = (
+        'status', 'approved', ('scrapbook', AutocompleteFilter),
+        ('author', AutocompleteFilter))
+    autocomplete_fields = ('author', 'scrapbook')
     prepopulated_fields = {'slug': ('title',)}
     summernote_fields = ('content',)
+    actions = PublishActionsMixin.actions + ['approve']
+
+    @admin.action(description='Approve selected posts')
+    def approve(self, request, queryset):
+        self.update_rows(request, queryset, 'approved', approved=True)
 
 
 @admin.register(SharedAccess)
-class SharedAccessAdmin(admin.ModelAdmin):
+class SharedAccessAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """
     Admin class for the SharedAccess model.
 
@@ -44,6 +169,35 @@ class SharedAccessAdmin(admin.ModelAdmin):
 
     """
 
-    list_display = ('user', 'scrapbook', 'shared_by')
+    list_display = ('user', 'scrapbook', 'post', 'shared_by')
+    list_select_related = (
+        'user', 'scrapbook__author', 'post__author', 'shared_by')
     search_fields = ['scrapbook__title', 'user__username']
-    list_filter = ('scrapbook', 'user', 'shared_by')
+    list_filter = (
+        ('scrapbook', AutocompleteFilter), ('user', AutocompleteFilter),
+        ('shared_by', AutocompleteFilter))
+    autocomplete_fields = ('user', 'scrapbook', 'post', 'shared_by')
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """
+    Admin class for the Job model.
+
+    Shows the status of background jobs, and lets failed jobs be queued
+    again.
+    """
+
+    list_display = (
+        'name', 'status', 'attempts', 'run_after', 'locked_by', 'updated_on')
+    list_filter = ('status', 'name')
+    readonly_fields = ('locked_by', 'locked_at', 'last_error')
+    exclude = ('data',)
+    actions = ['retry_jobs']
+
+    @admin.action(description='Queue selected jobs again')
+    def retry_jobs(self, request, queryset):
+        count = queryset.update(
+            status=0, attempts=0, run_after=timezone.now(), locked_by='',
+            locked_at=None)
+        self.message_user(request, f'{count} jobs queued.')
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ScrapbookConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'scrapbook'
+
+    def ready(self):
+        # Connect the model signal receivers and register the job tasks
+        from . import signals, tasks  # noqa: F401
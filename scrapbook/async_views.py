@@ -0,0 +1,145 @@
+import functools
+from asgiref.sync import sync_to_async
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponseNotAllowed
+from django.template.response import TemplateResponse
+from .conditional import add_validators, make_validators, not_modified
+from .models import Post, Scrapbook
+from .page_cache import (
+    is_cacheable_request, lookup_page, page_response, store_page)
+from .pagination import apaginate, cursor_pagination_enabled
+from .permissions import get_scrapbook_access
+from .routers import replica_reads
+from .views import post_validator, scrapbook_validator, with_card_data
+
+# Async versions of the read-heavy views, used when SCRAPBOOK_ASYNC_VIEWS is
+# enabled (the default under config.asgi). They render the same templates
+# with the same context as the class-based views in scrapbook.views, and
+# share their page cache, conditional GET and replica routing.
+#
+# Django 4.2 has no async API for sessions, users, the cache-backed
+# permission checks or template rendering, so those still run in a thread
+# through sync_to_async; the queries of the views themselves use the async
+# ORM.
+
+
+def async_read_view(view):
+    """
+    Decorator for the async read views.
+
+    Only GET and HEAD are allowed. Anonymous requests are served from the
+    page cache like AnonymousPageCacheMixin, and reads go to a replica
+    like ReplicaReadMixin. The response is rendered before it is returned,
+    inside the replica block.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        with replica_reads():
+            if not await sync_to_async(prepare_request)(request):
+                return await render(await view(request, *args, **kwargs))
+
+            key, generation, entry = await sync_to_async(lookup_page)(
+                request)
+            if entry is None:
+                response = await view(request, *args, **kwargs)
+                entry = await sync_to_async(store_page)(
+                    request, key, generation, response)
+                if entry is None:
+                    return await render(response)
+            return page_response(request, entry)
+    return wrapper
+
+
+def prepare_request(request):
+    # Load the user and session, so the views can use them without
+    # querying, and tell whether the page may come from the page cache
+    if request.user.is_authenticated:
+        return False
+    return is_cacheable_request(request)
+
+
+async def render(response):
+    if hasattr(response, 'render') and not response.is_rendered:
+        await sync_to_async(response.render)()
+    return response
+
+
+async def aget_object_or_404(queryset, **kwargs):
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(
+            f'No {queryset.model._meta.verbose_name} found matching the '
+            f'query')
+
+
+@async_read_view
+async def scrapbook_list(request):
+    # Async version of ScrapbookListView
+    queryset = with_card_data(
+        Scrapbook.objects.filter(status=2).order_by('-created_on'))
+    page_obj = await apaginate(request, queryset, 6)
+    return TemplateResponse(request, 'scrapbook/index.html', {
+        'paginator': getattr(page_obj, 'paginator', None),
+        'page_obj': page_obj,
+        'is_paginated': page_obj.has_other_pages(),
+        'object_list': page_obj.object_list,
+        'scrapbook_list': page_obj.object_list,
+        'cursor_pagination': cursor_pagination_enabled(request),
+    })
+
+
+@async_read_view
+async def scrapbook_detail(request, slug):
+    # Async version of ScrapbookDetailView
+    scrapbook = await aget_object_or_404(
+        Scrapbook.objects.select_related('author'), slug=slug)
+    access = await sync_to_async(get_scrapbook_access)(request, scrapbook)
+    if not access.can_view():
+        raise PermissionDenied(
+            "You do not have permission to view this scrapbook.")
+    validators = make_validators(
+        request, *await sync_to_async(scrapbook_validator)(scrapbook, access))
+    response = not_modified(request, validators)
+    if response is not None:
+        return response
+
+    page_obj = await apaginate(request, scrapbook.posts.all(), 6)
+    response = TemplateResponse(
+        request, 'scrapbook/scrapbook_detail.html', {
+            'object': scrapbook,
+            'scrapbook': scrapbook,
+            'page_obj': page_obj,
+            'posts': page_obj.object_list,
+            'is_paginated': page_obj.has_other_pages(),
+            'ordering': ["-created_on"],
+            'cursor_pagination': cursor_pagination_enabled(request),
+            'sharedaccess': access.is_shared,
+        })
+    return add_validators(response, validators)
+
+
+@async_read_view
+async def post_detail(request, scrapbook_slug, post_slug):
+    # Async version of PostDetailView
+    post = await aget_object_or_404(
+        Post.objects.select_related('scrapbook', 'author'),
+        slug=post_slug, scrapbook__slug=scrapbook_slug)
+    access = await sync_to_async(get_scrapbook_access)(
+        request, post.scrapbook)
+    if not access.can_view_post(post):
+        raise PermissionDenied(
+            "You do not have permission to view this post.")
+    validators = make_validators(request, *post_validator(post, access))
+    response = not_modified(request, validators)
+    if response is not None:
+        return response
+
+    response = TemplateResponse(request, 'scrapbook/post_detail.html', {
+        'object': post,
+        'post': post,
+        'scrapbook': post.scrapbook,
+    })
+    return add_validators(response, validators)
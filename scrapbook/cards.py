@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.cache import caches
+
+# Fragments rendered with {% cardcache %} and the viewer roles they vary on
+CARD_FRAGMENTS = ('home', 'my', 'shared', 'post', 'shared_post')
+CARD_ROLES = ('author', 'shared', 'anonymous')
+
+
+def card_cache():
+    # The cache backend used for card fragments
+    return caches[getattr(settings, 'SCRAPBOOK_CARD_CACHE', 'default')]
+
+
+def card_cache_key(fragment, model_name, pk, role):
+    return f'card:{fragment}:{model_name}:{pk}:{role}'
+
+
+def card_role(user, obj, shared=False):
+    """
+    Return the role the viewer has for a card.
+
+    Arguments:
+    user -- The viewing user.
+    obj -- The scrapbook or post shown on the card.
+    shared -- True if the object is shared with the user, or a collection
+    of shared object ids to look the object up in.
+    """
+    if user.is_authenticated and obj.author_id == user.id:
+        return 'author'
+    if shared and not isinstance(shared, bool):
+        shared = obj.id in shared
+    if shared:
+        return 'shared'
+    return 'anonymous'
+
+
+def invalidate_cards(model_name, pk):
+    """
+    Delete every cached card of an object, for all fragments and roles.
+    """
+    card_cache().delete_many([
+        card_cache_key(fragment, model_name, pk, role)
+        for fragment in CARD_FRAGMENTS
+        for role in CARD_ROLES])
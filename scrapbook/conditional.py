@@ -0,0 +1,76 @@
+import hashlib
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from .page_cache import MESSAGES_SESSION_KEY
+
+
+def make_validators(request, parts, last_modified):
+    # The (ETag, Last-Modified timestamp) of a page for the requesting user.
+    # A timestamp cannot tell users apart, so signed-in users get none and
+    # their pages are only validated by the ETag.
+    source = repr((request.user.pk, *parts)).encode()
+    timestamp = None
+    if not request.user.is_authenticated:
+        timestamp = int(last_modified.timestamp())
+    return f'"{hashlib.md5(source).hexdigest()}"', timestamp
+
+
+def add_validators(response, validators):
+    etag, timestamp = validators
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    return response
+
+
+def not_modified(request, validators):
+    """
+    Return a 304 response if the client's copy of the page still matches
+    the validators, and None otherwise.
+    """
+    if MESSAGES_SESSION_KEY in request.session:
+        return None
+    etag, timestamp = validators
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        add_validators(response, validators)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Answer conditional GET requests to a detail view without rendering.
+
+    The view resolves its object (including the access check) and builds a
+    cheap validator through get_validator(). If the client's If-None-Match
+    or If-Modified-Since header still matches, a 304 is returned before
+    the context is built or the template rendered. Otherwise the page is
+    rendered as usual and the ETag and Last-Modified headers are added.
+
+    The ETag also covers the viewing user, since pages differ per user, and
+    Last-Modified is only sent to anonymous users for the same reason.
+    Requests with pending messages are always rendered in full.
+
+    Methods:
+    get_validator -- Return (parts, last_modified) for the current object,
+    where parts is a tuple of values that change whenever the page does,
+    or None to render the page without validators (the default).
+    """
+    def get_validator(self):
+        return None
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        validator = self.get_validator()
+        if validator is not None:
+            validators = make_validators(request, *validator)
+            response = not_modified(request, validators)
+            if response is not None:
+                return response
+
+        context = self.get_context_data(object=self.object)
+        response = self.render_to_response(context)
+        if validator is not None:
+            add_validators(response, validators)
+        return response
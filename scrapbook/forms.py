@@ -1,12 +1,54 @@
 from django import forms
 from django.contrib.auth.models import User
+from django.db.models.fields.files import FieldFile
 from allauth.account.forms import SignupForm
-from cloudinary import CloudinaryResource
 from PIL import Image
 from .models import Post, Scrapbook, SharedAccess
+from .jobs import enqueue
+from .recipients import RecipientWidget, recipient_queryset
+from .images import ingest_image
+from .uploads import (
+    IMAGE_TOO_LARGE, INVALID_IMAGE, MAX_IMAGE_SIZE, validate_image)
 
 
-class ScrapbookForm(forms.ModelForm):
+class ImageFormMixin:
+    """
+    Shared image handling for ScrapbookForm and PostForm.
+
+    Accepts an upload_errors keyword argument holding the errors recorded
+    by ImageUploadHandler for uploads that were stopped mid-stream, and
+    reports them against the image field.
+
+    Methods:
+    clean_image -- Validate the uploaded image, then downscale and
+    re-encode it for storage.
+    """
+    def __init__(self, *args, upload_errors=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_errors = upload_errors or {}
+        if 'image' in self.upload_errors:
+            # The file was rejected, so report why rather than that it is
+            # missing
+            self.fields['image'].required = False
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if 'image' in self.upload_errors:
+            raise forms.ValidationError(self.upload_errors['image'])
+        if not image and self.instance.pk:
+            return self.instance.image
+        if image and not isinstance(image, FieldFile):
+            validate_image(image)
+            try:
+                image = ingest_image(image)
+            except (OSError, ValueError, Image.DecompressionBombError):
+                raise forms.ValidationError(INVALID_IMAGE)
+            if image.size > MAX_IMAGE_SIZE:
+                raise forms.ValidationError(IMAGE_TOO_LARGE)
+        return image
+
+
+class ScrapbookForm(ImageFormMixin, forms.ModelForm):
     """
     Form for creating and updating a scrapbook.
 
@@ -56,27 +98,8 @@ class ScrapbookForm(forms.ModelForm):
                 'class': 'form-control', 'id': 'id_image'}),
         }
 
-    def clean_image(self):
-        image = self.cleaned_data.get('image')
-        if not image and self.instance.pk:
-            return self.instance.image
-        if image:
-            if isinstance(image, CloudinaryResource):
-                return image
-            if hasattr(image, 'size'):
-                if image.size > 2 * 1024 * 1024:  # 2MB
-                    raise forms.ValidationError(
-                        "Image file too large. Size should not exceed 2.0 MB.")
-            try:
-                img = Image.open(image)
-                img.verify()
-            except Exception as e:
-                raise forms.ValidationError(
-                    "Upload a valid image or an uncorrupted image.")
-        return image
 
-
-class PostForm(forms.ModelForm):
+class PostForm(ImageFormMixin, forms.ModelForm):
     """
     Form for creating and updating a post.
 
@@ -136,25 +159,6 @@ class PostForm(forms.ModelForm):
                 "The title cannot be more than 100 characters.")
         return title
 
-    def clean_image(self):
-        image = self.cleaned_data.get('image')
-        if not image and self.instance.pk:
-            return self.instance.image
-        if image:
-            if isinstance(image, CloudinaryResource):
-                return image
-            if hasattr(image, 'size'):
-                if image.size > 2 * 1024 * 1024:  # 2MB
-                    raise forms.ValidationError(
-                        "Image file too large. Size should not exceed 2.0 MB.")
-            try:
-                img = Image.open(image)
-                img.verify()
-            except Exception as e:
-                raise forms.ValidationError(
-                    "Upload a valid image or an uncorrupted image.")
-        return image
-
     def clean_content(self):
         content = self.cleaned_data.get('content')
         if not content:
@@ -167,18 +171,18 @@ class ShareContentForm(forms.ModelForm):
     Form for sharing a scrapbook or post with another user.
 
     Fields:
-    user -- The user to share the scrapbook or post with.
+    user -- The user to share the scrapbook or post with, chosen with a
+    typeahead.
     scrapbook_id -- The ID of the scrapbook to share.
     post_id -- The ID of the post to share.
 
     Methods:
     clean -- Validate the user and scrapbook/post combination.
-    save -- Save the shared access instance and create shared access instances
-    for each post in the scrapbook.
+    save -- Queue a job granting the user access to the scrapbook and all
+    of its non-draft posts.
     """
     user = forms.ModelChoiceField(
-        queryset=User.objects.none(), widget=forms.Select(attrs={
-            'class': 'form-control'}))
+        queryset=User.objects.none(), widget=RecipientWidget())
     scrapbook_id = forms.IntegerField(widget=forms.HiddenInput())
     post_id = forms.IntegerField(widget=forms.HiddenInput(), required=False)
 
@@ -190,10 +194,10 @@ class ShareContentForm(forms.ModelForm):
         self.shared_by = kwargs.pop('shared_by', None)
         scrapbook = kwargs.pop('scrapbook', None)
         super().__init__(*args, **kwargs)
-        # Exclude the user sharing the scrapbook from the user queryset
+        # Exclude the user sharing the scrapbook from the user queryset.
+        # The queryset is never rendered; it only validates the submitted id.
         if self.shared_by:
-            self.fields['user'].queryset = User.objects.exclude(
-                id=self.shared_by.id)
+            self.fields['user'].queryset = recipient_queryset(self.shared_by)
         # Set the initial values for the form fields
         if scrapbook:
             self.fields['scrapbook_id'].initial = scrapbook.id
@@ -207,7 +211,7 @@ class ShareContentForm(forms.ModelForm):
         scrapbook_id = cleaned_data.get('scrapbook_id')
         if user and scrapbook_id:
             if SharedAccess.objects.filter(
-                user=user, scrapbook_id=scrapbook_id
+                user=user, scrapbook_id=scrapbook_id, post__isnull=True
             ).exists():
                 raise forms.ValidationError(
                     "This scrapbook has already been shared with this user.")
@@ -222,20 +226,31 @@ class ShareContentForm(forms.ModelForm):
         # automatically shared
         instance.shared_by = self.shared_by  # Set the shared_by field
         if commit:
-            instance.save()
-            # Create SharedAccess instances for each post in the scrapbook
-            posts = Post.objects.filter(scrapbook=instance.scrapbook)
-            for post in posts:
-                SharedAccess.objects.create(
-                    user=instance.user,
-                    scrapbook=instance.scrapbook,
-                    post=post,
-                    shared_by=instance.shared_by
-                )
-                instance.save()
+            # Grant access to the scrapbook and all of its non-draft posts
+            # in the background
+            enqueue(
+                'share_scrapbook', scrapbook_id=instance.scrapbook.id,
+                user_ids=[instance.user.id],
+                shared_by_id=instance.shared_by.id)
         return instance
 
 
+class SearchForm(forms.Form):
+    """
+    The ``q`` query parameter of the search page and recipient typeahead.
+
+    CharField rejects NUL characters, which the databases cannot take in a
+    query, so search_query() treats such a query as empty.
+    """
+    q = forms.CharField(required=False)
+
+
+def search_query(request):
+    # The cleaned ``q`` query parameter, or '' if it is invalid
+    form = SearchForm(request.GET)
+    return form.cleaned_data['q'] if form.is_valid() else ''
+
+
 class CustomSignupForm(SignupForm):
     """
     Custom signup form for the user registration page.
@@ -0,0 +1,247 @@
+import base64
+import io
+import os
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from PIL import Image, ImageFilter, ImageOps
+
+try:
+    from pillow_heif import register_heif_opener
+except ImportError:  # HEIF photos are only accepted with pillow-heif
+    HEIF_SUPPORTED = False
+else:
+    register_heif_opener()
+    HEIF_SUPPORTED = True
+
+# Formats stored unchanged, since re-encoding would lose their animation
+PASSTHROUGH_FORMATS = {'GIF'}
+
+# Longest edge in pixels of the low-quality image placeholders
+LQIP_EDGE = 16
+
+# Output formats the ingest stage can re-encode to
+CONTENT_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+EXTENSIONS = {'WEBP': '.webp', 'JPEG': '.jpg'}
+
+
+def has_alpha(img):
+    return img.mode in ('RGBA', 'LA', 'PA') or (
+        img.mode == 'P' and 'transparency' in img.info)
+
+
+def prepare_mode(img, image_format):
+    # Convert to a mode the output format can store, flattening any
+    # transparency onto white for JPEG
+    if has_alpha(img):
+        img = img.convert('RGBA')
+        if image_format == 'WEBP':
+            return img
+        background = Image.new('RGB', img.size, 'white')
+        background.paste(img, mask=img.getchannel('A'))
+        return background
+    if img.mode != 'RGB':
+        return img.convert('RGB')
+    return img
+
+
+def image_options():
+    # The output format and quality from the settings
+    image_format = getattr(settings, 'SCRAPBOOK_IMAGE_FORMAT', 'WEBP').upper()
+    quality = getattr(settings, 'SCRAPBOOK_IMAGE_QUALITY', 82)
+    return image_format, quality
+
+
+def encode_image(img, name, image_format, quality, icc_profile=None):
+    """
+    Encode an image without any metadata except its ICC profile.
+
+    Returns the encoded image as an InMemoryUploadedFile named after name.
+    """
+    img.info = {}
+    output = io.BytesIO()
+    options = {'quality': quality}
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    if image_format == 'JPEG':
+        options.update(optimize=True, progressive=True)
+    else:
+        options['method'] = 4
+    img.save(output, format=image_format, **options)
+    size = output.tell()
+    output.seek(0)
+    return InMemoryUploadedFile(
+        output, None, name + EXTENSIONS[image_format],
+        CONTENT_TYPES[image_format], size, None)
+
+
+def ingest_image(upload, max_edge=None, image_format=None, quality=None):
+    """
+    Downscale and re-encode an uploaded photo before it is stored.
+
+    JPEGs are decoded in draft mode, which lets the decoder scale the image
+    down by up to 8x while decoding. The photo is then rotated upright
+    from its EXIF orientation, resized so its longest edge is at most
+    max_edge, and re-encoded without EXIF (such as GPS positions). The ICC
+    profile is kept so colours are unchanged. GIFs are returned unchanged.
+
+    Arguments:
+    upload -- The uploaded image file.
+    max_edge -- The longest edge in pixels, SCRAPBOOK_IMAGE_MAX_EDGE by
+    default.
+    image_format -- WEBP or JPEG, SCRAPBOOK_IMAGE_FORMAT by default.
+    quality -- The encoder quality, SCRAPBOOK_IMAGE_QUALITY by default.
+
+    Returns the re-encoded image as an InMemoryUploadedFile.
+    """
+    default_format, default_quality = image_options()
+    max_edge = max_edge or getattr(settings, 'SCRAPBOOK_IMAGE_MAX_EDGE', 2048)
+    image_format = (image_format or default_format).upper()
+    quality = quality or default_quality
+
+    upload.seek(0)
+    with Image.open(upload) as source:
+        if source.format in PASSTHROUGH_FORMATS:
+            upload.seek(0)
+            return upload
+        icc_profile = source.info.get('icc_profile')
+        source.draft('RGB', (max_edge, max_edge))
+        img = ImageOps.exif_transpose(source)
+        img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+        img = prepare_mode(img, image_format)
+
+    name = os.path.splitext(os.path.basename(upload.name or 'image'))[0]
+    return encode_image(img, name, image_format, quality, icc_profile)
+
+
+def make_lqip(img):
+    """
+    Return a low-quality image placeholder (LQIP) of an image.
+
+    The image is shrunk to a few pixels, blurred and encoded as a WebP data
+    URI of a few hundred bytes, which the card templates inline as the
+    background of the image while it loads.
+    """
+    small = img.copy()
+    small.thumbnail((LQIP_EDGE, LQIP_EDGE), Image.Resampling.BOX)
+    small = prepare_mode(small, 'JPEG').filter(ImageFilter.GaussianBlur(0.5))
+    output = io.BytesIO()
+    small.save(output, format='WEBP', quality=40)
+    return 'data:image/webp;base64,' + base64.b64encode(
+        output.getvalue()).decode()
+
+
+def process_image(upload, widths=None):
+    """
+    Measure an image and build its placeholder and smaller renditions.
+
+    The image is decoded once. It is measured after applying any EXIF
+    orientation, then resized to each width in turn. Widths that are not
+    smaller than the image itself are skipped, since the original then
+    serves that size. GIFs get no renditions, as resizing them would lose
+    their animation.
+
+    Arguments:
+    upload -- The image file, usually as returned by ingest_image.
+    widths -- A dict of rendition label to width in pixels,
+    SCRAPBOOK_IMAGE_RENDITIONS by default. Pass {} to skip renditions.
+
+    Returns (size, lqip, renditions), where size is the (width, height) of
+    the image, lqip its placeholder data URI and renditions maps each
+    label to (file, width, height).
+    """
+    if widths is None:
+        widths = getattr(
+            settings, 'SCRAPBOOK_IMAGE_RENDITIONS',
+            {'thumb': 480, 'medium': 1024})
+    image_format, quality = image_options()
+
+    upload.seek(0)
+    with Image.open(upload) as source:
+        if source.format in PASSTHROUGH_FORMATS:
+            widths = {}
+        icc_profile = source.info.get('icc_profile')
+        original = prepare_mode(ImageOps.exif_transpose(source), image_format)
+    upload.seek(0)
+    size = original.size
+    lqip = make_lqip(original)
+
+    name = os.path.splitext(os.path.basename(upload.name or 'image'))[0]
+    renditions = {}
+    for label, width in sorted(widths.items(), key=lambda item: item[1]):
+        if width >= size[0]:
+            continue
+        height = max(1, round(size[1] * width / size[0]))
+        img = original.resize((width, height), Image.Resampling.LANCZOS)
+        renditions[label] = (
+            encode_image(
+                img, f'{name}-{label}', image_format, quality, icc_profile),
+            width, height)
+    return size, lqip, renditions
+
+
+def image_fields(instance, renditions=True):
+    """
+    Compute the stored image data of a Scrapbook or Post.
+
+    Works both for a newly uploaded image and for one already in storage,
+    which is read back from the storage backend. Any renditions are saved
+    to the image storage.
+
+    Arguments:
+    instance -- The Scrapbook or Post.
+    renditions -- Whether to build and store the renditions too.
+
+    Returns a dict of field name to value, ready to set on the instance.
+    """
+    image = instance.image
+    committed = getattr(image, '_committed', True)
+    image.open('rb')
+    try:
+        size, lqip, files = process_image(
+            image.file, None if renditions else {})
+    finally:
+        if committed:
+            image.close()
+
+    fields = {
+        'image_width': size[0],
+        'image_height': size[1],
+        'image_lqip': lqip,
+    }
+    if renditions:
+        stored = {}
+        for label, (file, width, height) in files.items():
+            name = image.field.generate_filename(instance, file.name)
+            stored[label] = {
+                'name': image.storage.save(name, file),
+                'width': width,
+                'height': height,
+            }
+        fields['image_renditions'] = stored
+    return fields
+
+
+def store_image_data(instance):
+    """
+    Measure a newly uploaded image and store its placeholder and
+    renditions.
+
+    Called when a Scrapbook or Post is saved. Does nothing unless its image
+    has just been assigned and not yet written to storage. Images uploaded
+    earlier are handled by the backfill_images management command.
+    """
+    image = instance.image
+    if not image or getattr(image, '_committed', True):
+        return
+    try:
+        fields = image_fields(instance)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # Not an image Pillow can read, so it is only stored as uploaded
+        fields = {
+            'image_width': None,
+            'image_height': None,
+            'image_lqip': '',
+            'image_renditions': {},
+        }
+    for field, value in fields.items():
+        setattr(instance, field, value)
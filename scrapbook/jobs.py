@@ -0,0 +1,157 @@
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Status values of the Job model
+QUEUED, RUNNING, DONE, FAILED = 0, 1, 2, 3
+
+# Registered task functions by name
+TASKS = {}
+
+
+def task(name, max_attempts=3):
+    """
+    Register a function as a task that can be queued by name.
+
+    The function is called with the Job being run, and reads its arguments
+    from job.payload and job.data. Any exception counts as a failed attempt.
+    """
+    def register(func):
+        func.task_name = name
+        func.max_attempts = max_attempts
+        TASKS[name] = func
+        return func
+    return register
+
+
+def jobs_eager():
+    # Run jobs inline instead of queueing them, as in tests
+    return getattr(settings, 'SCRAPBOOK_JOBS_EAGER', False)
+
+
+def retry_delay(attempts):
+    # Exponential backoff: the base delay, doubled after every attempt
+    base = getattr(settings, 'SCRAPBOOK_JOB_RETRY_DELAY', 30)
+    return timedelta(seconds=base * 2 ** (attempts - 1))
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def enqueue(name, data=None, **payload):
+    """
+    Queue a task to be run by a worker.
+
+    The job is written in the caller's transaction, so it is only visible
+    to workers, and only runs, if that transaction commits. With
+    SCRAPBOOK_JOBS_EAGER the job is run immediately instead.
+
+    Arguments:
+    name -- The name of a registered task.
+    data -- Optional bytes passed to the task, such as an uploaded file.
+    payload -- JSON-serializable keyword arguments for the task.
+
+    Returns the Job.
+    """
+    job = Job.objects.create(
+        name=name, payload=payload, data=data,
+        max_attempts=TASKS[name].max_attempts)
+    if jobs_eager():
+        run_job(job, raise_errors=True)
+    return job
+
+
+def claim_job(worker=None):
+    """
+    Claim the next job that is due, for one worker.
+
+    Jobs that have been running for longer than SCRAPBOOK_JOB_TIMEOUT
+    seconds are assumed to belong to a worker that died, and are claimed
+    again. A job is claimed with a conditional UPDATE, so when several
+    workers race for it only one of them gets it, on any database backend.
+
+    Returns the claimed Job, or None if no job is due.
+    """
+    worker = worker or worker_name()
+    while True:
+        now = timezone.now()
+        stale = now - timedelta(
+            seconds=getattr(settings, 'SCRAPBOOK_JOB_TIMEOUT', 600))
+        due = (
+            Q(status=QUEUED, run_after__lte=now) |
+            Q(status=RUNNING, locked_at__lt=stale))
+        candidate = Job.objects.filter(due).order_by(
+            'run_after', 'id').values_list('id', 'status', 'locked_at')[:1]
+        if not candidate:
+            return None
+        job_id, status, locked_at = candidate[0]
+        claimed = Job.objects.filter(
+            id=job_id, status=status, locked_at=locked_at,
+        ).update(status=RUNNING, locked_by=worker, locked_at=now)
+        if claimed:
+            return Job.objects.get(id=job_id)
+        # Another worker claimed it first; try the next job
+
+
+def run_job(job, raise_errors=False):
+    """
+    Run a claimed job and record the outcome.
+
+    The task runs in its own transaction, so a failed attempt leaves no
+    partial writes behind. Each run counts as an attempt. A failed job is
+    queued again after an exponentially growing delay, or marked failed
+    once it has used all of its attempts. The data of a finished job is
+    dropped to keep the table small. With raise_errors, the task's
+    exception is re-raised after the outcome is recorded.
+    """
+    job.attempts += 1
+    error = None
+    try:
+        with transaction.atomic():
+            TASKS[job.name](job)
+    except Exception as exc:
+        error = exc
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = FAILED
+            logger.error('Job %s (%s) failed', job.id, job.name)
+        else:
+            job.status = QUEUED
+            job.run_after = timezone.now() + retry_delay(job.attempts)
+            logger.warning(
+                'Job %s (%s) failed, retrying', job.id, job.name)
+    else:
+        job.status = DONE
+        job.data = None
+    job.locked_by = ''
+    job.locked_at = None
+    job.save()
+    if error is not None and raise_errors:
+        raise error
+    return job
+
+
+def run_pending(max_jobs=None, worker=None):
+    """
+    Run due jobs until none are left or max_jobs have run.
+
+    Returns the number of jobs run.
+    """
+    count = 0
+    while max_jobs is None or count < max_jobs:
+        job = claim_job(worker)
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+    return count
@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from PIL import Image
+from scrapbook.cards import invalidate_cards
+from scrapbook.images import image_fields
+from scrapbook.models import Post, Scrapbook
+from scrapbook.page_cache import invalidate_public_pages
+from scrapbook.storage import PLACEHOLDER
+
+FIELDS = ['image_width', 'image_height', 'image_lqip', 'image_renditions']
+
+
+def backfill(obj):
+    # Runs on a worker thread: only reads the image and writes renditions
+    # to storage, leaving the database to the main thread
+    try:
+        return obj, image_fields(obj, renditions=not obj.image_renditions)
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        return obj, error
+
+
+class Command(BaseCommand):
+    """
+    Store the size and placeholder of images uploaded before they were
+    computed at upload time, and any missing renditions.
+
+    Rows are read in batches by id. The images of a batch are downloaded
+    and processed in parallel, then the batch is saved with one
+    bulk_update. Placeholder images are skipped.
+
+    Usage: python manage.py backfill_images --batch-size 100 --workers 8
+    """
+    help = 'Backfill image sizes, placeholders and renditions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Number of rows read and saved at a time.')
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Number of images processed in parallel.')
+
+    def handle(self, *args, **options):
+        total = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for model in (Scrapbook, Post):
+                done, errors = self.backfill_model(
+                    model, executor, options['batch_size'])
+                total += done
+                failed += errors
+        if total:
+            invalidate_public_pages()
+        self.stdout.write(self.style.SUCCESS(
+            f'Backfilled {total} images, {failed} failed.'))
+
+    def backfill_model(self, model, executor, batch_size):
+        model_name = model._meta.model_name
+        pending = model.objects.exclude(image=PLACEHOLDER).exclude(
+            image='').filter(
+            Q(image_width__isnull=True) | Q(image_lqip='')).order_by('id')
+        done = failed = last_id = 0
+        while True:
+            batch = list(pending.filter(id__gt=last_id).only(
+                'id', 'image', *FIELDS)[:batch_size])
+            if not batch:
+                return done, failed
+            last_id = batch[-1].id
+            updated = []
+            for obj, result in executor.map(backfill, batch):
+                if isinstance(result, Exception):
+                    failed += 1
+                    self.stderr.write(
+                        f'{model_name} {obj.id}: {obj.image.name}: {result}')
+                    continue
+                for field, value in result.items():
+                    setattr(obj, field, value)
+                updated.append(obj)
+            model.objects.bulk_update(updated, FIELDS)
+            # bulk_update leaves updated_on alone, so drop the cached cards
+            for obj in updated:
+                invalidate_cards(model_name, obj.id)
+            done += len(updated)
@@ -0,0 +1,157 @@
+import json
+import statistics
+import time
+from contextlib import ExitStack
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from scrapbook.models import Post, Scrapbook, SharedAccess
+from scrapbook.routers import replica_aliases
+from scrapbook.urls import urlpatterns
+
+# Views that only exist to exercise the error pages
+SKIPPED_URLS = ('trigger-403-error', 'trigger-500-error')
+
+
+def percentile(timings, fraction):
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+class Command(BaseCommand):
+    """
+    Measure the latency and query count of every URL in scrapbook/urls.py.
+
+    Each URL is requested through the test client against the configured
+    database, as the author of the scrapbook with the most posts (or the
+    user given with --user, or an anonymous visitor with --anonymous).
+    One warm-up request per URL is not counted. Only GET requests are
+    made, so nothing is changed. Run it after seed_scrapbooks to see how
+    the views behave at a realistic size.
+
+    The report is JSON, so runs against different versions can be
+    compared: the database vendor, the number of rows, and for each URL
+    its status code, p50 and p95 latency in milliseconds and the number of
+    queries of the slowest request, summed over the default database and
+    any read replicas (SCRAPBOOK_REPLICAS).
+
+    Usage: python manage.py bench --requests 20 --output before.json
+    """
+    help = 'Benchmark every scrapbook URL and report latency and queries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=20,
+            help='Number of timed requests per URL.')
+        parser.add_argument(
+            '--user',
+            help='Username to request the URLs as.')
+        parser.add_argument(
+            '--anonymous', action='store_true',
+            help='Request the URLs without logging in.')
+        parser.add_argument(
+            '--output',
+            help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        scrapbook = self.pick_scrapbook(options['user'])
+        user = scrapbook.author
+        post = scrapbook.posts.order_by('-created_on').first()
+        grant = SharedAccess.objects.filter(
+            user=user, post__isnull=True).select_related('scrapbook').first()
+        # Values of the URL parameters, and query strings of the views that
+        # need one
+        kwargs = {
+            'slug': scrapbook.slug,
+            'scrapbook_id': scrapbook.id,
+            'scrapbook_slug': scrapbook.slug,
+            'post_id': post and post.id,
+            'post_slug': post and post.slug,
+        }
+        queries = {
+            'search': {'q': scrapbook.title.split()[0]},
+            'recipient_search': {'q': user.username[:2]},
+            'share_content': {'scrapbook_id': scrapbook.id},
+        }
+
+        client = Client(
+            raise_request_exception=False, SERVER_NAME='localhost')
+        if not options['anonymous']:
+            client.force_login(user)
+
+        results = []
+        for pattern in urlpatterns:
+            if pattern.name in SKIPPED_URLS:
+                continue
+            url_kwargs = {
+                name: kwargs[name] for name in pattern.pattern.converters}
+            if pattern.name == 'shared_scrapbook_detail' and grant:
+                url_kwargs['slug'] = grant.scrapbook.slug
+            if None in url_kwargs.values():
+                continue
+            path = reverse(pattern.name, kwargs=url_kwargs)
+            results.append(self.time_url(
+                client, pattern.name, path, queries.get(pattern.name, {}),
+                options['requests']))
+
+        report = {
+            'backend': connection.vendor,
+            'user': None if options['anonymous'] else user.username,
+            'requests': options['requests'],
+            'rows': {
+                'users': User.objects.count(),
+                'scrapbooks': Scrapbook.objects.count(),
+                'posts': Post.objects.count(),
+                'shares': SharedAccess.objects.count(),
+            },
+            'urls': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            for result in results:
+                self.stdout.write(
+                    f"{result['name']:<24} {result['status']} "
+                    f"p50 {result['p50_ms']:>8.1f} ms  "
+                    f"p95 {result['p95_ms']:>8.1f} ms  "
+                    f"{result['queries']:>3} queries")
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
+
+    def pick_scrapbook(self, username):
+        scrapbooks = Scrapbook.objects.select_related('author')
+        if username:
+            scrapbooks = scrapbooks.filter(author__username=username)
+        scrapbook = scrapbooks.annotate(
+            post_total=Count('posts')).order_by('-post_total', 'id').first()
+        if scrapbook is None:
+            raise CommandError(
+                'No scrapbooks to benchmark, run seed_scrapbooks first.')
+        return scrapbook
+
+    def time_url(self, client, name, path, data, count):
+        client.get(path, data)
+        timings = []
+        query_counts = []
+        for _ in range(count):
+            with ExitStack() as stack:
+                captured = [
+                    stack.enter_context(
+                        CaptureQueriesContext(connections[alias]))
+                    for alias in [DEFAULT_DB_ALIAS, *replica_aliases()]]
+                started = time.perf_counter()
+                response = client.get(path, data)
+                timings.append((time.perf_counter() - started) * 1000)
+            query_counts.append(sum(len(queries) for queries in captured))
+        return {
+            'name': name,
+            'path': path,
+            'status': response.status_code,
+            'p50_ms': round(statistics.median(timings), 1),
+            'p95_ms': round(percentile(timings, 0.95), 1),
+            'queries': max(query_counts),
+        }
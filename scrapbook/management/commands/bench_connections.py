@@ -0,0 +1,72 @@
+import statistics
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from scrapbook.models import Scrapbook
+
+# Connection settings compared, as (label, CONN_MAX_AGE, CONN_HEALTH_CHECKS)
+MODES = (
+    ('new connection per request', 0, False),
+    ('persistent', 60, False),
+    ('persistent + health checks', 60, True),
+)
+
+
+class Command(BaseCommand):
+    """
+    Measure what reusing database connections saves per request.
+
+    Simulates requests by sending the request_started and request_finished
+    signals, which open and close connections exactly as in a real request,
+    around the query of a typical page. Each connection mode is timed in
+    turn on the default database, then the configured settings are
+    restored. Against PostgreSQL, opening a connection costs several
+    milliseconds; SQLite can stand in, but opens connections far faster.
+
+    Usage: python manage.py bench_connections --requests 500
+    """
+    help = 'Benchmark persistent database connections against new ones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=500,
+            help='Number of requests to time per mode.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'Backend: {connection.vendor}, configured CONN_MAX_AGE '
+            f"{settings.DATABASES['default']['CONN_MAX_AGE']}, "
+            f"CONN_HEALTH_CHECKS "
+            f"{settings.DATABASES['default']['CONN_HEALTH_CHECKS']}")
+        saved = {
+            key: connection.settings_dict[key]
+            for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')}
+        baseline = None
+        try:
+            for label, max_age, health_checks in MODES:
+                connection.close()
+                connection.settings_dict['CONN_MAX_AGE'] = max_age
+                connection.settings_dict['CONN_HEALTH_CHECKS'] = (
+                    health_checks)
+                median = self.time_requests(options['requests'])
+                if baseline is None:
+                    baseline = median
+                self.stdout.write(
+                    f'{label}: median {median:.3f} ms per request, '
+                    f'saving {baseline - median:.3f} ms')
+        finally:
+            connection.close()
+            connection.settings_dict.update(saved)
+
+    def time_requests(self, count):
+        timings = []
+        for _ in range(count):
+            started = time.perf_counter()
+            request_started.send(sender=self.__class__)
+            list(Scrapbook.objects.filter(status=2).order_by(
+                '-created_on').values_list('id', flat=True)[:6])
+            request_finished.send(sender=self.__class__)
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,74 @@
+import io
+import time
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+from scrapbook.images import ingest_image
+
+
+def make_photo(width, height, image_format):
+    # Build a photo-like test image; noise keeps the encoder from
+    # compressing it unrealistically well
+    noise = Image.effect_noise((width, height), 24).convert('RGB')
+    gradient = Image.linear_gradient('L').resize((width, height))
+    photo = Image.blend(noise, gradient.convert('RGB'), 0.7)
+    output = io.BytesIO()
+    photo.save(output, format=image_format, quality=92)
+    return output.getvalue()
+
+
+class Command(BaseCommand):
+    """
+    Measure the throughput of the image ingest stage on a single core.
+
+    Usage: python manage.py bench_ingest --size 4032x3024 --count 20
+    """
+    help = 'Benchmark image ingest (downscale and re-encode) per core.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size', default='4032x3024',
+            help='Size of the source photo, as WIDTHxHEIGHT.')
+        parser.add_argument(
+            '--count', type=int, default=20,
+            help='Number of photos to ingest.')
+        parser.add_argument(
+            '--source-format', default='JPEG',
+            help='Format of the source photo (JPEG or PNG).')
+        parser.add_argument(
+            '--format', dest='image_format', default=None,
+            help='Output format, SCRAPBOOK_IMAGE_FORMAT by default.')
+        parser.add_argument(
+            '--max-edge', type=int, default=None,
+            help='Longest edge, SCRAPBOOK_IMAGE_MAX_EDGE by default.')
+
+    def handle(self, *args, **options):
+        try:
+            width, height = map(int, options['size'].lower().split('x'))
+        except ValueError:
+            raise CommandError('--size must look like 4032x3024.')
+        source = make_photo(width, height, options['source_format'].upper())
+
+        stored = 0
+        started = time.process_time()
+        wall_started = time.perf_counter()
+        for i in range(options['count']):
+            upload = SimpleUploadedFile(f'photo{i}.jpg', source)
+            result = ingest_image(
+                upload, max_edge=options['max_edge'],
+                image_format=options['image_format'])
+            stored += result.size
+        cpu = time.process_time() - started
+        wall = time.perf_counter() - wall_started
+
+        count = options['count']
+        self.stdout.write(
+            f'Source: {width}x{height} {options["source_format"].upper()}, '
+            f'{len(source) / 1024:.0f} KiB')
+        self.stdout.write(
+            f'Stored: {stored / count / 1024:.0f} KiB per photo '
+            f'({100 * stored / (len(source) * count):.1f}% of source)')
+        self.stdout.write(
+            f'Throughput: {count / cpu:.2f} photos/s per core, '
+            f'{len(source) * count / cpu / (1024 * 1024):.1f} MiB/s input '
+            f'({wall / count * 1000:.0f} ms wall per photo)')
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import statistics
+import time
+from urllib.parse import urlsplit
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.urls import reverse
+from scrapbook.models import Post, Scrapbook
+from .bench import percentile
+
+
+class Command(BaseCommand):
+    """
+    Load a running server with concurrent requests to the read-heavy pages.
+
+    Opens --concurrency connections at once against the server at the
+    given URL and requests the public feed (first and second page), the
+    largest public scrapbook and its newest public post in turn, until
+    --requests requests were made. Pages are picked from the configured
+    database, which must be the one the server uses. Requests are
+    anonymous unless --cookie is given (e.g. "sessionid=...").
+
+    Run it against each deployment to compare them, e.g. with the page
+    cache disabled (SCRAPBOOK_PAGE_CACHE_TIMEOUT=0) so the views run:
+        gunicorn config.wsgi --workers 4
+        uvicorn config.asgi:application --workers 4
+
+    Usage: python manage.py bench_load http://localhost:8000 --requests 2000
+    """
+    help = 'Benchmark a running server under concurrent load.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'url',
+            help='Base URL of the server, e.g. http://localhost:8000.')
+        parser.add_argument(
+            '--requests', type=int, default=1000,
+            help='Total number of timed requests.')
+        parser.add_argument(
+            '--concurrency', type=int, default=20,
+            help='Number of requests in flight at once.')
+        parser.add_argument(
+            '--cookie',
+            help='Cookie header to send, to load the pages as a user.')
+        parser.add_argument(
+            '--output',
+            help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError('Give the server as http://host[:port].')
+        paths = self.pick_paths()
+        report = asyncio.run(self.load(
+            url.hostname, url.port or 80, paths, options))
+        report['url'] = options['url']
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(
+                f"{report['requests_per_second']:.1f} requests/s, "
+                f"p50 {report['p50_ms']:.1f} ms, "
+                f"p95 {report['p95_ms']:.1f} ms, "
+                f"{report['errors']} errors")
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
+
+    def pick_paths(self):
+        scrapbook = Scrapbook.objects.filter(
+            status=2, posts__status=2).annotate(
+            post_total=Count('posts')).order_by('-post_total', 'id').first()
+        if scrapbook is None:
+            raise CommandError(
+                'No public posts to load, run seed_scrapbooks first.')
+        post = Post.objects.filter(scrapbook=scrapbook, status=2).order_by(
+            '-created_on').first()
+        home = reverse('home')
+        return [
+            home,
+            f'{home}?page=2',
+            reverse('scrapbook_detail', kwargs={'slug': scrapbook.slug}),
+            reverse('post_detail', kwargs={
+                'scrapbook_slug': scrapbook.slug, 'post_slug': post.slug}),
+        ]
+
+    async def load(self, host, port, paths, options):
+        headers = f'Host: {host}:{port}\r\nConnection: close\r\n'
+        if options['cookie']:
+            headers += f"Cookie: {options['cookie']}\r\n"
+        queue = asyncio.Queue()
+        for i in range(options['requests']):
+            queue.put_nowait(paths[i % len(paths)])
+        timings = []
+        statuses = {}
+
+        async def worker():
+            while not queue.empty():
+                path = queue.get_nowait()
+                started = time.perf_counter()
+                status = await self.fetch(host, port, path, headers)
+                timings.append((time.perf_counter() - started) * 1000)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        # One request per path first, so the workers are warm
+        for path in paths:
+            await self.fetch(host, port, path, headers)
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            worker() for _ in range(options['concurrency'])))
+        elapsed = time.perf_counter() - started
+        return {
+            'paths': paths,
+            'requests': len(timings),
+            'concurrency': options['concurrency'],
+            'seconds': round(elapsed, 2),
+            'requests_per_second': round(len(timings) / elapsed, 1),
+            'p50_ms': round(statistics.median(timings), 1),
+            'p95_ms': round(percentile(timings, 0.95), 1),
+            'statuses': {str(key): value for key, value in statuses.items()},
+            'errors': sum(
+                count for status, count in statuses.items()
+                if status is None or status >= 500),
+        }
+
+    async def fetch(self, host, port, path, headers):
+        # Returns the response's status code, or None if the request failed
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+        except OSError:
+            return None
+        try:
+            writer.write(f'GET {path} HTTP/1.1\r\n{headers}\r\n'.encode())
+            await writer.drain()
+            status_line = await reader.readline()
+            await reader.read()
+            return int(status_line.split()[1])
+        except (OSError, IndexError, ValueError):
+            return None
+        finally:
+            writer.close()
@@ -0,0 +1,108 @@
+import itertools
+import random
+import statistics
+import time
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from scrapbook.models import Post, Scrapbook
+from scrapbook.search import load_results, search
+
+USERNAME = 'bench-search'
+
+# Words the generated posts are made of. A few are common and most are
+# rare, roughly like words in real text.
+VOCABULARY = [f'word{i}' for i in range(5000)]
+CUM_WEIGHTS = list(itertools.accumulate(
+    1 / (rank + 1) for rank in range(len(VOCABULARY))))
+
+
+def sentence(rng, length):
+    return ' '.join(rng.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=length))
+
+
+class Command(BaseCommand):
+    """
+    Measure search latency over a large number of posts.
+
+    Generates posts owned by a dedicated user, runs a set of one- and
+    two-word searches as an anonymous visitor and as the author, and then
+    deletes the generated data unless --keep is given. Run it against a
+    scratch database: generating 1M posts takes a few minutes.
+
+    Usage: python manage.py bench_search --posts 1000000 --queries 50
+    """
+    help = 'Benchmark full-text search over generated posts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=1000000,
+            help='Number of posts to generate.')
+        parser.add_argument(
+            '--queries', type=int, default=50,
+            help='Number of searches to time per user.')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Number of posts inserted at a time.')
+        parser.add_argument(
+            '--seed', type=int, default=1,
+            help='Random seed of the generated data and queries.')
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Keep the generated posts for further runs.')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        rng = random.Random(options['seed'])
+        author, created = User.objects.get_or_create(username=USERNAME)
+        existing = Post.objects.filter(author=author).count()
+        if existing < options['posts']:
+            self.generate(author, options['posts'] - existing, rng, options)
+
+        queries = [
+            ' '.join(rng.choices(VOCABULARY[:500], k=rng.choice((1, 2))))
+            for _ in range(options['queries'])]
+        self.stdout.write(
+            f'Backend: {connection.vendor}, '
+            f'{Post.objects.filter(author=author).count()} posts')
+        for label, user in (
+                ('anonymous', AnonymousUser()), ('author', author)):
+            self.time_queries(label, user, queries)
+
+        if not options['keep']:
+            author.delete()
+
+    def generate(self, author, count, rng, options):
+        scrapbook = Scrapbook.objects.create(
+            title='Search benchmark', author=author, status=2)
+        started = time.perf_counter()
+        for start in range(0, count, options['batch_size']):
+            size = min(options['batch_size'], count - start)
+            Post.objects.bulk_create([
+                Post(
+                    title=sentence(rng, 4), content=sentence(rng, 25),
+                    author=author, scrapbook=scrapbook,
+                    slug=f'bench-{start + i}-{rng.getrandbits(32):08x}',
+                    status=rng.choice((0, 1, 2, 2)))
+                for i in range(size)])
+        self.stdout.write(
+            f'Generated {count} posts in '
+            f'{time.perf_counter() - started:.1f}s')
+
+    def time_queries(self, label, user, queries):
+        timings = []
+        for text in queries:
+            started = time.perf_counter()
+            rows = search(user, text)
+            total = rows.count()
+            load_results(rows[:12])
+            timings.append((time.perf_counter() - started) * 1000)
+            if self.verbosity > 1:
+                self.stdout.write(
+                    f'  {text!r}: {total} results, {timings[-1]:.1f} ms')
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f'{label}: median {statistics.median(timings):.1f} ms, '
+            f'p95 {p95:.1f} ms, max {timings[-1]:.1f} ms '
+            f'(count + first page, {len(timings)} queries)')
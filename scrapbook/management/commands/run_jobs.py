@@ -0,0 +1,45 @@
+import time
+from django.core.management.base import BaseCommand
+from scrapbook.jobs import run_pending, worker_name
+
+
+class Command(BaseCommand):
+    """
+    Run queued background jobs, such as storing uploaded images and sharing
+    scrapbooks.
+
+    Any number of workers can run at once; each job is claimed by exactly
+    one of them.
+
+    Usage: python manage.py run_jobs [--once] [--sleep 2]
+    """
+    help = 'Run queued background jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once no jobs are due, instead of polling.')
+        parser.add_argument(
+            '--sleep', type=float, default=2,
+            help='Seconds to wait between polls when no jobs are due.')
+        parser.add_argument(
+            '--max-jobs', type=int, default=None,
+            help='Exit after running this many jobs.')
+
+    def handle(self, *args, **options):
+        worker = worker_name()
+        remaining = options['max_jobs']
+        total = 0
+        try:
+            while remaining is None or remaining > 0:
+                count = run_pending(max_jobs=remaining, worker=worker)
+                total += count
+                if remaining is not None:
+                    remaining -= count
+                if options['once']:
+                    break
+                if not count:
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f'Ran {total} jobs.')
@@ -0,0 +1,171 @@
+import itertools
+import random
+import time
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from scrapbook.models import Post, Scrapbook, SharedAccess
+from scrapbook.page_cache import invalidate_public_pages
+
+# Prefix of the usernames of generated users, used to find them again
+USERNAME_PREFIX = 'seed-'
+
+# Password of every generated user
+PASSWORD = 'seedpass'
+
+# Words the generated titles and content are made of
+VOCABULARY = [f'word{i}' for i in range(2000)]
+
+# Shares of drafts, private and public rows (status 0, 1 and 2)
+STATUS_WEIGHTS = {'scrapbook': (10, 30, 60), 'post': (20, 20, 60)}
+
+# Share of SharedAccess rows that grant a whole scrapbook rather than a post
+SCRAPBOOK_GRANT_SHARE = 0.8
+
+
+def zipf_weights(count):
+    # Cumulative weights under which the first items are picked far more
+    # often than the rest, like the most active users of a real site
+    return list(itertools.accumulate(
+        1 / (rank + 1) for rank in range(count)))
+
+
+def words(rng, length):
+    return ' '.join(rng.choices(VOCABULARY, k=length))
+
+
+class Command(BaseCommand):
+    """
+    Generate users, scrapbooks, posts and shares at a realistic volume.
+
+    Rows are inserted with bulk_create. Activity is skewed: a few users own
+    most scrapbooks, a few scrapbooks hold most posts, and popular
+    scrapbooks are shared most. Generated users are named seed-<run>-<n>
+    and share the password "seedpass"; --clear deletes them and everything
+    they own. Images are left as the placeholder.
+
+    Usage: python manage.py seed_scrapbooks --users 1000 --posts 100000
+    """
+    help = 'Generate scrapbooks, posts and shares for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1000,
+            help='Number of users to generate.')
+        parser.add_argument(
+            '--scrapbooks', type=int, default=10000,
+            help='Number of scrapbooks to generate.')
+        parser.add_argument(
+            '--posts', type=int, default=100000,
+            help='Number of posts to generate.')
+        parser.add_argument(
+            '--shares', type=int, default=20000,
+            help='Number of SharedAccess rows to generate.')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Number of rows inserted at a time.')
+        parser.add_argument(
+            '--seed', type=int, default=1,
+            help='Random seed of the generated data.')
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Delete previously generated data first.')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        rng = random.Random(options['seed'])
+        if options['clear']:
+            deleted, _ = User.objects.filter(
+                username__startswith=USERNAME_PREFIX).delete()
+            self.stdout.write(f'Deleted {deleted} rows')
+
+        started = time.perf_counter()
+        # Unique per run, so slugs and usernames never collide with an
+        # earlier run
+        run = f'{rng.getrandbits(32):08x}'
+        users = self.create_users(run, options['users'])
+        scrapbooks = self.create_scrapbooks(
+            rng, run, users, options['scrapbooks'])
+        posts = self.create_posts(rng, run, scrapbooks, options['posts'])
+        shares = self.create_shares(
+            rng, users, scrapbooks, posts, options['shares'])
+        invalidate_public_pages()
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {len(users)} users, {len(scrapbooks)} scrapbooks, '
+            f'{len(posts)} posts and {shares} shares in '
+            f'{time.perf_counter() - started:.1f}s'))
+
+    def insert(self, model, rows, **kwargs):
+        return model.objects.bulk_create(
+            rows, batch_size=self.batch_size, **kwargs)
+
+    def create_users(self, run, count):
+        # Hashing is slow by design, so all users share one hash
+        password = make_password(PASSWORD)
+        return self.insert(User, [
+            User(
+                username=f'{USERNAME_PREFIX}{run}-{i}',
+                email=f'{USERNAME_PREFIX}{run}-{i}@example.com',
+                password=password)
+            for i in range(count)])
+
+    def create_scrapbooks(self, rng, run, users, count):
+        authors = rng.choices(
+            users, cum_weights=zipf_weights(len(users)), k=count)
+        statuses = rng.choices(
+            (0, 1, 2), weights=STATUS_WEIGHTS['scrapbook'], k=count)
+        return self.insert(Scrapbook, [
+            Scrapbook(
+                title=words(rng, 3).capitalize(),
+                slug=f'seed-{run}-{i}', author=author, status=status,
+                content=f'<p>{words(rng, 30)}</p>')
+            for i, (author, status) in enumerate(zip(authors, statuses))])
+
+    def create_posts(self, rng, run, scrapbooks, count):
+        weights = zipf_weights(len(scrapbooks))
+        posts = []
+        for start in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - start)
+            parents = rng.choices(scrapbooks, cum_weights=weights, k=size)
+            statuses = rng.choices(
+                (0, 1, 2), weights=STATUS_WEIGHTS['post'], k=size)
+            posts += self.insert(Post, [
+                Post(
+                    title=words(rng, 4).capitalize(),
+                    slug=f'seed-{run}-p{start + i}', author=scrapbook.author,
+                    scrapbook=scrapbook, status=status,
+                    content=f'<p>{words(rng, 20)}</p>',
+                    approved=rng.random() < 0.5)
+                for i, (scrapbook, status) in enumerate(
+                    zip(parents, statuses))])
+        return posts
+
+    def create_shares(self, rng, users, scrapbooks, posts, count):
+        shared = [
+            scrapbook for scrapbook in scrapbooks if scrapbook.status != 0]
+        if not shared or len(users) < 2:
+            return 0
+        weights = zipf_weights(len(shared))
+        users_weights = zipf_weights(len(users))
+        posts_by_scrapbook = {}
+        for post in posts:
+            if post.status != 0:
+                posts_by_scrapbook.setdefault(
+                    post.scrapbook_id, []).append(post)
+        rows = []
+        for scrapbook in rng.choices(shared, cum_weights=weights, k=count):
+            user = rng.choices(users, cum_weights=users_weights)[0]
+            if user.id == scrapbook.author_id:
+                continue
+            post = None
+            scrapbook_posts = posts_by_scrapbook.get(scrapbook.id)
+            if scrapbook_posts and rng.random() > SCRAPBOOK_GRANT_SHARE:
+                post = rng.choice(scrapbook_posts)
+            rows.append(SharedAccess(
+                user=user, scrapbook=scrapbook, post=post,
+                shared_by=scrapbook.author))
+        # Repeated picks of the same grant are skipped by the unique
+        # constraints, so count what was actually inserted
+        before = SharedAccess.objects.count()
+        self.insert(SharedAccess, rows, ignore_conflicts=True)
+        return SharedAccess.objects.count() - before
@@ -0,0 +1,38 @@
+from asgiref.sync import (
+    iscoroutinefunction, markcoroutinefunction, sync_to_async)
+from whitenoise.middleware import (
+    WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware)
+
+# Under ASGI, Django runs synchronous-only middleware in a thread and calls
+# the rest of the stack back from it, so third-party middleware that only
+# runs synchronously is given an async path here where possible. allauth's
+# AccountMiddleware is not: allauth requires it under its own name.
+
+
+class WhiteNoiseMiddleware(BaseWhiteNoiseMiddleware):
+    """
+    WhiteNoise's static file middleware, usable under both WSGI and ASGI.
+
+    Under ASGI, requests for anything but a static file pass straight
+    through; static files are opened in a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh or request.path_info in self.files:
+            response = await sync_to_async(
+                self.process_request, thread_sensitive=False)(request)
+            if response is not None:
+                return response
+        return await self.get_response(request)
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.17 on 2026-10-18 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scrapbook', '0013_alter_post_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['scrapbook', '-created_on'], name='post_scrapbook_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['scrapbook', 'status', '-created_on'], name='post_scrapbook_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scrapbook',
+            index=models.Index(fields=['status', '-created_on', '-id'], name='scrapbook_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scrapbook',
+            index=models.Index(fields=['author', '-created_on'], name='scrapbook_author_created_idx'),
+        ),
+    ]
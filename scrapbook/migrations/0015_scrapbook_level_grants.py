@@ -0,0 +1,75 @@
+from django.db import migrations, models
+
+
+def collapse_post_grants(apps, schema_editor):
+    """
+    Replace per-post shares with one scrapbook-level grant per user.
+
+    Duplicate scrapbook-level grants are merged, every user with per-post
+    shares in a scrapbook gets a scrapbook-level grant, and per-post rows
+    for non-draft posts, which the grant now covers, are deleted. Rows for
+    draft posts are kept as explicit exceptions.
+    """
+    SharedAccess = apps.get_model('scrapbook', 'SharedAccess')
+    grants = {}
+    duplicates = []
+    for grant in SharedAccess.objects.filter(
+            post__isnull=True, scrapbook__isnull=False).order_by('id'):
+        key = (grant.user_id, grant.scrapbook_id)
+        if key in grants:
+            duplicates.append(grant.id)
+        else:
+            grants[key] = grant.id
+    SharedAccess.objects.filter(id__in=duplicates).delete()
+
+    missing = {}
+    for user_id, scrapbook_id, shared_by_id in SharedAccess.objects.filter(
+            post__isnull=False, scrapbook__isnull=False).order_by(
+            'id').values_list('user_id', 'scrapbook_id', 'shared_by_id'):
+        key = (user_id, scrapbook_id)
+        if key not in grants and key not in missing:
+            missing[key] = shared_by_id
+    SharedAccess.objects.bulk_create([
+        SharedAccess(
+            user_id=user_id, scrapbook_id=scrapbook_id,
+            shared_by_id=shared_by_id)
+        for (user_id, scrapbook_id), shared_by_id in missing.items()
+    ], batch_size=500)
+
+    SharedAccess.objects.filter(
+        post__isnull=False, scrapbook__isnull=False,
+        post__scrapbook_id=models.F('scrapbook_id'),
+    ).exclude(post__status=0).delete()
+
+
+def expand_scrapbook_grants(apps, schema_editor):
+    # Recreate a per-post share for each non-draft post of a granted
+    # scrapbook
+    SharedAccess = apps.get_model('scrapbook', 'SharedAccess')
+    Post = apps.get_model('scrapbook', 'Post')
+    rows = []
+    for grant in SharedAccess.objects.filter(
+            post__isnull=True, scrapbook__isnull=False):
+        for post_id in Post.objects.filter(
+                scrapbook_id=grant.scrapbook_id).exclude(
+                status=0).values_list('id', flat=True):
+            rows.append(SharedAccess(
+                user_id=grant.user_id, scrapbook_id=grant.scrapbook_id,
+                post_id=post_id, shared_by_id=grant.shared_by_id))
+    SharedAccess.objects.bulk_create(
+        rows, batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scrapbook', '0014_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(collapse_post_grants, expand_scrapbook_grants),
+        migrations.AddConstraint(
+            model_name='sharedaccess',
+            constraint=models.UniqueConstraint(condition=models.Q(('post__isnull', True)), fields=('user', 'scrapbook'), name='unique_scrapbook_grant'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.17 on 2026-10-18 19:31
+
+from django.db import migrations, models
+import scrapbook.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scrapbook', '0015_scrapbook_level_grants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.FileField(default='placeholder', max_length=255, storage=scrapbook.storage.ImageStorage(), upload_to=scrapbook.storage.image_upload_to, verbose_name='post_image'),
+        ),
+        migrations.AlterField(
+            model_name='scrapbook',
+            name='image',
+            field=models.FileField(default='placeholder', max_length=255, storage=scrapbook.storage.ImageStorage(), upload_to=scrapbook.storage.image_upload_to, verbose_name='scrapbook_image'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.17 on 2026-10-18 19:39
+
+from django.db import migrations, models
+
+
+def move_full_size(apps, schema_editor):
+    # The size of the original image used to be recorded in the renditions
+    # under 'full'; it now has its own fields
+    for model_name in ('Scrapbook', 'Post'):
+        model = apps.get_model('scrapbook', model_name)
+        rows = []
+        for obj in model.objects.exclude(image_renditions={}).only(
+                'id', 'image_renditions'):
+            full = obj.image_renditions.pop('full', None)
+            if full:
+                obj.image_width = full['width']
+                obj.image_height = full['height']
+                rows.append(obj)
+        model.objects.bulk_update(
+            rows, ['image_renditions', 'image_width', 'image_height'],
+            batch_size=500)
+
+
+def restore_full_size(apps, schema_editor):
+    for model_name in ('Scrapbook', 'Post'):
+        model = apps.get_model('scrapbook', model_name)
+        rows = []
+        for obj in model.objects.filter(image_width__isnull=False).only(
+                'id', 'image_renditions', 'image_width', 'image_height'):
+            obj.image_renditions['full'] = {
+                'width': obj.image_width, 'height': obj.image_height}
+            rows.append(obj)
+        model.objects.bulk_update(rows, ['image_renditions'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scrapbook', '0017_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_lqip',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='scrapbook',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='scrapbook',
+            name='image_lqip',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='scrapbook',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(move_full_size, restore_full_size),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    from scrapbook.search import install_search_index
+    install_search_index(schema_editor.connection)
+
+
+def remove(apps, schema_editor):
+    from scrapbook.search import remove_search_index
+    remove_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    """
+    Add the full-text search index of scrapbooks and posts: a generated
+    tsvector column with a GIN index on PostgreSQL, or an FTS5 table kept
+    in sync by triggers on SQLite. The index is not part of the model
+    state, since it differs between database backends.
+    """
+
+    dependencies = [
+        ('scrapbook', '0019_job_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, remove),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# Case-insensitive prefix indexes for the recipient search, matching the
+# SQL Django generates for username__istartswith and email__istartswith
+INDEXES = {
+    'postgresql': (
+        'CREATE INDEX IF NOT EXISTS auth_user_{column}_prefix_idx '
+        'ON auth_user (UPPER({column}::text) text_pattern_ops)'),
+    'sqlite': (
+        'CREATE INDEX IF NOT EXISTS auth_user_{column}_prefix_idx '
+        'ON auth_user ({column} COLLATE NOCASE)'),
+}
+
+
+def create_indexes(apps, schema_editor):
+    sql = INDEXES.get(schema_editor.connection.vendor)
+    if sql:
+        for column in ('username', 'email'):
+            schema_editor.execute(sql.format(column=column))
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor in INDEXES:
+        for column in ('username', 'email'):
+            schema_editor.execute(
+                f'DROP INDEX IF EXISTS auth_user_{column}_prefix_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('scrapbook', '0020_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -1,9 +1,12 @@
-from cloudinary.models import CloudinaryField
-from django.db import models
+from django.db import (
+    IntegrityError, connections, models, router, transaction)
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from django.utils.text import slugify
 import uuid
+from .images import store_image_data
+from .storage import PLACEHOLDER, image_storage, image_upload_to
 
 # Status choices for Scrapbook and Post models
 STATUS = (
@@ -13,12 +16,89 @@ STATUS = (
 )
 
 
+# Number of suffixed slugs tried before a slug collision is re-raised
+SLUG_ATTEMPTS = 5
+
+# Path segments used by the site's own URLs. A scrapbook or post slugged
+# like one would be shadowed by that route (e.g. /search/), so generated
+# slugs get a suffix instead. test_models checks it against the URLconfs.
+RESERVED_SLUGS = frozenset({
+    'about', 'accounts', 'admin', 'create-post', 'create-scrapbook',
+    'delete-post', 'delete-scrapbook', 'edit-post', 'edit-scrapbook',
+    'media', 'my-scrapbooks', 'recipients', 'scrapbook', 'search', 'share',
+    'shared', 'shared-scrapbooks', 'static', 'summernote',
+    'trigger-403-error', 'trigger-500-error',
+})
+
+
 # Validates the status field in Scrapbook and Post models
 def validate_status(value):
     if value not in [0, 1, 2]:
         raise ValidationError(f'{value} is not a valid status')
 
 
+def suffixed_slug(base, max_length):
+    # The slug with a random suffix, within the field's max_length
+    return f"{base[:max_length - 9]}-{uuid.uuid4().hex[:8]}"
+
+
+def is_slug_collision(instance, error, using=None):
+    """
+    Return whether an IntegrityError is the instance's slug unique
+    constraint failing, rather than any other constraint.
+
+    PostgreSQL reports the name of the failing constraint, which is looked
+    up among the table's constraints; SQLite only names the column.
+    """
+    table = instance._meta.db_table
+    column = instance._meta.get_field('slug').column
+    diag = getattr(error.__cause__, 'diag', None)
+    name = getattr(diag, 'constraint_name', None)
+    if name is None:
+        return str(error) == f'UNIQUE constraint failed: {table}.{column}'
+    connection = connections[
+        using or router.db_for_write(type(instance), instance=instance)]
+    with connection.cursor() as cursor:
+        constraint = connection.introspection.get_constraints(
+            cursor, table).get(name, {})
+    return bool(constraint.get('unique')) and constraint.get(
+        'columns') == [column]
+
+
+def save_with_unique_slug(instance, save, *args, **kwargs):
+    """
+    Save a Scrapbook or Post, generating a unique slug from its title.
+
+    Rather than probing for an existing slug before the insert, the slug
+    is written directly and a collision is detected by the unique index.
+    Each attempt runs in a savepoint; on a slug collision (see
+    is_slug_collision) a random suffix is added and the save retried. This
+    costs no extra query in the common case and is safe when concurrent
+    workers save the same title. Titles that slugify to a RESERVED_SLUGS
+    word get a suffix straight away.
+
+    Arguments:
+    instance -- The model instance being saved.
+    save -- The parent class's bound save method.
+    """
+    if instance.slug:
+        return save(*args, **kwargs)
+    max_length = instance._meta.get_field('slug').max_length
+    base = slugify(instance.title)
+    instance.slug = base[:max_length]
+    if instance.slug in RESERVED_SLUGS:
+        instance.slug = suffixed_slug(base, max_length)
+    for attempt in range(SLUG_ATTEMPTS):
+        try:
+            with transaction.atomic(using=kwargs.get('using')):
+                return save(*args, **kwargs)
+        except IntegrityError as error:
+            if (attempt == SLUG_ATTEMPTS - 1 or not is_slug_collision(
+                    instance, error, kwargs.get('using'))):
+                raise
+            instance.slug = suffixed_slug(base, max_length)
+
+
 class Scrapbook(models.Model):
     """
     Stores a single scrapbook entry related to :model:`auth.User`.
@@ -28,7 +108,16 @@ class Scrapbook(models.Model):
     Attributes:
         title: A CharField that stores the title of the scrapbook.
         slug: A SlugField that stores the unique slug of the scrapbook.
-        image: A CloudinaryField that stores the image of the scrapbook.
+        image: A FileField that stores the image of the scrapbook in the
+            configured image storage.
+        image_renditions: A JSONField that records the resized renditions
+            of the image.
+        image_width: A PositiveIntegerField that stores the width of the
+            image in pixels.
+        image_height: A PositiveIntegerField that stores the height of the
+            image in pixels.
+        image_lqip: A TextField that stores a tiny placeholder of the image
+            as a data URI.
         content: A TextField that stores the content of the scrapbook.
         created_on: A DateTimeField that stores the date and time the 
             scrapbook was created.
@@ -41,7 +130,9 @@ class Scrapbook(models.Model):
         __str__: Returns an f-string with the title and author of the
             scrapbook.
         save: Overrides the save method to automatically generate a unique
-            slug for the instance if it does not already have one.
+            slug for the instance if it does not already have one, and to
+            store the size, placeholder and renditions of a newly uploaded
+            image.
         
     Meta:
         ordering: Orders scrapbooks from newest to oldest.
@@ -49,7 +140,16 @@ class Scrapbook(models.Model):
     """
     title = models.CharField(max_length=100)
     slug = models.SlugField(max_length=100, unique=True)
-    image = CloudinaryField('scrapbook_image', default='placeholder')
+    image = models.FileField(
+        'scrapbook_image', max_length=255, default=PLACEHOLDER,
+        upload_to=image_upload_to, storage=image_storage)
+    image_renditions = models.JSONField(
+        default=dict, blank=True, editable=False)
+    image_width = models.PositiveIntegerField(
+        null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(
+        null=True, blank=True, editable=False)
+    image_lqip = models.TextField(blank=True, editable=False)
     content = models.TextField(blank=True)
     created_on = models.DateTimeField(auto_now_add=True)
     updated_on = models.DateTimeField(auto_now=True)
@@ -60,6 +160,16 @@ class Scrapbook(models.Model):
     # orders scrapbooks from newest to oldest
     class Meta:
         ordering = ["-created_on"]
+        indexes = [
+            # Public feed: status=2 ORDER BY created_on DESC, id DESC
+            models.Index(
+                fields=['status', '-created_on', '-id'],
+                name='scrapbook_status_created_idx'),
+            # My scrapbooks: author=? ORDER BY created_on DESC
+            models.Index(
+                fields=['author', '-created_on'],
+                name='scrapbook_author_created_idx'),
+        ]
 
     # returns f-string with title and author from dataset
     def __str__(self):
@@ -67,12 +177,9 @@ class Scrapbook(models.Model):
 
     def save(self, *args, **kwargs):
         self.title = self.title.strip()  # Trim leading and trailing spaces
+        store_image_data(self)
         # Automatically generate a unique slug if it does not exist
-        if not self.slug:
-            self.slug = slugify(self.title)
-            if Scrapbook.objects.filter(slug=self.slug).exists():
-                self.slug = f"{self.slug}-{uuid.uuid4().hex[:8]}"
-        super().save(*args, **kwargs)
+        save_with_unique_slug(self, super().save, *args, **kwargs)
 
 
 class Post(models.Model):
@@ -88,7 +195,16 @@ class Post(models.Model):
         author: A ForeignKey that stores the author of the post.
         title: A CharField that stores the title of the post.
         slug: A SlugField that stores the unique slug of the post.
-        image: A CloudinaryField that stores the image of the post.
+        image: A FileField that stores the image of the post in the
+            configured image storage.
+        image_renditions: A JSONField that records the resized renditions
+            of the image.
+        image_width: A PositiveIntegerField that stores the width of the
+            image in pixels.
+        image_height: A PositiveIntegerField that stores the height of the
+            image in pixels.
+        image_lqip: A TextField that stores a tiny placeholder of the image
+            as a data URI.
         created_on: A DateTimeField that stores the date and time the post
             was created.
         updated_on: A DateTimeField that stores the date and time the post
@@ -101,7 +217,9 @@ class Post(models.Model):
         __str__: Returns an f-string with the title, scrapbook title and author
             of the post.
         save: Overrides the save method to automatically generate a unique
-            slug for the instance if it does not already have one.
+            slug for the instance if it does not already have one, and to
+            store the size, placeholder and renditions of a newly uploaded
+            image.
     
     Meta:
         ordering: Orders posts from newest to oldest.
@@ -113,7 +231,16 @@ class Post(models.Model):
         User, on_delete=models.CASCADE, related_name="post_author")
     title = models.CharField(max_length=100)
     slug = models.SlugField(max_length=100, unique=True)
-    image = CloudinaryField('post_image', default='placeholder')
+    image = models.FileField(
+        'post_image', max_length=255, default=PLACEHOLDER,
+        upload_to=image_upload_to, storage=image_storage)
+    image_renditions = models.JSONField(
+        default=dict, blank=True, editable=False)
+    image_width = models.PositiveIntegerField(
+        null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(
+        null=True, blank=True, editable=False)
+    image_lqip = models.TextField(blank=True, editable=False)
     created_on = models.DateTimeField(auto_now_add=True)
     updated_on = models.DateTimeField(auto_now=True)
     status = models.IntegerField(choices=STATUS, default=0)
@@ -123,6 +250,17 @@ class Post(models.Model):
     # orders posts from newest to oldest
     class Meta:
         ordering = ["-created_on"]
+        indexes = [
+            # Posts in a scrapbook: scrapbook=? ORDER BY created_on DESC
+            models.Index(
+                fields=['scrapbook', '-created_on'],
+                name='post_scrapbook_created_idx'),
+            # Posts in a scrapbook by status: scrapbook=? AND status=?
+            # ORDER BY created_on DESC, and the public post counts
+            models.Index(
+                fields=['scrapbook', 'status', '-created_on'],
+                name='post_scrapbook_status_idx'),
+        ]
 
     # returns f-string with title, scrapbook title and author from dataset
     def __str__(self):
@@ -131,11 +269,8 @@ class Post(models.Model):
     
     def save(self, *args, **kwargs):
         self.title = self.title.strip()
-        if not self.slug:
-            self.slug = slugify(self.title)
-            if Post.objects.filter(slug=self.slug).exists():
-                self.slug = f"{self.slug}-{uuid.uuid4().hex[:8]}"
-        super().save(*args, **kwargs)
+        store_image_data(self)
+        save_with_unique_slug(self, super().save, *args, **kwargs)
 
 
 class SharedAccess(models.Model):
@@ -145,7 +280,10 @@ class SharedAccess(models.Model):
     :model:`auth.User`.
 
     Shared access entries are used to share scrapbooks and posts with other
-    users.
+    users. An entry without a post is a scrapbook-level grant, which gives
+    access to every non-draft post in the scrapbook, including posts added
+    after it was shared. Entries with a post are only stored for explicit
+    per-post exceptions that the scrapbook grant does not already cover.
 
     Attributes:
         user: A ForeignKey that stores the user the shared access belongs to.
@@ -171,14 +309,91 @@ class SharedAccess(models.Model):
 
     class Meta:
         # Ensures that a user can only have one shared access
-        # to a scrapbook
+        # to each post of a scrapbook. The constraint's index also serves
+        # the (user, scrapbook) and (user, scrapbook, post) access checks.
+        # NULL posts are not covered by it, so scrapbook-level grants have
+        # their own partial constraint.
         constraints = [
             models.UniqueConstraint(
-                fields=['user', 'scrapbook' ],
-                name='unique_shared_access')
+                fields=['user', 'scrapbook', 'post'],
+                name='unique_shared_access'),
+            models.UniqueConstraint(
+                fields=['user', 'scrapbook'],
+                condition=models.Q(post__isnull=True),
+                name='unique_scrapbook_grant'),
         ]
 
     def __str__(self):
         # returns f-string with username, scrapbook title and post title
         return f"{self.user.username} | {
             self.scrapbook.title if self.scrapbook else 'No Scrapbook'}"
+
+
+# Status choices for the Job model
+JOB_STATUS = (
+    (0, "Queued"),
+    (1, "Running"),
+    (2, "Done"),
+    (3, "Failed")
+)
+
+
+class Job(models.Model):
+    """
+    Stores a single background job, run by the run_jobs management command.
+
+    Jobs are claimed by a worker, run, and either marked done or queued
+    again with a delay until they run out of attempts.
+
+    Attributes:
+        name: A CharField that stores the name of the task to run.
+        payload: A JSONField that stores the keyword arguments of the task.
+        data: A BinaryField that stores any file the task needs, such as
+            an uploaded image waiting to be stored.
+        status: An IntegerField that stores the status of the job.
+        attempts: A PositiveIntegerField that stores how often the job has
+            been started.
+        max_attempts: A PositiveIntegerField that stores how often the job
+            may be started before it fails.
+        run_after: A DateTimeField that stores when the job may next run.
+        locked_by: A CharField that stores the worker running the job.
+        locked_at: A DateTimeField that stores when the job was claimed.
+        last_error: A TextField that stores the traceback of the last
+            failed attempt.
+        created_on: A DateTimeField that stores the date and time the job
+            was queued.
+        updated_on: A DateTimeField that stores the date and time the job
+            was last updated.
+
+    Methods:
+        __str__: Returns an f-string with the name and status of the job.
+
+    Meta:
+        ordering: Orders jobs from newest to oldest.
+
+    """
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    data = models.BinaryField(null=True, blank=True)
+    status = models.IntegerField(choices=JOB_STATUS, default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+    updated_on = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_on"]
+        indexes = [
+            # Next job to claim: status=0 AND run_after<=now
+            # ORDER BY run_after, id
+            models.Index(
+                fields=['status', 'run_after', 'id'],
+                name='job_status_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} | {self.get_status_display()}"
@@ -0,0 +1,154 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date, urlencode
+from .timing import record_cache_lookup
+
+# Key holding the current generation of cached public pages. Every entry is
+# keyed by the generation, so replacing it invalidates all pages at once.
+GENERATION_KEY = 'public-pages:generation'
+
+# Session key used by the session message storage
+MESSAGES_SESSION_KEY = '_messages'
+
+# Query parameters that select what a cached page shows. Others are left
+# out of the key, so arbitrary query strings cannot fill the cache.
+PAGE_QUERY_PARAMS = ('page', 'cursor')
+
+
+def page_cache_timeout():
+    return getattr(settings, 'SCRAPBOOK_PAGE_CACHE_TIMEOUT', 0)
+
+
+def get_generation():
+    return cache.get_or_set(GENERATION_KEY, time.time_ns(), None)
+
+
+def invalidate_public_pages():
+    """
+    Drop every cached anonymous page.
+
+    A new generation is used rather than incrementing the old one, so a
+    generation that was evicted from the cache can never resurrect stale
+    pages.
+    """
+    cache.set(GENERATION_KEY, time.time_ns(), None)
+
+
+def page_cache_key(request, generation):
+    query = urlencode([
+        (name, request.GET[name]) for name in PAGE_QUERY_PARAMS
+        if name in request.GET])
+    path = hashlib.md5(f'{request.path}?{query}'.encode()).hexdigest()
+    return f'public-page:{generation}:{path}'
+
+
+def is_cacheable_request(request):
+    # Only anonymous GET/HEAD requests without pending messages share pages
+    return (
+        page_cache_timeout() > 0 and
+        request.method in ('GET', 'HEAD') and
+        not request.user.is_authenticated and
+        MESSAGES_SESSION_KEY not in request.session)
+
+
+def newest_update(context):
+    """
+    Return the newest updated_on of the objects shown on a page.
+
+    Considers the page's main object and every object on the current page
+    of the listing, if there is one.
+    """
+    objects = list(context.get('page_obj') or [])
+    if context.get('object') is not None:
+        objects.append(context['object'])
+    return max((obj.updated_on for obj in objects), default=None)
+
+
+def make_etag(generation, last_modified):
+    stamp = last_modified.isoformat() if last_modified else ''
+    digest = hashlib.md5(f'{generation}|{stamp}'.encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def lookup_page(request):
+    """
+    Look up the cached copy of an anonymous page.
+
+    Returns (key, generation, entry), where entry is None on a miss.
+    """
+    generation = get_generation()
+    key = page_cache_key(request, generation)
+    entry = cache.get(key)
+    record_cache_lookup(entry is not None)
+    return key, generation, entry
+
+
+def store_page(request, key, generation, response):
+    """
+    Render and cache a response to an anonymous request.
+
+    Returns the cache entry, or None if the response may not be shared.
+    """
+    if hasattr(response, 'render'):
+        response.render()
+    if (response.status_code != 200 or response.cookies or
+            request.META.get('CSRF_COOKIE_NEEDS_UPDATE')):
+        return None
+    entry = {
+        'content': response.content,
+        'content_type': response['Content-Type'],
+    }
+    if response.has_header('ETag'):
+        # Reuse the validators of views that compute their own
+        entry['etag'] = response['ETag']
+        entry['last_modified'] = parse_http_date(response['Last-Modified'])
+    else:
+        last_modified = newest_update(
+            getattr(response, 'context_data', None) or {})
+        entry['etag'] = make_etag(generation, last_modified)
+        entry['last_modified'] = (
+            int(last_modified.timestamp()) if last_modified else None)
+    cache.set(key, entry, page_cache_timeout())
+    return entry
+
+
+def page_response(request, entry):
+    # Answer a request from a cache entry, with a 304 when it still matches
+    response = HttpResponse(
+        entry['content'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    if entry['last_modified'] is not None:
+        response['Last-Modified'] = http_date(entry['last_modified'])
+    return get_conditional_response(
+        request, etag=entry['etag'], last_modified=entry['last_modified'],
+        response=response)
+
+
+class AnonymousPageCacheMixin:
+    """
+    Serve anonymous visitors a cached copy of the whole response.
+
+    Pages are cached per path and page number or cursor, so each page of a
+    listing gets its own entry; other query parameters are ignored.
+    Responses carry an ETag and Last-Modified header derived from the
+    newest updated_on on the page, and conditional requests are answered
+    with a 304. The cache is invalidated whenever a public scrapbook or any
+    post in one changes (see scrapbook.signals).
+
+    Only 200 responses that set no cookies are stored.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        if not is_cacheable_request(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        key, generation, entry = lookup_page(request)
+        if entry is None:
+            response = super().dispatch(request, *args, **kwargs)
+            entry = store_page(request, key, generation, response)
+            if entry is None:
+                return response
+        return page_response(request, entry)
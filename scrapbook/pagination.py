@@ -0,0 +1,242 @@
+import base64
+import binascii
+from datetime import datetime
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import (
+    EmptyPage, Page, PageNotAnInteger, Paginator)
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# Cursor directions encoded in the token
+FORWARD = 'n'
+BACKWARD = 'p'
+
+# Largest id a cursor may hold, that of a BigAutoField
+MAX_CURSOR_ID = 2 ** 63 - 1
+
+# Tables with more rows than this are not counted by EstimatedCountPaginator
+ESTIMATE_THRESHOLD = 100000
+
+
+def cursor_pagination_enabled(request):
+    """
+    Whether a listing should use cursor pagination for this request.
+
+    Cursor pagination is opt-in, either site-wide through the
+    SCRAPBOOK_CURSOR_PAGINATION setting or per request with a ``cursor``
+    query parameter (which may be empty for the first page).
+    """
+    return (
+        getattr(settings, 'SCRAPBOOK_CURSOR_PAGINATION', False) or
+        'cursor' in request.GET)
+
+
+def encode_cursor(obj, direction):
+    # Build an opaque token from the (created_on, id) key of a row
+    raw = f'{direction}|{obj.created_on.isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Decode a cursor token into (direction, created_on, id).
+
+    Returns None for a missing or malformed token, which is treated as a
+    request for the first page. Tokens with a naive timestamp or an id out
+    of the database's range are malformed too.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, created_on, pk = raw.split('|')
+        created_on, pk = datetime.fromisoformat(created_on), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if (direction not in (FORWARD, BACKWARD) or created_on.tzinfo is None
+            or not 0 < pk <= MAX_CURSOR_ID):
+        return None
+    return direction, created_on, pk
+
+
+class CursorPage:
+    """
+    A page of results from a CursorPaginator.
+
+    Mirrors the parts of django.core.paginator.Page used by the templates,
+    with next_cursor and previous_cursor tokens in place of page numbers.
+    """
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return encode_cursor(self.object_list[-1], FORWARD)
+        return ''
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return encode_cursor(self.object_list[0], BACKWARD)
+        return ''
+
+
+class CursorPaginator:
+    """
+    Keyset paginator over ``(created_on, id)``, newest first.
+
+    Each page is a single range query that fetches one extra row to detect
+    whether another page follows, so no COUNT query is issued and the cost
+    of a page does not depend on how deep it is.
+    """
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def get_page(self, token):
+        cursor = decode_cursor(token)
+        queryset = self.queryset.order_by('-created_on', '-id')
+        if cursor is None:
+            rows = list(queryset[:self.per_page + 1])
+            return CursorPage(
+                rows[:self.per_page], len(rows) > self.per_page, False)
+
+        direction, created_on, pk = cursor
+        if direction == FORWARD:
+            rows = list(queryset.filter(
+                Q(created_on__lt=created_on) |
+                Q(created_on=created_on, id__lt=pk)
+            )[:self.per_page + 1])
+            return CursorPage(
+                rows[:self.per_page], len(rows) > self.per_page, True)
+
+        rows = list(queryset.filter(
+            Q(created_on__gt=created_on) |
+            Q(created_on=created_on, id__gt=pk)
+        ).order_by('created_on', 'id')[:self.per_page + 1])
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return CursorPage(rows, True, has_previous)
+
+
+def paginate(request, queryset, per_page):
+    """
+    Return the requested page of a queryset.
+
+    Uses cursor pagination when it is enabled for the request and the
+    standard offset paginator otherwise.
+    """
+    if cursor_pagination_enabled(request):
+        return CursorPaginator(queryset, per_page).get_page(
+            request.GET.get('cursor'))
+    return Paginator(queryset, per_page).get_page(request.GET.get('page'))
+
+
+async def apaginate(request, queryset, per_page):
+    """
+    Async version of paginate, for async views.
+
+    The offset paginator's count and page rows are fetched with the async
+    ORM. Invalid page numbers get the first or last page, as with
+    Paginator.get_page.
+    """
+    if cursor_pagination_enabled(request):
+        return await sync_to_async(
+            CursorPaginator(queryset, per_page).get_page)(
+            request.GET.get('cursor'))
+    paginator = Paginator(queryset, per_page)
+    paginator.count = await queryset.acount()
+    try:
+        number = paginator.validate_number(request.GET.get('page') or 1)
+    except PageNotAnInteger:
+        number = 1
+    except EmptyPage:
+        number = paginator.num_pages
+    bottom = (number - 1) * per_page
+    rows = [obj async for obj in queryset[bottom:bottom + per_page]]
+    return Page(rows, number, paginator)
+
+
+class CursorPaginationMixin:
+    """
+    ListView mixin that switches to cursor pagination when enabled.
+
+    Methods:
+    paginate_queryset -- Paginate by cursor instead of page number.
+    get_context_data -- Tell the templates which pagination mode is used.
+    """
+    def paginate_queryset(self, queryset, page_size):
+        if not cursor_pagination_enabled(self.request):
+            return super().paginate_queryset(queryset, page_size)
+        page = CursorPaginator(queryset, page_size).get_page(
+            self.request.GET.get('cursor'))
+        return (None, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cursor_pagination'] = cursor_pagination_enabled(
+            self.request)
+        return context
+
+
+def estimated_row_count(model, using):
+    """
+    Return the planner's estimate of the number of rows in a model's table.
+
+    Only PostgreSQL keeps such an estimate (updated by VACUUM and ANALYZE).
+    Returns None on other database backends, or if the table has not been
+    analyzed yet.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [model._meta.db_table])
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for admin changelists of large tables.
+
+    An exact COUNT(*) reads the whole table, which is the slowest query of
+    an unfiltered changelist once a table has millions of rows. When the
+    queryset is unfiltered and the table is estimated to hold more than
+    ESTIMATE_THRESHOLD rows, the estimate is used as the count instead.
+    Filtered querysets are still counted exactly.
+    """
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'query') and not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
@@ -0,0 +1,164 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from .models import SharedAccess
+from .timing import record_cache_lookup
+
+# Attribute used to memoize access sets on the current request
+REQUEST_CACHE_ATTR = '_scrapbook_access'
+
+
+class ScrapbookAccess:
+    """
+    The access a single user has to a single scrapbook.
+
+    Visibility rules:
+    - A public scrapbook (status 2) can be viewed by anyone.
+    - The author can view the scrapbook and all of its posts.
+    - A scrapbook-level SharedAccess grant gives access to the scrapbook
+      and to all of its non-draft posts.
+    - A per-post SharedAccess row gives access to that post and to the
+      scrapbook it belongs to.
+
+    Attributes:
+    scrapbook -- The scrapbook the access applies to.
+    user -- The user the access was resolved for.
+    is_author -- Whether the user wrote the scrapbook.
+    has_grant -- Whether the whole scrapbook has been shared with the user.
+    shared_post_ids -- The ids of posts shared individually with the user.
+    is_shared -- Whether anything in the scrapbook is shared with the user.
+    level -- A short string describing the access, for cache validators.
+
+    Methods:
+    can_view -- Whether the user may view the scrapbook.
+    is_post_shared -- Whether a post has been shared with the user.
+    can_view_post -- Whether the user may view a post in the scrapbook.
+    """
+    def __init__(self, scrapbook, user, has_grant=False,
+                 shared_post_ids=frozenset()):
+        self.scrapbook = scrapbook
+        self.user = user
+        self.is_author = (
+            user.is_authenticated and scrapbook.author_id == user.id)
+        self.has_grant = has_grant
+        self.shared_post_ids = frozenset(shared_post_ids)
+
+    @property
+    def is_public(self):
+        return self.scrapbook.status == 2
+
+    @property
+    def is_shared(self):
+        return self.has_grant or bool(self.shared_post_ids)
+
+    @property
+    def level(self):
+        if self.is_author:
+            return 'author'
+        if self.has_grant:
+            return 'grant'
+        if self.shared_post_ids:
+            return 'posts:' + ','.join(map(str, sorted(self.shared_post_ids)))
+        return 'public'
+
+    def can_view(self):
+        return self.is_public or self.is_author or self.is_shared
+
+    def is_post_shared(self, post):
+        if self.has_grant and post.status != 0:
+            return True
+        return post.id in self.shared_post_ids
+
+    def can_view_post(self, post):
+        if post.status == 2 or self.is_post_shared(post):
+            return True
+        return self.user.is_authenticated and post.author_id == self.user.id
+
+
+def visible_scrapbooks(user):
+    """
+    Return a Q object matching the scrapbooks a user may view.
+
+    The queryset form of ScrapbookAccess.can_view, for listings that cover
+    many scrapbooks at once, such as search results.
+    """
+    visible = Q(status=2)
+    if user.is_authenticated:
+        visible |= Q(author=user) | Q(id__in=SharedAccess.objects.filter(
+            user=user).values('scrapbook'))
+    return visible
+
+
+def visible_posts(user):
+    """
+    Return a Q object matching the posts a user may view.
+
+    The queryset form of ScrapbookAccess.can_view_post.
+    """
+    visible = Q(status=2)
+    if user.is_authenticated:
+        visible |= (
+            Q(author=user) |
+            Q(id__in=SharedAccess.objects.filter(
+                user=user, post__isnull=False).values('post')) |
+            (Q(scrapbook__in=SharedAccess.objects.filter(
+                user=user, post__isnull=True).values('scrapbook')) &
+             ~Q(status=0)))
+    return visible
+
+
+def access_cache_key(user_id, scrapbook_id):
+    # Key for the cross-request cache of a user's shares in a scrapbook
+    return f'scrapbook-access:{user_id}:{scrapbook_id}'
+
+
+def invalidate_access(user_id, scrapbook_id):
+    """
+    Drop the cached shares of a user in a scrapbook.
+
+    Called whenever a SharedAccess row is written or deleted, including by
+    bulk operations that do not send model signals.
+    """
+    cache.delete(access_cache_key(user_id, scrapbook_id))
+
+
+def _load_shares(user, scrapbook):
+    # Return (has_grant, shared_post_ids) using a single query, consulting
+    # the cross-request cache first when it is enabled
+    timeout = getattr(settings, 'SCRAPBOOK_ACCESS_CACHE_TIMEOUT', 0)
+    key = access_cache_key(user.id, scrapbook.pk)
+    if timeout:
+        cached = cache.get(key)
+        record_cache_lookup(cached is not None)
+        if cached is not None:
+            return cached
+    post_ids = list(SharedAccess.objects.filter(
+        user=user, scrapbook=scrapbook).values_list('post_id', flat=True))
+    shares = (
+        None in post_ids,
+        frozenset(post_id for post_id in post_ids if post_id is not None))
+    if timeout:
+        cache.set(key, shares, timeout)
+    return shares
+
+
+def get_scrapbook_access(request, scrapbook):
+    """
+    Resolve the access the requesting user has to a scrapbook.
+
+    The result is memoized on the request, so repeated checks within a
+    view cost no further queries. Anonymous users never issue a query.
+    """
+    memo = getattr(request, REQUEST_CACHE_ATTR, None)
+    if memo is None:
+        memo = {}
+        setattr(request, REQUEST_CACHE_ATTR, memo)
+    if scrapbook.pk not in memo:
+        user = request.user
+        if user.is_authenticated:
+            has_grant, shared_post_ids = _load_shares(user, scrapbook)
+        else:
+            has_grant, shared_post_ids = False, frozenset()
+        memo[scrapbook.pk] = ScrapbookAccess(
+            scrapbook, user, has_grant, shared_post_ids)
+    return memo[scrapbook.pk]
@@ -0,0 +1,63 @@
+from django import forms
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+# Shortest query the recipient search answers
+MIN_QUERY_LENGTH = 2
+
+
+def recipient_limit():
+    # Most users returned by one recipient search
+    return getattr(settings, 'SCRAPBOOK_RECIPIENT_LIMIT', 10)
+
+
+def recipient_queryset(shared_by):
+    # Users a scrapbook can be shared with: active users other than the
+    # one sharing it
+    return User.objects.filter(is_active=True).exclude(id=shared_by.id)
+
+
+def find_recipients(shared_by, query, limit=None):
+    """
+    Find users to share a scrapbook with by the start of their username.
+
+    Queries containing "@" match the start of the email address instead,
+    so addresses cannot be discovered by searching for a name. Both
+    lookups are served by the case-insensitive prefix indexes on auth_user
+    (see migration 0021). Only the id and username of each user are
+    returned.
+
+    Returns a list of at most limit dicts, ordered by username.
+    """
+    query = query.strip()
+    if len(query) < MIN_QUERY_LENGTH:
+        return []
+    lookup = 'email__istartswith' if '@' in query else 'username__istartswith'
+    return list(recipient_queryset(shared_by).filter(
+        **{lookup: query}).order_by('username').values(
+        'id', 'username')[:limit or recipient_limit()])
+
+
+class RecipientWidget(forms.Widget):
+    """
+    A typeahead for choosing a user, in place of a select of every user.
+
+    Renders a hidden input holding the chosen user's id and a text input
+    that queries the recipient_search view as the user types (see
+    static/js/recipient-picker.js). Only the submitted id is validated.
+    """
+    template_name = 'scrapbook/widgets/recipient.html'
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['search_url'] = reverse('recipient_search')
+        context['widget']['min_length'] = MIN_QUERY_LENGTH
+        # Show the username of a submitted id when the form is redisplayed
+        try:
+            pk = int(value)
+        except (TypeError, ValueError):
+            pk = None
+        context['widget']['username'] = pk and User.objects.filter(
+            pk=pk).values_list('username', flat=True).first() or ''
+        return context
@@ -0,0 +1,170 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+# Cookie holding the time until which a client's reads stay on the primary
+PIN_COOKIE = 'db_pin'
+
+# Models that are always read from the primary
+PRIMARY_ONLY_MODELS = ('scrapbook.job',)
+
+# Routing state of the request being handled
+_state = ContextVar('scrapbook_db_routing', default=None)
+
+
+def replica_aliases():
+    # Database aliases of the read replicas, see SCRAPBOOK_REPLICAS
+    return getattr(settings, 'SCRAPBOOK_REPLICAS', [])
+
+
+def pin_seconds():
+    # How long a client reads from the primary after writing
+    return getattr(settings, 'SCRAPBOOK_REPLICA_PIN_SECONDS', 10)
+
+
+class RoutingState:
+    """
+    Where the reads of one request go.
+
+    Attributes:
+    pinned -- The client wrote recently, so all reads use the primary.
+    replica -- The replica alias this request reads from, if any.
+    replica_reads -- Reads are currently allowed on the replica, see
+    replica_reads().
+    wrote -- The request has written to a scrapbook model.
+    """
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        aliases = replica_aliases()
+        self.replica = random.choice(aliases) if aliases else None
+        self.replica_reads = False
+        self.wrote = False
+
+
+@contextmanager
+def replica_reads():
+    """
+    Let the scrapbook reads inside the block use a replica.
+
+    Has no effect outside a request, when no replica is configured, or
+    when the client is pinned to the primary.
+    """
+    state = _state.get()
+    if state is None or state.replica_reads:
+        yield
+        return
+    state.replica_reads = True
+    try:
+        yield
+    finally:
+        state.replica_reads = False
+
+
+class ReplicaRouter:
+    """
+    Database router that sends safe reads to a read replica.
+
+    Reads of the scrapbook models go to a replica only inside
+    replica_reads(), which ReplicaReadMixin enters for GET and HEAD
+    requests. Everything else, including all writes, sessions and users,
+    uses the default database. Once a request writes to a scrapbook model,
+    its remaining reads use the primary too, and ReplicaRoutingMiddleware
+    pins the client to the primary for SCRAPBOOK_REPLICA_PIN_SECONDS so it
+    reads its own writes while the replicas catch up.
+    """
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (state is None or not state.replica_reads or state.pinned or
+                state.wrote or state.replica is None):
+            return None
+        if (model._meta.app_label != 'scrapbook' or
+                model._meta.label_lower in PRIMARY_ONLY_MODELS):
+            return None
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        # Only writes to the scrapbook models, which the replicas serve,
+        # pin the client; session saves and logins do not
+        state = _state.get()
+        if state is not None and model._meta.app_label == 'scrapbook':
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Track the database routing state of each request.
+
+    Clients that sent a write (any request that is not GET, HEAD, OPTIONS
+    or TRACE, or that wrote to a scrapbook model) get a cookie pinning their
+    reads to the primary for SCRAPBOOK_REPLICA_PIN_SECONDS. Works under
+    both WSGI and ASGI; the state is shared with the threads the async
+    views run their queries in.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self.start(request)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(request, response, state)
+
+    async def __acall__(self, request):
+        state = self.start(request)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(request, response, state)
+
+    def start(self, request):
+        try:
+            pinned_until = float(request.COOKIES.get(PIN_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+        return RoutingState(pinned=pinned_until > time.time())
+
+    def finish(self, request, response, state):
+        if state.wrote or request.method not in (
+                'GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            seconds = pin_seconds()
+            response.set_cookie(
+                PIN_COOKIE, str(int(time.time()) + seconds),
+                max_age=seconds, httponly=True, samesite='Lax')
+        return response
+
+
+class ReplicaReadMixin:
+    """
+    View mixin that reads from a replica for GET and HEAD requests.
+
+    The response is rendered inside the block, so querysets evaluated by
+    the template are routed too.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        with replica_reads():
+            response = super().dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+        return response
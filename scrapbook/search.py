@@ -0,0 +1,186 @@
+from django.db import connections, router
+from django.db.models import BooleanField, CharField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from .models import Post, Scrapbook
+from .permissions import visible_posts, visible_scrapbooks
+
+# Text search configuration of the PostgreSQL tsvector columns
+SEARCH_CONFIG = 'english'
+
+# Longest search query accepted, in characters
+MAX_QUERY_LENGTH = 200
+
+# Tables that have a search index, and the DDL that builds it on each
+# database backend. On PostgreSQL the tsvector is a generated column, so the
+# database keeps it up to date on every write. On SQLite an external-content
+# FTS5 table mirrors the rows through triggers.
+SEARCH_TABLES = ('scrapbook_scrapbook', 'scrapbook_post')
+
+POSTGRES_DDL = """
+ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('{config}', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('{config}', regexp_replace(
+            coalesce(content, ''), '<[^>]*>', ' ', 'g')), 'B')
+    ) STORED;
+CREATE INDEX IF NOT EXISTS {table}_search_idx
+    ON {table} USING GIN (search_vector);
+"""
+
+SQLITE_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table}
+BEGIN
+    INSERT INTO {table}_fts (rowid, title, content)
+    VALUES (new.id, new.title, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table}
+BEGIN
+    INSERT INTO {table}_fts ({table}_fts, rowid, title, content)
+    VALUES ('delete', old.id, old.title, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS {table}_fts_update
+AFTER UPDATE OF title, content ON {table}
+BEGIN
+    INSERT INTO {table}_fts ({table}_fts, rowid, title, content)
+    VALUES ('delete', old.id, old.title, old.content);
+    INSERT INTO {table}_fts (rowid, title, content)
+    VALUES (new.id, new.title, new.content);
+END;
+"""
+
+
+def install_search_index(connection):
+    """
+    Create the search index of scrapbooks and posts, if it is missing.
+
+    Safe to run repeatedly. On SQLite, Django rebuilds a table to alter it,
+    which drops its triggers, so this also runs after every migrate (see
+    scrapbook.signals) and rebuilds the FTS5 table whenever a trigger had
+    to be recreated. Other database backends have no index and fall back
+    to a substring search.
+    """
+    vendor = connection.vendor
+    with connection.cursor() as cursor:
+        for table in SEARCH_TABLES:
+            if vendor == 'postgresql':
+                cursor.execute(POSTGRES_DDL.format(
+                    table=table, config=SEARCH_CONFIG))
+            elif vendor == 'sqlite':
+                cursor.execute(
+                    "SELECT count(*) FROM sqlite_master "
+                    "WHERE type = 'trigger' AND tbl_name = %s "
+                    "AND name LIKE %s", [table, f'{table}_fts_%'])
+                if cursor.fetchone()[0] == 3:
+                    continue
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts "
+                    f"USING fts5(title, content, content='{table}', "
+                    f"content_rowid='id', tokenize='porter unicode61')")
+                for statement in SQLITE_TRIGGERS.format(
+                        table=table).split('END;')[:-1]:
+                    cursor.execute(statement + 'END;')
+                cursor.execute(
+                    f"INSERT INTO {table}_fts ({table}_fts) "
+                    f"VALUES ('rebuild')")
+
+
+def remove_search_index(connection):
+    vendor = connection.vendor
+    with connection.cursor() as cursor:
+        for table in SEARCH_TABLES:
+            if vendor == 'postgresql':
+                cursor.execute(f'DROP INDEX IF EXISTS {table}_search_idx')
+                cursor.execute(
+                    f'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector')
+            elif vendor == 'sqlite':
+                for action in ('insert', 'delete', 'update'):
+                    cursor.execute(
+                        f'DROP TRIGGER IF EXISTS {table}_fts_{action}')
+                cursor.execute(f'DROP TABLE IF EXISTS {table}_fts')
+
+
+def fts5_query(text):
+    # Quote every word, so FTS5 operators in the query are matched as text
+    # and all words must match
+    return ' '.join(
+        '"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+def search_matches(model, text):
+    """
+    Return the rows of a model that match a search, annotated with rank.
+
+    A higher rank is a better match. Title matches outrank content matches.
+    """
+    table = model._meta.db_table
+    vendor = connections[router.db_for_read(model)].vendor
+    if vendor == 'postgresql':
+        query = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+        match = RawSQL(
+            f'{table}.search_vector @@ {query}', [text],
+            output_field=BooleanField())
+        rank = RawSQL(
+            f'ts_rank_cd({table}.search_vector, {query})', [text],
+            output_field=FloatField())
+    elif vendor == 'sqlite':
+        # Join the FTS5 table, so the full-text query runs once and bm25
+        # (lower is better) is read from the match itself. The title is
+        # weighted over the content.
+        fts = f'{table}_fts'
+        return model.objects.extra(
+            tables=[fts],
+            where=[f'{fts}.rowid = {table}.id', f'{fts} MATCH %s'],
+            params=[fts5_query(text)],
+            select={'rank': f'-bm25({fts}, 10.0, 1.0)'})
+    else:
+        match = Q(title__icontains=text) | Q(content__icontains=text)
+        rank = Value(1.0, output_field=FloatField())
+    return model.objects.filter(match).annotate(rank=rank)
+
+
+def search(user, text):
+    """
+    Search the scrapbooks and posts a user may view.
+
+    Both models are searched in one UNION query ordered by rank, so the
+    results can be paginated like any queryset. Visibility follows the same
+    rules as the detail views (see scrapbook.permissions).
+
+    Returns a values_list queryset of (kind, id, rank) rows, where kind is
+    'scrapbook' or 'post'. Use load_results to fetch the objects of a page.
+    """
+    text = ' '.join(text.split())[:MAX_QUERY_LENGTH]
+    if not text:
+        return Scrapbook.objects.none()
+    results = []
+    for model, visible in (
+            (Scrapbook, visible_scrapbooks), (Post, visible_posts)):
+        results.append(search_matches(model, text).filter(
+            visible(user)).annotate(
+            kind=Value(model._meta.model_name, output_field=CharField()),
+        ).order_by().values_list('kind', 'id', 'rank'))
+    return results[0].union(results[1], all=True).order_by(
+        '-rank', 'kind', '-id')
+
+
+def load_results(rows):
+    """
+    Fetch the scrapbooks and posts of a page of search results.
+
+    Uses one query per model. Returns the objects in the order of rows.
+    """
+    ids = {'scrapbook': [], 'post': []}
+    for kind, pk, rank in rows:
+        ids[kind].append(pk)
+    objects = {}
+    if ids['scrapbook']:
+        for scrapbook in Scrapbook.objects.filter(
+                id__in=ids['scrapbook']).select_related('author'):
+            objects['scrapbook', scrapbook.id] = scrapbook
+    if ids['post']:
+        for post in Post.objects.filter(id__in=ids['post']).select_related(
+                'author', 'scrapbook'):
+            objects['post', post.id] = post
+    return [
+        objects[kind, pk] for kind, pk, rank in rows
+        if (kind, pk) in objects]
@@ -0,0 +1,46 @@
+from django.db import transaction
+from .models import SharedAccess
+from .permissions import invalidate_access
+
+
+def share_scrapbook(scrapbook, recipients, shared_by):
+    """
+    Share a scrapbook with one or more users.
+
+    Each recipient gets a single scrapbook-level grant, which covers every
+    non-draft post in the scrapbook, including posts added later. The
+    grants are written with one bulk_create inside a transaction and are
+    idempotent through the unique_scrapbook_grant constraint. Any per-post
+    rows the grant now covers are removed, so that only explicit per-post
+    exceptions remain stored.
+
+    Arguments:
+    scrapbook -- The scrapbook to share.
+    recipients -- The users to share the scrapbook with.
+    shared_by -- The user sharing the scrapbook.
+
+    Returns the scrapbook-level SharedAccess row of each recipient.
+    """
+    user_ids = {user.id for user in recipients}
+    if not user_ids:
+        return []
+
+    with transaction.atomic():
+        SharedAccess.objects.bulk_create([
+            SharedAccess(
+                user_id=user_id, scrapbook=scrapbook, shared_by=shared_by)
+            for user_id in user_ids
+        ], batch_size=500, ignore_conflicts=True)
+        SharedAccess.objects.filter(
+            scrapbook=scrapbook, user_id__in=user_ids, post__isnull=False,
+        ).exclude(post__status=0).delete()
+
+    # bulk_create does not send post_save, so drop cached access sets once
+    # the shares are committed
+    for user_id in user_ids:
+        transaction.on_commit(
+            lambda user_id=user_id: invalidate_access(user_id, scrapbook.id))
+
+    return list(SharedAccess.objects.filter(
+        scrapbook=scrapbook, post__isnull=True, user_id__in=user_ids,
+    ).select_related('user'))
@@ -0,0 +1,90 @@
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.signals import (
+    post_delete, post_init, post_migrate, post_save)
+from django.dispatch import receiver
+from .cards import invalidate_cards
+from .models import Scrapbook, Post, SharedAccess
+from .page_cache import invalidate_public_pages
+from .permissions import invalidate_access
+from .search import install_search_index
+from .timing import time_query
+
+
+@receiver(post_save, sender=SharedAccess)
+@receiver(post_delete, sender=SharedAccess)
+def invalidate_shared_access(sender, instance, **kwargs):
+    # Drop the cached access set whenever a share is created, changed
+    # or removed
+    if instance.scrapbook_id is not None:
+        invalidate_access(instance.user_id, instance.scrapbook_id)
+
+
+@receiver(post_save, sender=Scrapbook)
+@receiver(post_delete, sender=Scrapbook)
+def invalidate_scrapbook_cards(sender, instance, **kwargs):
+    # Drop the cached cards of a scrapbook when it changes
+    invalidate_cards('scrapbook', instance.pk)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_cards(sender, instance, **kwargs):
+    # Drop the cached cards of a post, and of its scrapbook, whose card
+    # shows the number of public posts
+    invalidate_cards('post', instance.pk)
+    invalidate_cards('scrapbook', instance.scrapbook_id)
+
+
+@receiver(post_init, sender=Scrapbook)
+@receiver(post_init, sender=Post)
+def remember_public_status(sender, instance, **kwargs):
+    # Record whether the object was public when loaded, so unpublishing it
+    # can be detected on save. A deferred status is never loaded here.
+    instance._loaded_public = instance.__dict__.get('status') == 2
+
+
+@receiver(post_save, sender=Scrapbook)
+@receiver(post_delete, sender=Scrapbook)
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_public_page_cache(sender, instance, **kwargs):
+    # Drop the anonymous page cache when public content is created, edited,
+    # unpublished or deleted. The cached detail page of a public scrapbook
+    # covers all of its posts, so a change to any of them counts too.
+    if (instance.status == 2 or getattr(instance, '_loaded_public', False)
+            or in_public_scrapbook(instance)):
+        invalidate_public_pages()
+    instance._loaded_public = instance.status == 2
+
+
+def in_public_scrapbook(instance):
+    # Whether instance is a post of a public scrapbook, without a query
+    # when its scrapbook is already loaded
+    if not isinstance(instance, Post):
+        return False
+    if Post.scrapbook.is_cached(instance):
+        return instance.scrapbook.status == 2
+    return Scrapbook.objects.filter(
+        pk=instance.scrapbook_id, status=2).exists()
+
+
+@receiver(post_migrate)
+def restore_search_index(sender, app_config, using, **kwargs):
+    # Altering a table on SQLite rebuilds it without the search triggers,
+    # so put back anything a later migration removed
+    if app_config.label != 'scrapbook':
+        return
+    connection = connections[using]
+    applied = MigrationRecorder(connection).applied_migrations()
+    if ('scrapbook', '0020_search_index') in applied:
+        install_search_index(connection)
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    # Let ServerTimingMiddleware count the queries on every connection,
+    # including those opened in the threads of async views
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
@@ -0,0 +1,140 @@
+import functools
+import os
+import re
+import uuid
+from urllib.request import urlopen
+from cloudinary import CloudinaryResource, uploader
+from cloudinary.models import CLOUDINARY_FIELD_DB_RE
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, Storage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.templatetags.static import static
+from django.utils.deconstruct import deconstructible
+from django.utils.module_loading import import_string
+
+# Stored name of the default image of a scrapbook or post
+PLACEHOLDER = 'placeholder'
+
+# Short names that can be used for SCRAPBOOK_IMAGE_STORAGE
+IMAGE_STORAGE_BACKENDS = {
+    'cloudinary': 'scrapbook.storage.CloudinaryImageStorage',
+    'local': 'scrapbook.storage.LocalImageStorage',
+}
+
+
+def image_upload_to(instance, filename):
+    """
+    Return a unique name for an uploaded image.
+
+    Names are never reused, so local files can be served with a far-future
+    cache lifetime.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    return f'images/{uuid.uuid4().hex}{extension}'
+
+
+@deconstructible
+class CloudinaryImageStorage(Storage):
+    """
+    Stores images in Cloudinary.
+
+    Stored names use the same format as CloudinaryField
+    ("v<version>/<public_id>.<format>"), so images uploaded before the
+    storage backends were introduced keep working.
+    """
+    def _resource(self, name):
+        match = re.match(CLOUDINARY_FIELD_DB_RE, name)
+        return CloudinaryResource(
+            type=match.group('type') or 'upload',
+            resource_type=match.group('resource_type') or 'image',
+            version=match.group('version'),
+            public_id=match.group('public_id'),
+            format=match.group('format'))
+
+    def _open(self, name, mode='rb'):
+        # Download the stored image, e.g. to backfill its placeholder
+        with urlopen(self.url(name), timeout=30) as response:
+            return ContentFile(response.read(), name=name)
+
+    def _save(self, name, content):
+        if hasattr(content, 'seekable') and content.seekable():
+            content.seek(0)
+        return uploader.upload_resource(content).get_prep_value()
+
+    def exists(self, name):
+        # Cloudinary assigns a new public id to every upload
+        return False
+
+    def delete(self, name):
+        if name and name != PLACEHOLDER:
+            uploader.destroy(self._resource(name).public_id)
+
+    def url(self, name):
+        return self._resource(name).build_url()
+
+
+@deconstructible
+class LocalImageStorage(FileSystemStorage):
+    """
+    Stores images on the local disk under MEDIA_ROOT.
+
+    Files are served from MEDIA_URL by a CDN or web server in front of the
+    site, or in development (DEBUG) by the serve_image view. The
+    placeholder image is served from the static files.
+    """
+    def url(self, name):
+        if name == PLACEHOLDER:
+            return static('images/placeholder.jpg')
+        return super().url(name)
+
+
+@functools.lru_cache(maxsize=None)
+def load_backend(path):
+    return import_string(IMAGE_STORAGE_BACKENDS.get(path, path))()
+
+
+@receiver(setting_changed)
+def reset_backend(setting, **kwargs):
+    # Let tests switch backends or locations with override_settings
+    if setting in ('SCRAPBOOK_IMAGE_STORAGE', 'MEDIA_ROOT', 'MEDIA_URL'):
+        load_backend.cache_clear()
+
+
+@deconstructible
+class ImageStorage(Storage):
+    """
+    The storage of Scrapbook.image and Post.image.
+
+    Delegates to the backend named by the SCRAPBOOK_IMAGE_STORAGE setting,
+    either 'cloudinary', 'local' or the dotted path of a Storage class.
+    """
+    @property
+    def backend(self):
+        return load_backend(
+            getattr(settings, 'SCRAPBOOK_IMAGE_STORAGE', 'cloudinary'))
+
+    def _open(self, name, mode='rb'):
+        return self.backend.open(name, mode)
+
+    def _save(self, name, content):
+        return self.backend.save(name, content)
+
+    def get_available_name(self, name, max_length=None):
+        return self.backend.get_available_name(name, max_length)
+
+    def exists(self, name):
+        return self.backend.exists(name)
+
+    def delete(self, name):
+        return self.backend.delete(name)
+
+    def size(self, name):
+        return self.backend.size(name)
+
+    def url(self, name):
+        return self.backend.url(name)
+
+
+image_storage = ImageStorage()
@@ -0,0 +1,74 @@
+import logging
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.db import transaction
+from .jobs import task
+from .models import Job, Scrapbook
+from .sharing import share_scrapbook
+from .storage import PLACEHOLDER
+
+logger = logging.getLogger(__name__)
+
+# Fields written when a deferred image is stored
+IMAGE_FIELDS = [
+    'image', 'image_width', 'image_height', 'image_lqip', 'image_renditions',
+    'updated_on',
+]
+
+
+@task('store_image', max_attempts=5)
+def store_image(job):
+    """
+    Store an uploaded image of a scrapbook or post, with its size,
+    placeholder and renditions.
+
+    Payload: model (the model label), pk and filename. The image bytes are
+    in job.data. Nothing is done if the object was deleted or a newer image
+    was uploaded for it in the meantime. The image it replaces and that
+    image's renditions are deleted from storage once the job commits.
+    """
+    payload = job.payload
+    model = apps.get_model(payload['model'])
+    obj = model.objects.filter(pk=payload['pk']).first()
+    if obj is None:
+        return
+    if Job.objects.filter(
+            name=job.name, id__gt=job.id, payload__model=payload['model'],
+            payload__pk=payload['pk']).exists():
+        return
+    replaced = [obj.image.name] + [
+        rendition['name'] for rendition in obj.image_renditions.values()]
+    obj.image = ContentFile(bytes(job.data), name=payload['filename'])
+    # Only the image fields, so edits made since the upload are kept
+    obj.save(update_fields=IMAGE_FIELDS)
+    if replaced[0] and replaced[0] != PLACEHOLDER:
+        transaction.on_commit(
+            lambda: delete_images(obj.image.storage, replaced))
+
+
+def delete_images(storage, names):
+    # Delete replaced image files; a file that cannot be deleted is left
+    # behind rather than failing the job that stored the new image
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.exception('Could not delete replaced image %s', name)
+
+
+@task('share_scrapbook')
+def share_scrapbook_job(job):
+    """
+    Share a scrapbook with users.
+
+    Payload: scrapbook_id, user_ids and shared_by_id. See
+    scrapbook.sharing.share_scrapbook.
+    """
+    payload = job.payload
+    scrapbook = Scrapbook.objects.filter(id=payload['scrapbook_id']).first()
+    if scrapbook is None:
+        return
+    share_scrapbook(
+        scrapbook, User.objects.filter(id__in=payload['user_ids']),
+        User.objects.get(id=payload['shared_by_id']))
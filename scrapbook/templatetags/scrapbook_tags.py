@@ -0,0 +1,116 @@
+from django import template
+from django.conf import settings
+from django.template.base import token_kwargs
+from django.utils.html import format_html
+from scrapbook.cards import card_cache, card_cache_key, card_role
+from scrapbook.timing import record_cache_lookup
+
+register = template.Library()
+
+# Rendered width of a card image in the Bootstrap grid used by the card
+# templates (col-md-6 col-lg-4)
+CARD_SIZES = '(min-width: 992px) 33vw, (min-width: 768px) 50vw, 100vw'
+
+
+class CardCacheNode(template.Node):
+    """
+    Renders a card from the fragment cache when it is still current.
+
+    Each entry is stored with a stamp of the object's updated_on and any
+    extra value the card displays (such as a post count). An entry whose
+    stamp no longer matches is re-rendered, so edits are picked up even by
+    workers whose in-process cache did not receive the invalidation.
+    """
+    def __init__(self, nodelist, fragment, obj, kwargs):
+        self.nodelist = nodelist
+        self.fragment = fragment
+        self.obj = obj
+        self.kwargs = kwargs
+
+    def render(self, context):
+        obj = self.obj.resolve(context)
+        options = {
+            name: value.resolve(context)
+            for name, value in self.kwargs.items()}
+        role = card_role(context['user'], obj, options.get('shared', False))
+        key = card_cache_key(
+            self.fragment, obj._meta.model_name, obj.pk, role)
+        stamp = (obj.updated_on.isoformat(), options.get('stamp'))
+
+        cache = card_cache()
+        cached = cache.get(key)
+        hit = cached is not None and cached[0] == stamp
+        record_cache_lookup(hit)
+        if hit:
+            return cached[1]
+        content = self.nodelist.render(context)
+        cache.set(
+            key, (stamp, content),
+            getattr(settings, 'SCRAPBOOK_CARD_CACHE_TIMEOUT', 3600))
+        return content
+
+
+@register.tag
+def cardcache(parser, token):
+    """
+    Cache the markup of a single scrapbook or post card.
+
+    Usage::
+
+        {% cardcache 'home' scrapbook stamp=scrapbook.post_count %}
+            ... card markup ...
+        {% endcardcache %}
+
+    The cache is keyed by the fragment name, the object's id and the
+    viewer's role (author, shared or anonymous). Pass ``shared=`` either a
+    boolean or a collection of shared ids, and ``stamp=`` any value shown
+    on the card that can change without updating the object.
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' takes a fragment name and an object.")
+    fragment = bits[1].strip('\'"')
+    obj = parser.compile_filter(bits[2])
+    kwargs = token_kwargs(bits[3:], parser)
+    nodelist = parser.parse(('endcardcache',))
+    parser.delete_first_token()
+    return CardCacheNode(nodelist, fragment, obj, kwargs)
+
+
+@register.simple_tag
+def image_attrs(obj, sizes=CARD_SIZES):
+    """
+    Render the src, srcset, sizes and lazy-loading attributes of the image
+    of a scrapbook or post.
+
+    Usage::
+
+        <img {% image_attrs post %} class="card-img-top" alt="...">
+
+    The srcset lists every stored rendition and the original image, so the
+    browser downloads the smallest one that fills the card. Images without
+    renditions fall back to the original image. When the size of the image
+    is known, width and height are set so the card keeps its shape while
+    the image loads, and its placeholder is inlined as the background.
+    """
+    image = obj.image
+    width, height = obj.image_width, obj.image_height
+    renditions = obj.image_renditions or {}
+    attrs = format_html('src="{}"', image.url)
+    if width and renditions:
+        candidates = sorted(
+            (rendition['width'], image.storage.url(rendition['name']))
+            for rendition in renditions.values())
+        candidates.append((width, image.url))
+        srcset = ', '.join(f'{url} {w}w' for w, url in candidates)
+        attrs = format_html(
+            'src="{}" srcset="{}" sizes="{}"', candidates[0][1], srcset, sizes)
+    if width and height:
+        attrs = format_html(
+            '{} width="{}" height="{}"', attrs, width, height)
+    if obj.image_lqip:
+        attrs = format_html(
+            '{} style="background-image: url({}); background-size: cover"',
+            attrs, obj.image_lqip)
+    return format_html('{} loading="lazy" decoding="async"', attrs)
@@ -0,0 +1,33 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from scrapbook.cards import card_cache
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin that checks how many queries a page runs.
+
+    assertQueryBudget renders a page, calls a function that adds more of
+    the rows the page lists, and renders the page again. It fails if
+    either render runs more queries than the page's budget, or if the
+    second render runs more queries than the first, which is the sign of
+    a query per row (N+1). The card cache is cleared before each render,
+    so rows hidden behind cached cards are counted too.
+    """
+    def count_queries(self, client, url, data=None):
+        card_cache().clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, data)
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries)
+
+    def assertQueryBudget(self, url, budget, grow, data=None, client=None):
+        client = client or self.client
+        small = self.count_queries(client, url, data)
+        grow()
+        large = self.count_queries(client, url, data)
+        self.assertLessEqual(
+            small, budget, f'{url} ran {small} queries, budget {budget}')
+        self.assertEqual(
+            large, small,
+            f'{url} ran {small} queries, then {large} with more rows')
@@ -0,0 +1,136 @@
+from unittest import mock
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from scrapbook.models import Post, Scrapbook, SharedAccess
+from scrapbook.pagination import EstimatedCountPaginator
+
+
+class AdminChangelistTest(TestCase):
+    """
+    Tests for the admin changelists and bulk actions.
+
+    The setUp method logs in a superuser and creates a scrapbook with two
+    draft posts.
+    """
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin', password='testpass')
+        self.client.login(username='admin', password='testpass')
+        self.scrapbook = self.add_rows(0)
+        self.posts = list(Post.objects.filter(scrapbook=self.scrapbook))
+
+    def add_rows(self, n):
+        # Create an author with a scrapbook, two draft posts and a share
+        author = User.objects.create_user(username=f'author{n}')
+        scrapbook = Scrapbook.objects.create(
+            title=f'Scrapbook {n}', author=author, status=0)
+        for i in range(2):
+            Post.objects.create(
+                title=f'Post {n}.{i}', author=author, scrapbook=scrapbook)
+        SharedAccess.objects.create(
+            user=self.admin, scrapbook=scrapbook, shared_by=author)
+        return scrapbook
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        # Test that each changelist runs the same number of queries for
+        # one and for many rows
+        for model in ('scrapbook', 'post', 'sharedaccess'):
+            url = reverse(f'admin:scrapbook_{model}_changelist')
+            self.count_queries(url)
+            few = self.count_queries(url)
+            for n in range(1, 6):
+                self.add_rows(n * 10 + len(model))
+            self.assertEqual(self.count_queries(url), few, model)
+
+    def test_autocomplete_filter(self):
+        # Test that the user filter is an autocomplete that filters the rows
+        other = self.add_rows(1)
+        url = reverse('admin:scrapbook_sharedaccess_changelist')
+        response = self.client.get(url, {'shared_by__id__exact': '999'})
+        self.assertNotContains(response, 'author1</a>')
+        response = self.client.get(
+            url, {'shared_by__id__exact': other.author_id})
+        self.assertContains(response, 'class="autocomplete-filter"')
+        self.assertContains(
+            response, f'<option value="{other.author_id}" selected>author1')
+        self.assertContains(response, 'js/autocomplete-filter.js')
+        self.assertEqual(
+            [row.scrapbook for row in response.context['cl'].result_list],
+            [other])
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'term': 'author1', 'app_label': 'scrapbook',
+            'model_name': 'sharedaccess', 'field_name': 'shared_by'})
+        self.assertEqual(
+            response.json()['results'],
+            [{'id': str(other.author_id), 'text': 'author1'}])
+
+    def test_publish_action_is_one_update(self):
+        # Test that publishing the selected posts is a single UPDATE that
+        # also refreshes updated_on
+        before = self.posts[0].updated_on
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(
+                reverse('admin:scrapbook_post_changelist'), {
+                    'action': 'publish',
+                    '_selected_action': [post.id for post in self.posts]})
+        updates = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE "scrapbook_post"')]
+        self.assertEqual(len(updates), 1)
+        for post in Post.objects.filter(scrapbook=self.scrapbook):
+            self.assertEqual(post.status, 2)
+            self.assertGreater(post.updated_on, before)
+
+    def test_unpublish_and_approve_actions(self):
+        # Test the unpublish action of scrapbooks and the approve action of
+        # posts
+        url = reverse('admin:scrapbook_scrapbook_changelist')
+        self.client.post(url, {
+            'action': 'unpublish', '_selected_action': [self.scrapbook.id]})
+        self.scrapbook.refresh_from_db()
+        self.assertEqual(self.scrapbook.status, 1)
+        self.client.post(reverse('admin:scrapbook_post_changelist'), {
+            'action': 'approve', '_selected_action': [self.posts[0].id]})
+        self.assertEqual(
+            list(Post.objects.filter(approved=True)), [self.posts[0]])
+
+    def test_search_uses_full_text_index(self):
+        # Test that the changelist search finds posts by their words
+        response = self.client.get(
+            reverse('admin:scrapbook_post_changelist'), {'q': 'post 0.1'})
+        self.assertEqual(
+            list(response.context['cl'].result_list),
+            [Post.objects.get(title='Post 0.1')])
+
+    def test_autocomplete_matches_partial_words(self):
+        # Test that the autocomplete widgets still find a scrapbook from
+        # the start of a word, which the full-text index does not
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'term': 'Scrap', 'app_label': 'scrapbook',
+            'model_name': 'post', 'field_name': 'scrapbook'})
+        self.assertEqual(
+            response.json()['results'],
+            [{'id': str(self.scrapbook.id), 'text': str(self.scrapbook)}])
+
+    def test_estimated_count(self):
+        # Test that an estimate replaces the count of an unfiltered big
+        # table, and filtered querysets are still counted
+        with mock.patch(
+                'scrapbook.pagination.estimated_row_count',
+                return_value=5000000):
+            self.assertEqual(
+                EstimatedCountPaginator(Post.objects.all(), 10).count,
+                5000000)
+            self.assertEqual(EstimatedCountPaginator(
+                Post.objects.filter(status=0), 10).count, 2)
+        self.assertEqual(
+            EstimatedCountPaginator(Post.objects.all(), 10).count, 2)
@@ -0,0 +1,141 @@
+import json
+import re
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+from scrapbook import async_views
+from scrapbook.models import Post, Scrapbook
+
+# Serves the read views with their async versions, ahead of the site's own
+# URLs. Used as ROOT_URLCONF by the tests below.
+urlpatterns = [
+    path('', async_views.scrapbook_list, name='home'),
+    path('<slug:slug>/', async_views.scrapbook_detail,
+         name='scrapbook_detail'),
+    path('<slug:scrapbook_slug>/<slug:post_slug>/', async_views.post_detail,
+         name='post_detail'),
+    path('', include('config.urls')),
+]
+
+# CSRF tokens are masked differently on every render
+CSRF_TOKEN = re.compile(rb'name="csrfmiddlewaretoken" value="[^"]*"')
+
+
+class AsyncViewsTest(TestCase):
+    """
+    Tests for the async versions of the read views, run through the ASGI
+    handler.
+
+    The setUp method creates an author with seven public scrapbooks, the
+    first holding seven public posts and one draft, and a private
+    scrapbook.
+    """
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='author', password='testpass')
+        self.other = User.objects.create_user(
+            username='other', password='testpass')
+        self.scrapbooks = [
+            Scrapbook.objects.create(
+                title=f'Public Scrapbook {i}', author=self.author, status=2)
+            for i in range(7)]
+        self.scrapbook = self.scrapbooks[0]
+        for i in range(7):
+            Post.objects.create(
+                title=f'Public Post {i}', author=self.author,
+                scrapbook=self.scrapbook, status=2)
+        self.draft = Post.objects.create(
+            title='Draft Post', author=self.author,
+            scrapbook=self.scrapbook, status=0)
+        self.private = Scrapbook.objects.create(
+            title='Private Scrapbook', author=self.author, status=1)
+        self.post = self.scrapbook.posts.filter(status=2).first()
+        self.urls = [
+            reverse('home'),
+            reverse('home') + '?page=2',
+            reverse('scrapbook_detail', kwargs={'slug': self.scrapbook.slug}),
+            reverse('scrapbook_detail', kwargs={
+                'slug': self.scrapbook.slug}) + '?page=2',
+            reverse('post_detail', kwargs={
+                'scrapbook_slug': self.scrapbook.slug,
+                'post_slug': self.post.slug}),
+        ]
+
+    def get(self, url, method='get', **extra):
+        # Request url from the async views through the ASGI handler
+        async def request():
+            return await getattr(self.async_client, method)(url, **extra)
+        with override_settings(ROOT_URLCONF=__name__):
+            return async_to_sync(request)()
+
+    def test_pages_match_sync_views(self):
+        # Test that the async views render the same pages as the sync ones
+        for user in (None, self.author):
+            if user is not None:
+                self.client.force_login(user)
+                self.async_client.force_login(user)
+            for url in self.urls:
+                with self.subTest(user=user, url=url):
+                    expected = self.client.get(url)
+                    response = self.get(url)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(
+                        CSRF_TOKEN.sub(b'', response.content),
+                        CSRF_TOKEN.sub(b'', expected.content))
+                    self.assertEqual(
+                        response.get('ETag'), expected.get('ETag'))
+
+    def test_not_modified(self):
+        # Test that a matching ETag is answered with a 304
+        url = self.urls[2]
+        etag = self.get(url)['ETag']
+        response = self.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_access_checks(self):
+        # Test that private and missing pages are refused
+        private_url = reverse(
+            'scrapbook_detail', kwargs={'slug': self.private.slug})
+        draft_url = reverse('post_detail', kwargs={
+            'scrapbook_slug': self.scrapbook.slug,
+            'post_slug': self.draft.slug})
+        self.assertEqual(self.get(private_url).status_code, 403)
+        self.assertEqual(self.get(draft_url).status_code, 403)
+        self.assertEqual(self.get('/missing-scrapbook/').status_code, 404)
+        self.async_client.force_login(self.other)
+        self.assertEqual(self.get(private_url).status_code, 403)
+        self.async_client.force_login(self.author)
+        self.assertEqual(self.get(private_url).status_code, 200)
+        self.assertEqual(self.get(draft_url).status_code, 200)
+
+    def test_only_safe_methods(self):
+        # Test that the async views refuse anything but GET and HEAD
+        response = self.get(self.urls[0], method='post')
+        self.assertEqual(response.status_code, 405)
+
+    @override_settings(SCRAPBOOK_PAGE_CACHE_TIMEOUT=60)
+    def test_page_cache(self):
+        # Test that anonymous pages are served from the page cache
+        cache.clear()
+        first = self.get(self.urls[0])
+        with self.assertNumQueries(0):
+            second = self.get(self.urls[0])
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    @override_settings(
+        SCRAPBOOK_TIMING=True, SCRAPBOOK_TIMING_SAMPLE_RATE=1.0)
+    def test_timing(self):
+        # Test that the queries of the async views are timed
+        with self.assertLogs('scrapbook.timing', 'INFO') as logs:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.get(self.urls[2])
+        fields = json.loads(logs.records[0].getMessage())
+        self.assertGreater(len(queries), 0)
+        self.assertEqual(fields['db_queries'], len(queries))
+        self.assertTrue(response.has_header('Server-Timing'))
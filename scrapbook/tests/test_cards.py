@@ -0,0 +1,82 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, Client
+from django.urls import reverse
+from scrapbook.cards import card_cache, card_cache_key
+from scrapbook.models import Scrapbook, Post
+from scrapbook.sharing import share_scrapbook
+
+
+class CardCacheTest(TestCase):
+    """
+    Tests for the scrapbook and post card fragment cache.
+
+    The setUp method clears the card cache and creates an author, a reader
+    and a public scrapbook with a public post.
+    """
+    def setUp(self):
+        card_cache().clear()
+        self.client = Client()
+        self.author = User.objects.create_user(
+            username='author', password='testpass')
+        self.reader = User.objects.create_user(
+            username='reader', password='testpass')
+        self.scrapbook = Scrapbook.objects.create(
+            title='Cached Scrapbook', author=self.author, status=2)
+        self.post = Post.objects.create(
+            title='Cached Post', author=self.author,
+            scrapbook=self.scrapbook, status=2)
+
+    def test_card_is_served_from_cache(self):
+        # Test that a rendered card is reused until the scrapbook is saved
+        self.client.get(reverse('home'))
+        self.assertIsNotNone(card_cache().get(card_cache_key(
+            'home', 'scrapbook', self.scrapbook.id, 'anonymous')))
+        # update() bypasses signals and updated_on, so the card is stale
+        Scrapbook.objects.filter(id=self.scrapbook.id).update(
+            title='Renamed Scrapbook')
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Cached Scrapbook')
+        self.scrapbook.refresh_from_db()
+        self.scrapbook.save()
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Renamed Scrapbook')
+
+    def test_card_varies_on_role(self):
+        # Test that authors and other viewers get their own cards
+        self.client.login(username='author', password='testpass')
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Edit <i')
+        self.client.login(username='reader', password='testpass')
+        response = self.client.get(reverse('home'))
+        self.assertNotContains(response, 'Edit <i')
+
+    def test_post_save_refreshes_post_count(self):
+        # Test that adding a public post updates the scrapbook's card
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, '1 public post<')
+        Post.objects.create(
+            title='Another Post', author=self.author,
+            scrapbook=self.scrapbook, status=2)
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, '2 public posts')
+
+    def test_delete_invalidates_cards(self):
+        # Test that deleting a post drops its cached cards
+        self.client.get(reverse(
+            'scrapbook_detail', kwargs={'slug': self.scrapbook.slug}))
+        key = card_cache_key('post', 'post', self.post.id, 'anonymous')
+        self.assertIsNotNone(card_cache().get(key))
+        post_id = self.post.id
+        self.post.delete()
+        self.assertIsNone(card_cache().get(
+            card_cache_key('post', 'post', post_id, 'anonymous')))
+
+    def test_shared_post_card_role(self):
+        # Test that shared posts get a shared card on the shared detail page
+        self.client.login(username='reader', password='testpass')
+        share_scrapbook(self.scrapbook, [self.reader], self.author)
+        response = self.client.get(reverse(
+            'shared_scrapbook_detail', kwargs={'slug': self.scrapbook.slug}))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(card_cache().get(card_cache_key(
+            'shared_post', 'post', self.post.id, 'shared')))
@@ -0,0 +1,135 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import Count, F
+from django.test import (
+    LiveServerTestCase, TestCase, TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
+from scrapbook.models import Post, Scrapbook, SharedAccess
+
+
+class SeedAndBenchCommandTest(TestCase):
+    """
+    Tests for the seed_scrapbooks and bench management commands.
+
+    The setUp method seeds a small data set.
+    """
+    def setUp(self):
+        call_command(
+            'seed_scrapbooks', users=20, scrapbooks=50, posts=400,
+            shares=100, batch_size=64, stdout=StringIO())
+
+    def test_seed_scrapbooks(self):
+        # Test that the requested rows are generated with skewed ownership
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Scrapbook.objects.count(), 50)
+        self.assertEqual(Post.objects.count(), 400)
+        self.assertTrue(SharedAccess.objects.exists())
+        self.assertFalse(SharedAccess.objects.filter(
+            user=F('scrapbook__author')).exists())
+        counts = sorted(
+            Scrapbook.objects.values('author').annotate(
+                total=Count('id')).values_list('total', flat=True),
+            reverse=True)
+        self.assertGreater(counts[0], 50 / 20 * 2)
+
+    def test_seed_clear(self):
+        # Test that --clear replaces the generated data
+        call_command(
+            'seed_scrapbooks', users=5, scrapbooks=5, posts=5, shares=5,
+            clear=True, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Post.objects.count(), 5)
+
+    def test_bench_report(self):
+        # Test that every scrapbook URL is requested and reported as JSON
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command(
+                'bench', requests=2, output=path, stdout=StringIO())
+            with open(path) as output:
+                report = json.load(output)
+        self.assertEqual(report['rows']['posts'], 400)
+        names = [result['name'] for result in report['urls']]
+        self.assertIn('home', names)
+        self.assertIn('post_detail', names)
+        self.assertNotIn('trigger-500-error', names)
+        for result in report['urls']:
+            self.assertEqual(result['status'], 200, result['name'])
+            self.assertGreaterEqual(result['p95_ms'], result['p50_ms'])
+            self.assertGreater(result['queries'], 0)
+
+
+class BenchConnectionsCommandTest(TransactionTestCase):
+    """
+    Tests for the bench_connections management command, which closes the
+    connection between modes and so cannot run inside a test transaction.
+    """
+    def test_bench_connections(self):
+        # Test that every connection mode is timed and the settings restored
+        settings_dict = dict(connection.settings_dict)
+        output = StringIO()
+        call_command('bench_connections', requests=3, stdout=output)
+        self.assertIn('new connection per request', output.getvalue())
+        self.assertIn('persistent + health checks', output.getvalue())
+        self.assertEqual(connection.settings_dict, settings_dict)
+
+
+class BenchReplicaCommandTest(TransactionTestCase):
+    """
+    Tests for the bench management command with a read replica, which is
+    a test mirror of the default database.
+    """
+    databases = {'default', 'replica'}
+
+    def bench(self):
+        # Run bench anonymously and return the queries of each URL
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command(
+                'bench', requests=1, anonymous=True, output=path,
+                stdout=StringIO())
+            with open(path) as output:
+                report = json.load(output)
+        return {
+            result['name']: result['queries'] for result in report['urls']}
+
+    def test_replica_queries_are_counted(self):
+        # Test that reads routed to a replica are counted too
+        call_command(
+            'seed_scrapbooks', users=2, scrapbooks=2, posts=4, shares=0,
+            stdout=StringIO())
+        Scrapbook.objects.update(status=2)
+        Post.objects.update(status=2)
+        expected = self.bench()
+        with override_settings(SCRAPBOOK_REPLICAS=['replica']):
+            with CaptureQueriesContext(connections['replica']) as reads:
+                self.assertEqual(self.bench(), expected)
+        self.assertGreater(len(reads), 0)
+
+
+class BenchLoadCommandTest(LiveServerTestCase):
+    """
+    Tests for the bench_load management command, run against the live
+    test server.
+    """
+    def test_bench_load_report(self):
+        # Test that the read-heavy pages are loaded and reported as JSON
+        call_command(
+            'seed_scrapbooks', users=5, scrapbooks=20, posts=100, shares=0,
+            stdout=StringIO())
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command(
+                'bench_load', self.live_server_url, requests=8,
+                concurrency=2, output=path, stdout=StringIO())
+            with open(path) as output:
+                report = json.load(output)
+        self.assertEqual(report['requests'], 8)
+        self.assertEqual(report['statuses'], {'200': 8})
+        self.assertEqual(report['errors'], 0)
+        self.assertEqual(len(report['paths']), 4)
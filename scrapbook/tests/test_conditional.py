@@ -0,0 +1,121 @@
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import TestCase, Client, RequestFactory
+from django.urls import reverse
+from django.views.generic import DetailView
+from scrapbook.conditional import ConditionalGetMixin
+from scrapbook.models import Scrapbook, Post
+from scrapbook.sharing import share_scrapbook
+
+
+class ConditionalGetTest(TestCase):
+    """
+    Tests for conditional GET support on the detail views.
+
+    The setUp method creates an author, a reader the scrapbook is shared
+    with, and a private scrapbook with one private post.
+    """
+    def setUp(self):
+        self.client = Client()
+        self.author = User.objects.create_user(
+            username='author', password='testpass')
+        self.reader = User.objects.create_user(
+            username='reader', password='testpass')
+        self.scrapbook = Scrapbook.objects.create(
+            title='Test Scrapbook', author=self.author, status=1)
+        self.post = Post.objects.create(
+            title='Test Post', author=self.author,
+            scrapbook=self.scrapbook, status=1)
+        share_scrapbook(self.scrapbook, [self.reader], self.author)
+        self.detail_url = reverse(
+            'scrapbook_detail', kwargs={'slug': self.scrapbook.slug})
+        self.shared_url = reverse(
+            'shared_scrapbook_detail', kwargs={'slug': self.scrapbook.slug})
+        self.post_url = reverse('post_detail', kwargs={
+            'scrapbook_slug': self.scrapbook.slug,
+            'post_slug': self.post.slug})
+
+    def test_detail_views_return_not_modified(self):
+        # Test that each detail view answers a matching ETag with a 304
+        self.client.login(username='reader', password='testpass')
+        for url in (self.detail_url, self.shared_url, self.post_url):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b'')
+
+    def test_not_modified_skips_rendering(self):
+        # Test that a 304 is answered without rendering the template
+        self.client.login(username='reader', password='testpass')
+        etag = self.client.get(self.detail_url)['ETag']
+        with self.assertTemplateNotUsed('scrapbook/scrapbook_detail.html'):
+            self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_if_modified_since(self):
+        # Test that If-Modified-Since is honoured for anonymous users
+        Scrapbook.objects.filter(pk=self.scrapbook.pk).update(status=2)
+        Post.objects.filter(pk=self.post.pk).update(status=2)
+        response = self.client.get(self.post_url)
+        response = self.client.get(
+            self.post_url,
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_no_last_modified_for_users(self):
+        # Test that signed-in users get no Last-Modified, so another user's
+        # timestamp cannot answer their request with a 304
+        Scrapbook.objects.filter(pk=self.scrapbook.pk).update(status=2)
+        Post.objects.filter(pk=self.post.pk).update(status=2)
+        last_modified = self.client.get(self.post_url)['Last-Modified']
+        self.client.login(username='reader', password='testpass')
+        response = self.client.get(
+            self.post_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+
+    def test_post_change_updates_validator(self):
+        # Test that editing or deleting a post changes the scrapbook's ETag
+        self.client.login(username='reader', password='testpass')
+        etag = self.client.get(self.detail_url)['ETag']
+        self.post.title = 'Edited Post'
+        self.post.save()
+        edited = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(edited.status_code, 200)
+        self.post.delete()
+        response = self.client.get(
+            self.detail_url, HTTP_IF_NONE_MATCH=edited['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_validator_varies_on_viewer(self):
+        # Test that the author and a shared user get different ETags
+        self.client.login(username='reader', password='testpass')
+        reader_etag = self.client.get(self.detail_url)['ETag']
+        self.client.login(username='author', password='testpass')
+        response = self.client.get(
+            self.detail_url, HTTP_IF_NONE_MATCH=reader_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], reader_etag)
+
+    def test_permission_checked_before_not_modified(self):
+        # Test that a stale ETag cannot bypass the access check
+        self.client.login(username='reader', password='testpass')
+        etag = self.client.get(self.detail_url)['ETag']
+        self.scrapbook.sharedaccess_set.all().delete()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 403)
+
+    def test_no_validator_by_default(self):
+        # Test that a view without get_validator renders without validators
+        class View(ConditionalGetMixin, DetailView):
+            model = Scrapbook
+
+            def render_to_response(self, context):
+                return HttpResponse(context['object'].title)
+
+        request = RequestFactory().get(self.detail_url)
+        request.user = self.author
+        response = View.as_view()(request, slug=self.scrapbook.slug)
+        self.assertEqual(response.content, b'Test Scrapbook')
+        self.assertNotIn('ETag', response)
@@ -171,7 +171,8 @@ class ScrapbookFormTest(TestCase):
                 'Upload a valid image or an uncorrupted image.'])
 
     def test_scrapbook_form_large_image_file(self):
-        # Edge Test: Test the ScrapbookForm with large image file
+        # Edge Test: Test that the ScrapbookForm downscales a large image
+        # file instead of rejecting it
         with warnings.catch_warnings():
             warnings.simplefilter("ignore", DecompressionBombWarning)
             large_image = Image.new('RGB', (12000, 12000), color='red')
@@ -188,11 +189,11 @@ class ScrapbookFormTest(TestCase):
                 'description': 'Test Scrapbook Description',
                 'status': 1,
             }, files={'image': image})
-        self.assertFalse(form.is_valid())
-        self.assertIn('image', form.errors)
-        self.assertEqual(
-            form.errors['image'], [
-                'Image file too large. Size should not exceed 2.0 MB.'])
+        self.assertTrue(form.is_valid())
+        stored = form.cleaned_data['image']
+        self.assertLessEqual(stored.size, 2 * 1024 * 1024)
+        with Image.open(stored) as img:
+            self.assertEqual(img.size, (2048, 2048))
 
 
 class PostFormTest(TestCase):
@@ -351,7 +352,8 @@ class PostFormTest(TestCase):
             ['Upload a valid image or an uncorrupted image.'])
 
     def test_post_form_large_image_file(self):
-        # Edge Test: Test the PostForm with large image file
+        # Edge Test: Test that the PostForm downscales a large image file
+        # instead of rejecting it
         with warnings.catch_warnings():
             warnings.simplefilter("ignore", DecompressionBombWarning)
             large_image = Image.new('RGB', (12000, 12000), color='red')
@@ -368,11 +370,11 @@ class PostFormTest(TestCase):
                 'content': 'Test Post Content',
                 'status': 1,
             }, files={'image': image})
-        self.assertFalse(form.is_valid())
-        self.assertIn('image', form.errors)
-        self.assertEqual(
-            form.errors['image'],
-            ['Image file too large. Size should not exceed 2.0 MB.'])
+        self.assertTrue(form.is_valid())
+        stored = form.cleaned_data['image']
+        self.assertLessEqual(stored.size, 2 * 1024 * 1024)
+        with Image.open(stored) as img:
+            self.assertEqual(img.size, (2048, 2048))
 
 
 class SharedAccessFormTest(TestCase):
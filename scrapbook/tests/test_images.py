@@ -0,0 +1,204 @@
+import base64
+import io
+import shutil
+import tempfile
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from PIL import Image
+from django.core.management import call_command
+from scrapbook.images import ingest_image, make_lqip, process_image
+from scrapbook.models import Post, Scrapbook
+from scrapbook.uploads import validate_image
+
+
+def make_upload(name, img, image_format, **options):
+    output = io.BytesIO()
+    img.save(output, format=image_format, **options)
+    return SimpleUploadedFile(name, output.getvalue())
+
+
+class IngestImageTest(TestCase):
+    """
+    Tests for the image ingest stage that downscales and re-encodes
+    uploaded photos.
+    """
+    def test_downscales_to_max_edge(self):
+        # Test that a large photo is resized to the configured longest edge
+        upload = make_upload(
+            'photo.jpg', Image.new('RGB', (4000, 3000), 'blue'), 'JPEG')
+        result = ingest_image(upload, max_edge=1000)
+        self.assertEqual(result.name, 'photo.webp')
+        self.assertEqual(result.content_type, 'image/webp')
+        with Image.open(result) as img:
+            self.assertEqual(img.format, 'WEBP')
+            self.assertEqual(img.size, (1000, 750))
+
+    def test_strips_exif_and_applies_orientation(self):
+        # Test that EXIF is removed after rotating the photo upright
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Rotated 90 degrees clockwise
+        exif[0x010F] = 'Test Camera'
+        upload = make_upload(
+            'photo.jpg', Image.new('RGB', (400, 200), 'green'), 'JPEG',
+            exif=exif)
+        result = ingest_image(upload, image_format='JPEG')
+        with Image.open(result) as img:
+            self.assertEqual(img.size, (200, 400))
+            self.assertEqual(len(img.getexif()), 0)
+
+    def test_flattens_transparency_for_jpeg(self):
+        # Test that a transparent PNG is flattened when encoding to JPEG
+        upload = make_upload(
+            'logo.png', Image.new('RGBA', (50, 50), (255, 0, 0, 0)), 'PNG')
+        result = ingest_image(upload, image_format='JPEG')
+        with Image.open(result) as img:
+            self.assertEqual(img.mode, 'RGB')
+            self.assertEqual(img.getpixel((0, 0)), (255, 255, 255))
+
+    def test_heic_photo_is_accepted(self):
+        # Test that an iPhone HEIC photo passes validation and is
+        # re-encoded like any other photo
+        upload = make_upload(
+            'photo.heic', Image.new('RGB', (64, 48), 'red'), 'HEIF')
+        validate_image(upload)
+        result = ingest_image(upload)
+        self.assertEqual(result.name, 'photo.webp')
+        with Image.open(result) as img:
+            self.assertEqual(img.format, 'WEBP')
+            self.assertEqual(img.size, (64, 48))
+
+    def test_gif_is_unchanged(self):
+        # Test that GIFs are stored as uploaded to keep any animation
+        upload = make_upload(
+            'anim.gif', Image.new('P', (20, 20)), 'GIF')
+        self.assertIs(ingest_image(upload), upload)
+
+
+class LqipTest(TestCase):
+    """
+    Tests for the low-quality image placeholders.
+    """
+    def test_lqip_is_tiny(self):
+        # Test that the placeholder is a small WebP within the size limit
+        lqip = make_lqip(Image.new('RGB', (4000, 3000), 'blue'))
+        self.assertLess(len(lqip), 1000)
+        data = io.BytesIO(base64.b64decode(lqip.split(',', 1)[1]))
+        with Image.open(data) as img:
+            self.assertEqual(img.format, 'WEBP')
+            self.assertEqual(img.size, (16, 12))
+
+    def test_lqip_flattens_transparency(self):
+        # Test that transparent images get an opaque placeholder
+        lqip = make_lqip(Image.new('RGBA', (100, 100), (0, 0, 0, 0)))
+        data = io.BytesIO(base64.b64decode(lqip.split(',', 1)[1]))
+        with Image.open(data) as img:
+            self.assertEqual(img.mode, 'RGB')
+
+
+class ImageRenditionsTest(TestCase):
+    """
+    Tests for the responsive renditions stored with each uploaded image.
+
+    The setUp method stores images in a temporary local directory and
+    creates a user.
+    """
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(
+            SCRAPBOOK_IMAGE_STORAGE='local', MEDIA_ROOT=media_root,
+            SCRAPBOOK_IMAGE_RENDITIONS={'thumb': 200, 'medium': 600})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = User.objects.create_user(
+            username='user1', password='testpass')
+
+    def test_smaller_widths_only(self):
+        # Test that renditions are only made for widths below the original
+        upload = make_upload(
+            'photo.png', Image.new('RGB', (400, 300), 'red'), 'PNG')
+        size, lqip, renditions = process_image(upload)
+        self.assertEqual(size, (400, 300))
+        self.assertTrue(lqip.startswith('data:image/webp;base64,'))
+        self.assertEqual(list(renditions), ['thumb'])
+        file, width, height = renditions['thumb']
+        self.assertEqual((width, height), (200, 150))
+        with Image.open(file) as img:
+            self.assertEqual(img.format, 'WEBP')
+
+    def test_renditions_are_stored_on_save(self):
+        # Test that saving a new image stores and records its renditions
+        upload = ingest_image(make_upload(
+            'photo.jpg', Image.new('RGB', (1600, 1200), 'blue'), 'JPEG'))
+        scrapbook = Scrapbook.objects.create(
+            title='Photos', author=self.user, image=upload)
+        self.assertEqual(
+            (scrapbook.image_width, scrapbook.image_height), (1600, 1200))
+        renditions = scrapbook.image_renditions
+        self.assertEqual(list(renditions), ['thumb', 'medium'])
+        self.assertEqual(renditions['medium']['width'], 600)
+        self.assertTrue(
+            scrapbook.image.storage.exists(renditions['thumb']['name']))
+
+        # Saving again without a new upload keeps the renditions
+        scrapbook.title = 'Renamed Photos'
+        scrapbook.save()
+        self.assertEqual(scrapbook.image_renditions, renditions)
+
+    def test_image_attrs_renders_srcset(self):
+        # Test that the template tag lists every rendition and lazy loads
+        upload = ingest_image(make_upload(
+            'photo.jpg', Image.new('RGB', (1600, 1200), 'blue'), 'JPEG'))
+        scrapbook = Scrapbook.objects.create(
+            title='Photos', author=self.user, image=upload)
+        html = Template(
+            '{% load scrapbook_tags %}<img {% image_attrs scrapbook %}>'
+        ).render(Context({'scrapbook': scrapbook}))
+        self.assertIn(' 200w, ', html)
+        self.assertIn(' 600w, ', html)
+        self.assertIn(scrapbook.image.url + ' 1600w"', html)
+        self.assertIn('sizes="', html)
+        self.assertIn('width="1600" height="1200"', html)
+        self.assertIn(
+            'style="background-image: url(data:image/webp;base64,', html)
+        self.assertIn('loading="lazy"', html)
+
+    def test_image_attrs_without_renditions(self):
+        # Test that images without renditions fall back to the original
+        scrapbook = Scrapbook.objects.create(title='Empty', author=self.user)
+        html = Template(
+            '{% load scrapbook_tags %}<img {% image_attrs scrapbook %}>'
+        ).render(Context({'scrapbook': scrapbook}))
+        self.assertEqual(
+            html, '<img src="/static/images/placeholder.jpg" '
+            'loading="lazy" decoding="async">')
+
+    def test_backfill_images(self):
+        # Test that the backfill command fills in images stored earlier,
+        # skipping placeholders and rows that are already done
+        upload = ingest_image(make_upload(
+            'photo.jpg', Image.new('RGB', (800, 400), 'blue'), 'JPEG'))
+        scrapbook = Scrapbook.objects.create(
+            title='Photos', author=self.user, image=upload)
+        empty = Scrapbook.objects.create(title='Empty', author=self.user)
+        name = scrapbook.image.storage.save(
+            'images/old.png', ContentFile(make_upload(
+                'old.png', Image.new('RGB', (300, 500), 'red'),
+                'PNG').read()))
+        post = Post.objects.create(
+            title='Old post', author=self.user, scrapbook=scrapbook)
+        Post.objects.filter(id=post.id).update(image=name)
+
+        out = io.StringIO()
+        call_command(
+            'backfill_images', batch_size=1, workers=2, stdout=out)
+        self.assertIn('Backfilled 1 images, 0 failed.', out.getvalue())
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (300, 500))
+        self.assertTrue(post.image_lqip.startswith('data:image/webp'))
+        self.assertEqual(list(post.image_renditions), ['thumb'])
+        empty.refresh_from_db()
+        self.assertIsNone(empty.image_width)
@@ -0,0 +1,183 @@
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from scrapbook import jobs
+from scrapbook.forms import ShareContentForm
+from scrapbook.jobs import (
+    DONE, FAILED, QUEUED, RUNNING, claim_job, enqueue, run_job, run_pending)
+from scrapbook.models import Job, Scrapbook, SharedAccess
+
+
+@override_settings(SCRAPBOOK_JOBS_EAGER=False, SCRAPBOOK_JOB_RETRY_DELAY=10)
+class JobQueueTest(TestCase):
+    """
+    Tests for the database-backed job queue.
+
+    The setUp method registers a task that records its calls and fails
+    while self.failures is positive.
+    """
+    def setUp(self):
+        self.calls = []
+        self.failures = 0
+
+        def record(job):
+            self.calls.append(job.payload)
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError('boom')
+
+        jobs.task('test_record', max_attempts=2)(record)
+        self.addCleanup(jobs.TASKS.pop, 'test_record')
+
+    def test_enqueue_does_not_run(self):
+        # Test that a queued job waits for a worker
+        job = enqueue('test_record', value=1)
+        self.assertEqual(job.status, QUEUED)
+        self.assertEqual(self.calls, [])
+
+    def test_worker_runs_due_jobs_in_order(self):
+        # Test that jobs run oldest first and are marked done
+        first = enqueue('test_record', value=1)
+        enqueue('test_record', value=2)
+        self.assertEqual(run_pending(), 2)
+        self.assertEqual(self.calls, [{'value': 1}, {'value': 2}])
+        first.refresh_from_db()
+        self.assertEqual(first.status, DONE)
+        self.assertEqual(first.attempts, 1)
+
+    def test_claimed_job_is_not_claimed_again(self):
+        # Test that a running job is not handed to a second worker
+        enqueue('test_record')
+        self.assertEqual(claim_job('worker-1').status, RUNNING)
+        self.assertIsNone(claim_job('worker-2'))
+
+    def test_stale_job_is_claimed_again(self):
+        # Test that a job whose worker died is picked up after the timeout
+        job = enqueue('test_record')
+        claim_job('worker-1')
+        Job.objects.filter(id=job.id).update(
+            locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(claim_job('worker-2').locked_by, 'worker-2')
+
+    def test_failed_job_is_retried_then_fails(self):
+        # Test that a failure is retried after a delay, up to max_attempts
+        self.failures = 2
+        job = enqueue('test_record')
+        run_job(claim_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, QUEUED)
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIsNone(claim_job())
+
+        Job.objects.filter(id=job.id).update(run_after=timezone.now())
+        run_job(claim_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_run_jobs_command(self):
+        # Test that the worker command drains the queue and exits
+        enqueue('test_record')
+        out = io.StringIO()
+        call_command('run_jobs', once=True, stdout=out)
+        self.assertIn('Ran 1 jobs.', out.getvalue())
+
+    def test_share_form_queues_job(self):
+        # Test that sharing is done by the worker, not the request
+        author = User.objects.create_user(username='author', password='x')
+        reader = User.objects.create_user(username='reader', password='x')
+        scrapbook = Scrapbook.objects.create(title='Trip', author=author)
+        form = ShareContentForm(data={
+            'user': reader.id, 'scrapbook_id': scrapbook.id,
+        }, shared_by=author, scrapbook=scrapbook)
+        self.assertTrue(form.is_valid())
+        form.save()
+        self.assertFalse(SharedAccess.objects.exists())
+        run_pending()
+        self.assertTrue(SharedAccess.objects.filter(
+            user=reader, scrapbook=scrapbook, post__isnull=True).exists())
+
+
+class StoreImageJobTest(TestCase):
+    """
+    Tests for storing uploaded images in a background job.
+    """
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(
+            SCRAPBOOK_IMAGE_STORAGE='local', MEDIA_ROOT=media_root,
+            SCRAPBOOK_JOBS_EAGER=False)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = User.objects.create_user(
+            username='user1', password='testpass')
+        self.client.login(username='user1', password='testpass')
+
+    def upload(self, color):
+        output = io.BytesIO()
+        Image.new('RGB', (64, 48), color).save(output, format='PNG')
+        output.seek(0)
+        output.name = 'photo.png'
+        return output
+
+    def test_image_is_stored_by_worker(self):
+        # Test that the request saves the scrapbook before its image
+        response = self.client.post(reverse('create-scrapbook'), {
+            'title': 'Photos', 'status': 1, 'image': self.upload('red'),
+        })
+        self.assertEqual(response.status_code, 302)
+        scrapbook = Scrapbook.objects.get(title='Photos')
+        self.assertEqual(scrapbook.image.name, 'placeholder')
+
+        run_pending()
+        scrapbook.refresh_from_db()
+        self.assertTrue(scrapbook.image.name.startswith('images/'))
+        self.assertEqual(
+            (scrapbook.image_width, scrapbook.image_height), (64, 48))
+        self.assertFalse(Job.objects.exclude(status=DONE).exists())
+
+    def test_newer_upload_wins(self):
+        # Test that an older pending image does not replace a newer one
+        scrapbook = Scrapbook.objects.create(title='Photos', author=self.user)
+        for color in ('red', 'blue'):
+            enqueue(
+                'store_image', data=self.upload(color).read(),
+                model='scrapbook.scrapbook', pk=scrapbook.pk,
+                filename=f'{color}.png')
+        run_pending()
+        scrapbook.refresh_from_db()
+        with scrapbook.image.open('rb'), Image.open(scrapbook.image) as img:
+            self.assertEqual(img.convert('RGB').getpixel((0, 0)), (0, 0, 255))
+
+    @override_settings(SCRAPBOOK_IMAGE_RENDITIONS={'thumb': 32})
+    def test_replaced_image_is_deleted(self):
+        # Test that storing a new image deletes the previous one and its
+        # renditions
+        scrapbook = Scrapbook.objects.create(title='Photos', author=self.user)
+        names = []
+        for color in ('red', 'blue'):
+            enqueue(
+                'store_image', data=self.upload(color).read(),
+                model='scrapbook.scrapbook', pk=scrapbook.pk,
+                filename=f'{color}.png')
+            with self.captureOnCommitCallbacks(execute=True):
+                run_pending()
+            scrapbook.refresh_from_db()
+            names.append([scrapbook.image.name] + [
+                rendition['name']
+                for rendition in scrapbook.image_renditions.values()])
+        storage = scrapbook.image.storage
+        self.assertEqual(len(names[0]), 2)
+        for name in names[0]:
+            self.assertFalse(storage.exists(name), name)
+        for name in names[1]:
+            self.assertTrue(storage.exists(name), name)
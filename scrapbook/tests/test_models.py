@@ -1,8 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError
-from django.test import TestCase
-from scrapbook.models import Scrapbook, Post, SharedAccess
+from django.db import (
+    IntegrityError, OperationalError, connection, transaction)
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, resolve, reverse
+from scrapbook.models import (
+    RESERVED_SLUGS, Scrapbook, Post, SharedAccess, is_slug_collision)
 import re
 
 
@@ -77,6 +82,45 @@ class ScrapbookModelTest(TestCase):
             title='Test Scrapbook', author=self.user)
         self.assertNotEqual(scrapbook1.slug, scrapbook2.slug)
 
+    def test_slug_collision_detection(self):
+        # Test that only the model's own slug constraint counts as a slug
+        # collision to retry
+        scrapbook = Scrapbook.objects.create(
+            title='Test Scrapbook', author=self.user)
+        with self.assertRaises(IntegrityError) as caught:
+            with transaction.atomic():
+                Scrapbook.objects.create(
+                    title='Other', slug=scrapbook.slug, author=self.user)
+        self.assertTrue(is_slug_collision(scrapbook, caught.exception))
+        other = IntegrityError(
+            'UNIQUE constraint failed: scrapbook_post.slug')
+        self.assertFalse(is_slug_collision(scrapbook, other))
+
+    def test_scrapbook_reserved_slug(self):
+        # Test that a title matching a route word gets a suffixed slug, so
+        # its detail page is not shadowed by that route
+        scrapbook = Scrapbook.objects.create(title='Search', author=self.user)
+        self.assertTrue(re.match(r'^search-[a-f0-9]{8}$', scrapbook.slug))
+        url = reverse('scrapbook_detail', kwargs={'slug': scrapbook.slug})
+        self.assertEqual(resolve(url).url_name, 'scrapbook_detail')
+
+    def test_reserved_slugs_cover_routes(self):
+        # Test that every fixed path segment that could shadow a scrapbook
+        # slug, or a post slug after it, is reserved
+        words = set()
+        for pattern in get_resolver().url_patterns:
+            route = str(pattern.pattern)
+            if route:
+                words.add(route.split('/')[0])
+                continue
+            for included in pattern.url_patterns:
+                segments = str(included.pattern).split('/')
+                if segments[0].startswith('<'):
+                    segments = segments[1:]
+                if segments[0] and not segments[0].startswith('<'):
+                    words.add(segments[0])
+        self.assertLessEqual(words, RESERVED_SLUGS)
+
     def test_scrapbook_ordering(self):
         # Test the ordering of Scrapbook instances
         scrapbook1 = Scrapbook.objects.create(
@@ -543,3 +587,157 @@ class SharedAccessModelTest(TestCase):
         with self.assertRaises(IntegrityError):
             SharedAccess.objects.create(
                 user=self.user2, scrapbook=self.scrapbook)
+
+
+class QueryIndexTest(TestCase):
+    """
+    Test that the hot queries in the scrapbook views use the composite
+    indexes.
+
+    The plan is read with EXPLAIN QUERY PLAN on SQLite and with EXPLAIN
+    (sequential scans disabled, as the test tables are tiny) on PostgreSQL.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass')
+        self.scrapbook = Scrapbook.objects.create(
+            title='Test Scrapbook', author=self.user, status=2)
+        self.post = Post.objects.create(
+            title='Test Post', author=self.user, scrapbook=self.scrapbook,
+            status=2)
+
+    def query_plan(self, queryset):
+        # Return the database's query plan for the queryset as text
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + sql, params)
+            elif connection.vendor == 'sqlite':
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            else:
+                self.skipTest(f'No query plan check for {connection.vendor}')
+            return '\n'.join(str(row) for row in cursor.fetchall())
+
+    def assertUsesIndex(self, queryset, *index_names):
+        # Assert the plan uses one of the named indexes
+        plan = self.query_plan(queryset)
+        self.assertTrue(
+            any(index_name in plan for index_name in index_names),
+            f'None of {index_names} used in plan:\n{plan}')
+
+    def test_public_feed_uses_status_created_index(self):
+        self.assertUsesIndex(
+            Scrapbook.objects.filter(status=2).order_by('-created_on'),
+            'scrapbook_status_created_idx')
+
+    def test_my_scrapbooks_uses_author_created_index(self):
+        self.assertUsesIndex(
+            Scrapbook.objects.filter(
+                author=self.user).order_by('-created_on'),
+            'scrapbook_author_created_idx')
+
+    def test_scrapbook_posts_use_scrapbook_created_index(self):
+        self.assertUsesIndex(
+            self.scrapbook.posts.all(), 'post_scrapbook_created_idx')
+
+    def test_public_post_count_uses_scrapbook_status_index(self):
+        self.assertUsesIndex(
+            Post.objects.filter(scrapbook=self.scrapbook, status=2),
+            'post_scrapbook_status_idx')
+
+    def test_shared_access_checks_use_unique_index(self):
+        # SQLite names the index of the inline unique constraint itself
+        unique_index = (
+            'unique_shared_access',
+            'sqlite_autoindex_scrapbook_sharedaccess')
+        self.assertUsesIndex(
+            SharedAccess.objects.filter(
+                user=self.user, scrapbook=self.scrapbook),
+            *unique_index)
+        self.assertUsesIndex(
+            SharedAccess.objects.filter(
+                user=self.user, scrapbook=self.scrapbook, post=self.post),
+            *unique_index)
+
+
+class UniqueSlugTest(TestCase):
+    """
+    Test the slug allocation shared by the Scrapbook and Post models.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass')
+
+    def test_slug_is_allocated_without_probing(self):
+        # Test that saving a new scrapbook does not run a SELECT for the slug
+        with CaptureQueriesContext(connection) as queries:
+            Scrapbook.objects.create(title='Test Scrapbook', author=self.user)
+        self.assertFalse(any(
+            query['sql'].startswith('SELECT') for query in queries))
+
+    def test_collision_is_retried_with_suffix(self):
+        # Test that a slug taken between checks is resolved at insert time
+        scrapbook = Scrapbook.objects.create(
+            title='Other Title', author=self.user)
+        Scrapbook.objects.filter(id=scrapbook.id).update(slug='new-title')
+        retried = Scrapbook.objects.create(title='New Title', author=self.user)
+        self.assertTrue(re.match(r'^new-title-[a-f0-9]{8}$', retried.slug))
+
+    def test_long_title_suffix_fits_slug_field(self):
+        # Test that a suffixed slug never exceeds the field's max length
+        title = 'a' * 100
+        Scrapbook.objects.create(title=title, author=self.user)
+        scrapbook = Scrapbook.objects.create(title=title, author=self.user)
+        self.assertEqual(len(scrapbook.slug), 100)
+
+    def test_other_integrity_errors_are_raised(self):
+        # Test that errors unrelated to the slug are not retried
+        with self.assertRaises(IntegrityError):
+            Post.objects.create(title='Test Post', author=self.user)
+
+
+class ConcurrentSlugTest(TransactionTestCase):
+    """
+    Stress test creating many same-titled posts from parallel threads,
+    each with its own database connection, as gunicorn workers would.
+    """
+    workers = 8
+    posts_per_worker = 5
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass')
+        self.scrapbook = Scrapbook.objects.create(
+            title='Test Scrapbook', author=self.user)
+
+    def create_posts(self):
+        try:
+            for _ in range(self.posts_per_worker):
+                while True:
+                    try:
+                        Post.objects.create(
+                            title='Same Title', author=self.user,
+                            scrapbook=self.scrapbook)
+                        break
+                    except OperationalError as error:
+                        # SQLite lets one writer in at a time and fails
+                        # the others on a lock upgrade deadlock; a new
+                        # attempt still races the other slugs
+                        if 'locked' not in str(error):
+                            raise
+        finally:
+            connection.close()
+
+    def test_parallel_same_title_posts(self):
+        # Test that every post gets a unique slug without any failing
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                executor.submit(self.create_posts)
+                for _ in range(self.workers)]
+            for future in futures:
+                future.result()
+        slugs = list(Post.objects.values_list('slug', flat=True))
+        self.assertEqual(len(slugs), self.workers * self.posts_per_worker)
+        self.assertEqual(len(set(slugs)), len(slugs))
+        self.assertIn('same-title', slugs)
@@ -0,0 +1,127 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from scrapbook.models import Scrapbook, Post
+
+
+@override_settings(SCRAPBOOK_PAGE_CACHE_TIMEOUT=60)
+class AnonymousPageCacheTest(TestCase):
+    """
+    Tests for the anonymous full-page cache.
+
+    The setUp method clears the cache and creates a public scrapbook with a
+    public post.
+    """
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.author = User.objects.create_user(
+            username='author', password='testpass')
+        self.scrapbook = Scrapbook.objects.create(
+            title='Public Scrapbook', author=self.author, status=2)
+        self.post = Post.objects.create(
+            title='Public Post', author=self.author,
+            scrapbook=self.scrapbook, status=2)
+
+    def test_home_is_served_from_cache(self):
+        # Test that a cached home page is served without any queries
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Public Scrapbook')
+
+    def test_pages_are_cached_separately(self):
+        # Test that each page number has its own cache entry
+        for i in range(6):
+            Scrapbook.objects.create(
+                title=f'Extra Scrapbook {i}', author=self.author, status=2)
+        first = self.client.get(reverse('home'))
+        second = self.client.get(reverse('home') + '?page=2')
+        self.assertNotEqual(first.content, second.content)
+        self.assertContains(second, 'Public Scrapbook')
+
+    def test_validators_and_not_modified(self):
+        # Test that the ETag and Last-Modified headers answer
+        # conditional requests with a 304
+        response = self.client.get(reverse('home'))
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        response = self.client.get(
+            reverse('home'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_edit_invalidates_cache(self):
+        # Test that editing a public scrapbook refreshes the cached pages
+        url = reverse('scrapbook_detail', kwargs={'slug': self.scrapbook.slug})
+        etag = self.client.get(url)['ETag']
+        self.scrapbook.title = 'Edited Scrapbook'
+        self.scrapbook.save()
+        response = self.client.get(url)
+        self.assertContains(response, 'Edited Scrapbook')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_unpublish_invalidates_cache(self):
+        # Test that unpublishing a post removes it from the cached page
+        url = reverse('post_detail', kwargs={
+            'scrapbook_slug': self.scrapbook.slug,
+            'post_slug': self.post.slug})
+        self.assertEqual(self.client.get(url).status_code, 200)
+        post = Post.objects.get(id=self.post.id)
+        post.status = 1
+        post.save()
+        response = self.client.get(url)
+        self.assertNotEqual(response.status_code, 200)
+
+    def test_draft_post_invalidates_cache(self):
+        # Test that adding or deleting a draft post in a public scrapbook
+        # refreshes its cached page, which covers all of its posts
+        url = reverse('scrapbook_detail', kwargs={'slug': self.scrapbook.slug})
+        etag = self.client.get(url)['ETag']
+        draft = Post.objects.create(
+            title='Draft Post', author=self.author,
+            scrapbook=self.scrapbook, status=0)
+        added = self.client.get(url)['ETag']
+        self.assertNotEqual(added, etag)
+        draft.delete()
+        self.assertNotEqual(self.client.get(url)['ETag'], added)
+
+    def test_draft_save_reuses_loaded_scrapbook(self):
+        # Test that saving a draft post checks its loaded scrapbook's status
+        # instead of querying for it
+        scrapbook = Scrapbook.objects.create(
+            title='Private Scrapbook', author=self.author, status=1)
+        draft = Post.objects.create(
+            title='Draft Post', author=self.author,
+            scrapbook=scrapbook, status=0)
+        draft.title = 'Edited Draft'
+        with CaptureQueriesContext(connection) as queries:
+            draft.save()
+        self.assertFalse(any(
+            'FROM "scrapbook_scrapbook"' in query['sql']
+            for query in queries.captured_queries))
+
+    def test_other_query_parameters_share_entry(self):
+        # Test that query parameters other than page and cursor do not
+        # create cache entries of their own
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'), {'utm_source': 'x'})
+        self.assertContains(response, 'Public Scrapbook')
+
+    def test_delete_invalidates_cache(self):
+        # Test that deleting a public scrapbook removes it from the feed
+        self.client.get(reverse('home'))
+        self.scrapbook.delete()
+        response = self.client.get(reverse('home'))
+        self.assertNotContains(response, 'Public Scrapbook')
+
+    def test_authenticated_users_are_not_cached(self):
+        # Test that logged-in users always get a freshly rendered page
+        self.client.get(reverse('home'))
+        self.client.login(username='author', password='testpass')
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Edit <i')
+        self.assertNotIn('ETag', response)
@@ -0,0 +1,129 @@
+import base64
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from scrapbook.models import Scrapbook, Post
+from scrapbook.pagination import CursorPaginator, decode_cursor
+
+
+class CursorPaginatorTest(TestCase):
+    """
+    Tests for the keyset (cursor) paginator.
+
+    The setUp method creates 14 scrapbooks where several share the same
+    created_on value, so the id tie-break is exercised.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='user1', password='testpass')
+        now = timezone.now()
+        for i in range(14):
+            scrapbook = Scrapbook.objects.create(
+                title=f'Scrapbook {i}', author=self.user, status=2)
+            # Give every pair of scrapbooks the same created_on
+            Scrapbook.objects.filter(id=scrapbook.id).update(
+                created_on=now - timedelta(minutes=i // 2))
+        self.expected = list(
+            Scrapbook.objects.order_by('-created_on', '-id'))
+
+    def walk_forward(self, paginator):
+        # Follow next cursors from the first page to the last
+        pages = [paginator.get_page(None)]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        return pages
+
+    def test_pages_cover_all_rows_in_order(self):
+        # Test that walking forward returns every row exactly once
+        paginator = CursorPaginator(Scrapbook.objects.all(), 6)
+        pages = self.walk_forward(paginator)
+        self.assertEqual([len(page) for page in pages], [6, 6, 2])
+        rows = [row for page in pages for row in page]
+        self.assertEqual(rows, self.expected)
+        self.assertFalse(pages[0].has_previous())
+        self.assertTrue(pages[-1].has_previous())
+
+    def test_previous_cursor_returns_previous_page(self):
+        # Test that walking backward returns the same pages
+        paginator = CursorPaginator(Scrapbook.objects.all(), 6)
+        pages = self.walk_forward(paginator)
+        previous = paginator.get_page(pages[2].previous_cursor)
+        self.assertEqual(list(previous), list(pages[1]))
+        first = paginator.get_page(previous.previous_cursor)
+        self.assertEqual(list(first), list(pages[0]))
+        self.assertFalse(first.has_previous())
+
+    def test_no_count_query(self):
+        # Test that a page is fetched with a single query and no COUNT
+        paginator = CursorPaginator(Scrapbook.objects.all(), 6)
+        token = paginator.get_page(None).next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            list(paginator.get_page(token))
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('COUNT', queries[0]['sql'])
+
+    def test_invalid_cursor_returns_first_page(self):
+        # Test that a malformed token falls back to the first page
+        paginator = CursorPaginator(Scrapbook.objects.all(), 6)
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        page = paginator.get_page('not-a-cursor')
+        self.assertEqual(list(page), self.expected[:6])
+
+    def test_out_of_range_cursor_returns_first_page(self):
+        # Test that a well-formed token with a huge id or a naive timestamp
+        # falls back to the first page instead of failing in the database
+        paginator = CursorPaginator(Scrapbook.objects.all(), 6)
+        for raw in ('n|2020-01-01T00:00:00+00:00|99999999999999999999999',
+                    'n|2020-01-01T00:00:00|1'):
+            token = base64.urlsafe_b64encode(raw.encode()).decode()
+            self.assertIsNone(decode_cursor(token))
+            page = paginator.get_page(token)
+            self.assertEqual(list(page), self.expected[:6])
+
+
+class CursorPaginationViewTest(TestCase):
+    """
+    Tests for cursor pagination in the scrapbook and post listings.
+    """
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='user1', password='testpass')
+        for i in range(8):
+            Scrapbook.objects.create(
+                title=f'Scrapbook {i}', author=self.user, status=2)
+        self.scrapbook = Scrapbook.objects.first()
+        for i in range(8):
+            Post.objects.create(
+                title=f'Post {i}', author=self.user,
+                scrapbook=self.scrapbook, status=2)
+
+    def test_home_opt_in_with_cursor_parameter(self):
+        # Test that ?cursor= switches the home feed to cursor pagination
+        response = self.client.get(reverse('home') + '?cursor=')
+        page_obj = response.context['page_obj']
+        self.assertTrue(response.context['cursor_pagination'])
+        self.assertEqual(len(page_obj), 6)
+        self.assertContains(response, f'?cursor={page_obj.next_cursor}')
+        response = self.client.get(
+            reverse('home') + f'?cursor={page_obj.next_cursor}')
+        self.assertEqual(len(response.context['page_obj']), 2)
+
+    def test_offset_pagination_is_default(self):
+        # Test that page numbers are still used unless cursors are enabled
+        response = self.client.get(reverse('home'))
+        self.assertFalse(response.context['cursor_pagination'])
+        self.assertContains(response, '?page=2')
+
+    @override_settings(SCRAPBOOK_CURSOR_PAGINATION=True)
+    def test_detail_view_uses_cursor_setting(self):
+        # Test that the setting enables cursors on the post listing
+        response = self.client.get(reverse(
+            'scrapbook_detail', kwargs={'slug': self.scrapbook.slug}))
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), 6)
+        self.assertContains(response, f'?cursor={page_obj.next_cursor}')
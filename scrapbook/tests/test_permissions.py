@@ -0,0 +1,146 @@
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from scrapbook.models import Scrapbook, Post, SharedAccess
+from scrapbook.permissions import get_scrapbook_access
+
+
+class ScrapbookAccessTest(TestCase):
+    """
+    Tests for the scrapbook permission resolver.
+
+    The setUp method creates an author, a reader and an outsider, a private
+    scrapbook shared with the reader, and posts of each status.
+    """
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.author = User.objects.create_user(
+            username='author', password='testpass')
+        self.reader = User.objects.create_user(
+            username='reader', password='testpass')
+        self.outsider = User.objects.create_user(
+            username='outsider', password='testpass')
+        self.scrapbook = Scrapbook.objects.create(
+            title='Private Scrapbook', author=self.author, status=1)
+        self.public_scrapbook = Scrapbook.objects.create(
+            title='Public Scrapbook', author=self.author, status=2)
+        self.private_post = Post.objects.create(
+            title='Private Post', author=self.author,
+            scrapbook=self.scrapbook, status=1)
+        self.public_post = Post.objects.create(
+            title='Public Post', author=self.author,
+            scrapbook=self.scrapbook, status=2)
+        SharedAccess.objects.create(
+            user=self.reader, scrapbook=self.scrapbook,
+            shared_by=self.author)
+
+    def make_request(self, user):
+        request = self.factory.get('/')
+        request.user = user
+        return request
+
+    def test_author_can_view(self):
+        # Test that the author can view their private scrapbook and posts
+        access = get_scrapbook_access(
+            self.make_request(self.author), self.scrapbook)
+        self.assertTrue(access.is_author)
+        self.assertTrue(access.can_view())
+        self.assertTrue(access.can_view_post(self.private_post))
+
+    def test_shared_user_can_view(self):
+        # Test that a user with shared access can view the scrapbook
+        access = get_scrapbook_access(
+            self.make_request(self.reader), self.scrapbook)
+        self.assertFalse(access.is_author)
+        self.assertTrue(access.is_shared)
+        self.assertTrue(access.can_view())
+        self.assertTrue(access.can_view_post(self.private_post))
+
+    def test_outsider_cannot_view_private(self):
+        # Test that an unrelated user only sees public posts
+        access = get_scrapbook_access(
+            self.make_request(self.outsider), self.scrapbook)
+        self.assertFalse(access.can_view())
+        self.assertFalse(access.can_view_post(self.private_post))
+        self.assertTrue(access.can_view_post(self.public_post))
+
+    def test_anonymous_user_issues_no_queries(self):
+        # Test that anonymous access is resolved without a query
+        request = self.make_request(AnonymousUser())
+        with self.assertNumQueries(0):
+            private = get_scrapbook_access(request, self.scrapbook)
+            public = get_scrapbook_access(request, self.public_scrapbook)
+        self.assertFalse(private.can_view())
+        self.assertTrue(public.can_view())
+
+    def test_grant_excludes_drafts(self):
+        # Test that a scrapbook grant does not expose draft posts
+        draft = Post.objects.create(
+            title='Draft Post', author=self.author,
+            scrapbook=self.scrapbook, status=0)
+        access = get_scrapbook_access(
+            self.make_request(self.reader), self.scrapbook)
+        self.assertTrue(access.has_grant)
+        self.assertFalse(access.can_view_post(draft))
+
+    def test_post_exception_without_grant(self):
+        # Test that an individually shared post is visible without a grant
+        draft = Post.objects.create(
+            title='Draft Post', author=self.author,
+            scrapbook=self.scrapbook, status=0)
+        SharedAccess.objects.create(
+            user=self.outsider, scrapbook=self.scrapbook, post=draft,
+            shared_by=self.author)
+        access = get_scrapbook_access(
+            self.make_request(self.outsider), self.scrapbook)
+        self.assertFalse(access.has_grant)
+        self.assertTrue(access.can_view())
+        self.assertTrue(access.can_view_post(draft))
+        self.assertFalse(access.can_view_post(self.private_post))
+
+    def test_shared_post_ids(self):
+        # Test that individually shared posts are reported
+        SharedAccess.objects.create(
+            user=self.reader, scrapbook=self.scrapbook,
+            post=self.private_post, shared_by=self.author)
+        access = get_scrapbook_access(
+            self.make_request(self.reader), self.scrapbook)
+        self.assertEqual(access.shared_post_ids, {self.private_post.id})
+
+    def test_access_is_memoized_on_request(self):
+        # Test that the access set is only resolved once per request
+        request = self.make_request(self.reader)
+        with self.assertNumQueries(1):
+            first = get_scrapbook_access(request, self.scrapbook)
+            second = get_scrapbook_access(request, self.scrapbook)
+        self.assertIs(first, second)
+
+    @override_settings(SCRAPBOOK_ACCESS_CACHE_TIMEOUT=60)
+    def test_cross_request_cache(self):
+        # Test that the cache serves later requests until shares change
+        get_scrapbook_access(self.make_request(self.reader), self.scrapbook)
+        with self.assertNumQueries(0):
+            access = get_scrapbook_access(
+                self.make_request(self.reader), self.scrapbook)
+        self.assertTrue(access.is_shared)
+        SharedAccess.objects.filter(user=self.reader).delete()
+        with self.assertNumQueries(1):
+            access = get_scrapbook_access(
+                self.make_request(self.reader), self.scrapbook)
+        self.assertFalse(access.is_shared)
+
+    def test_detail_view_checks_access_once(self):
+        # Test that the detail view resolves the user's shares only once
+        self.client.login(username='reader', password='testpass')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(
+                'scrapbook_detail', kwargs={'slug': self.scrapbook.slug}))
+        self.assertEqual(response.status_code, 200)
+        shared_access_queries = [
+            query for query in queries
+            if 'scrapbook_sharedaccess' in query['sql']]
+        self.assertEqual(len(shared_access_queries), 1)
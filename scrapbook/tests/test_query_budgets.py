@@ -0,0 +1,125 @@
+from django.contrib.auth.models import User
+from django.test import Client, TestCase
+from django.urls import reverse
+from scrapbook.models import Post, Scrapbook
+from scrapbook.sharing import share_scrapbook
+from scrapbook.tests.query_budget import QueryBudgetMixin
+
+# Most queries each page may run, including the session and user lookups
+QUERY_BUDGETS = {
+    'home': 4,
+    'my_scrapbook_list': 4,
+    'shared_scrapbook_list': 4,
+    'scrapbook_detail': 8,
+    'shared_scrapbook_detail': 7,
+    'post_detail': 4,
+    'share_content': 4,
+    'search': 6,
+    'admin_changelist': 4,
+    'admin_job_changelist': 6,
+}
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    """
+    Tests that the scrapbook pages and admin changelists run a fixed
+    number of queries, whatever the number of rows they show.
+
+    The setUp method creates a user with a public scrapbook and post,
+    and a private scrapbook of another user shared with them.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username='user')
+        self.other = User.objects.create_user(username='other')
+        self.client.force_login(self.user)
+        self.mine = Scrapbook.objects.create(
+            title='Mine', author=self.user, status=2)
+        self.post = Post.objects.create(
+            title='My post', author=self.user, scrapbook=self.mine, status=2)
+        self.theirs = Scrapbook.objects.create(
+            title='Theirs', author=self.other, status=1)
+        self.their_post = Post.objects.create(
+            title='Their post', author=self.other, scrapbook=self.theirs,
+            status=2)
+        share_scrapbook(self.theirs, [self.user], self.other)
+        self.added = 0
+
+    def add_rows(self, n=8):
+        # Add more of everything the pages list: scrapbooks, posts and
+        # shares by several authors
+        for i in range(self.added, self.added + n):
+            author = User.objects.create_user(username=f'author{i}')
+            scrapbook = Scrapbook.objects.create(
+                title=f'Post scrapbook {i}', author=author, status=2)
+            Post.objects.create(
+                title=f'Post {i}', author=author, scrapbook=scrapbook,
+                status=2)
+            Scrapbook.objects.create(
+                title=f'My scrapbook {i}', author=self.user, status=i % 3)
+            Post.objects.create(
+                title=f'My post {i}', author=self.user, scrapbook=self.mine,
+                status=i % 3)
+            Post.objects.create(
+                title=f'Their post {i}', author=self.other,
+                scrapbook=self.theirs, status=2)
+            share_scrapbook(scrapbook, [self.user], author)
+            share_scrapbook(self.mine, [author], self.user)
+        self.added += n
+
+    def test_list_pages(self):
+        # Test the home, my scrapbooks and shared scrapbooks lists
+        for name in ('home', 'my_scrapbook_list', 'shared_scrapbook_list'):
+            with self.subTest(name):
+                self.assertQueryBudget(
+                    reverse(name), QUERY_BUDGETS[name], self.add_rows)
+
+    def test_scrapbook_detail(self):
+        # Test the detail page as the author and as a shared user
+        for scrapbook in (self.mine, self.theirs):
+            with self.subTest(scrapbook.title):
+                self.assertQueryBudget(
+                    reverse('scrapbook_detail', args=[scrapbook.slug]),
+                    QUERY_BUDGETS['scrapbook_detail'], self.add_rows)
+
+    def test_shared_scrapbook_detail(self):
+        # Test the shared detail page
+        self.assertQueryBudget(
+            reverse('shared_scrapbook_detail', args=[self.theirs.slug]),
+            QUERY_BUDGETS['shared_scrapbook_detail'], self.add_rows)
+
+    def test_post_detail(self):
+        # Test the post detail page of an own and a shared post
+        for post in (self.post, self.their_post):
+            with self.subTest(post.title):
+                self.assertQueryBudget(
+                    reverse(
+                        'post_detail', args=[post.scrapbook.slug, post.slug]),
+                    QUERY_BUDGETS['post_detail'], self.add_rows)
+
+    def test_share_page(self):
+        # Test the share form of a scrapbook with many posts and shares
+        self.assertQueryBudget(
+            reverse('share_content'), QUERY_BUDGETS['share_content'],
+            self.add_rows, data={'scrapbook_id': self.mine.id})
+
+    def test_search(self):
+        # Test the search results page, with scrapbooks and posts found
+        Scrapbook.objects.create(
+            title='Post cards', author=self.user, status=2)
+        self.assertQueryBudget(
+            reverse('search'), QUERY_BUDGETS['search'], self.add_rows,
+            data={'q': 'post'})
+
+    def test_admin_changelists(self):
+        # Test the admin changelists of every scrapbook model
+        admin = User.objects.create_superuser(username='admin')
+        client = Client()
+        client.force_login(admin)
+        for model in ('scrapbook', 'post', 'sharedaccess', 'job'):
+            budget = QUERY_BUDGETS[
+                'admin_job_changelist' if model == 'job'
+                else 'admin_changelist']
+            with self.subTest(model):
+                self.assertQueryBudget(
+                    reverse(f'admin:scrapbook_{model}_changelist'), budget,
+                    self.add_rows, client=client)
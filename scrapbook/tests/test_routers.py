@@ -0,0 +1,136 @@
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.db import connections
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, TestCase, TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from scrapbook.models import Job, Scrapbook
+from scrapbook.routers import (
+    PIN_COOKIE, ReplicaRoutingMiddleware, replica_reads)
+
+
+@override_settings(SCRAPBOOK_REPLICAS=['replica'])
+class ReplicaRouterTest(TestCase):
+    """
+    Tests for the read replica router and its middleware.
+
+    Each test runs a view function through ReplicaRoutingMiddleware and
+    records the database its reads would use.
+    """
+    def route(self, view, method='get', cookies=None):
+        # Run view inside the middleware and return the response
+        request = getattr(RequestFactory(), method)('/')
+        request.COOKIES.update(cookies or {})
+        return ReplicaRoutingMiddleware(view)(request)
+
+    def test_safe_reads_use_replica(self):
+        # Test that scrapbook reads inside replica_reads use the replica
+        def view(request):
+            with replica_reads():
+                self.assertEqual(Scrapbook.objects.all().db, 'replica')
+                self.assertEqual(User.objects.all().db, 'default')
+                self.assertEqual(Job.objects.all().db, 'default')
+            self.assertEqual(Scrapbook.objects.all().db, 'default')
+            return HttpResponse()
+        response = self.route(view)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_read_after_write_uses_primary(self):
+        # Test that a write sends the rest of the request and the client's
+        # next requests to the primary
+        author = User.objects.create_user(username='writer')
+
+        def view(request):
+            with replica_reads():
+                Scrapbook.objects.create(title='Written', author=author)
+                self.assertEqual(Scrapbook.objects.all().db, 'default')
+            return HttpResponse()
+        response = self.route(view)
+        pin = response.cookies[PIN_COOKIE]
+        self.assertEqual(pin['max-age'], 10)
+
+        def pinned_view(request):
+            with replica_reads():
+                self.assertEqual(Scrapbook.objects.all().db, 'default')
+            return HttpResponse()
+        self.route(pinned_view, cookies={PIN_COOKIE: pin.value})
+
+    def test_other_writes_do_not_pin(self):
+        # Test that writing a user or session, as a login does, keeps the
+        # client on the replica
+        def view(request):
+            with replica_reads():
+                user = User.objects.create_user(username='visitor')
+                user.save(update_fields=['last_login'])
+                Session.objects.create(
+                    session_key='key', session_data='',
+                    expire_date=timezone.now())
+                self.assertEqual(Scrapbook.objects.all().db, 'replica')
+            return HttpResponse()
+        response = self.route(view)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_unsafe_methods_pin_client(self):
+        # Test that a POST pins the client even if nothing was written
+        response = self.route(lambda request: HttpResponse(), method='post')
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_expired_pin_uses_replica(self):
+        # Test that an expired or malformed pin is ignored
+        def view(request):
+            with replica_reads():
+                self.assertEqual(Scrapbook.objects.all().db, 'replica')
+            return HttpResponse()
+        self.route(view, cookies={PIN_COOKIE: '1'})
+        self.route(view, cookies={PIN_COOKIE: 'soon'})
+
+    @override_settings(SCRAPBOOK_REPLICAS=[])
+    def test_no_replicas(self):
+        # Test that all reads use the primary without replicas
+        def view(request):
+            with replica_reads():
+                self.assertEqual(Scrapbook.objects.all().db, 'default')
+            return HttpResponse()
+        self.route(view)
+
+
+@override_settings(SCRAPBOOK_REPLICAS=['replica'])
+class ReplicaViewTest(TransactionTestCase):
+    """
+    Tests that the read views query the replica, which is a test mirror
+    of the default database.
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        author = User.objects.create_user(username='author')
+        self.scrapbook = Scrapbook.objects.create(
+            title='Replicated', author=author, status=2)
+
+    def test_views_read_from_replica(self):
+        # Test that list and detail pages read scrapbooks from the replica
+        for url in (reverse('home'), reverse(
+                'scrapbook_detail', args=[self.scrapbook.slug])):
+            with self.subTest(url):
+                with CaptureQueriesContext(connections['replica']) as reads:
+                    response = self.client.get(url)
+                self.assertContains(response, 'Replicated')
+                self.assertTrue(any(
+                    'scrapbook_scrapbook' in query['sql']
+                    for query in reads.captured_queries))
+
+    def test_writes_go_to_primary(self):
+        # Test that a form post writes to the primary and pins the client
+        self.client.force_login(self.scrapbook.author)
+        with CaptureQueriesContext(connections['replica']) as reads:
+            response = self.client.post(reverse('delete-scrapbook', kwargs={
+                'slug': self.scrapbook.slug,
+                'scrapbook_id': self.scrapbook.id}))
+            self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Scrapbook.objects.exists())
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(reads.captured_queries, [])
@@ -0,0 +1,99 @@
+from django.contrib.auth.models import AnonymousUser, User
+from django.test import TestCase
+from django.urls import reverse
+from scrapbook.models import Post, Scrapbook
+from scrapbook.search import load_results, search
+from scrapbook.sharing import share_scrapbook
+
+
+class SearchTest(TestCase):
+    """
+    Tests for the full-text search of scrapbooks and posts.
+
+    The setUp method creates a public scrapbook with a public and a draft
+    post, and a private scrapbook with a private post.
+    """
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='author', password='testpass')
+        self.reader = User.objects.create_user(
+            username='reader', password='testpass')
+        self.public = Scrapbook.objects.create(
+            title='Lighthouse walks', content='<p>Coastal paths</p>',
+            author=self.author, status=2)
+        self.public_post = Post.objects.create(
+            title='Harbour', content='<p>We saw the lighthouse at dusk</p>',
+            author=self.author, scrapbook=self.public, status=2)
+        self.draft_post = Post.objects.create(
+            title='Lighthouse draft', author=self.author,
+            scrapbook=self.public, status=0)
+        self.private = Scrapbook.objects.create(
+            title='Family lighthouse', author=self.author, status=1)
+        self.private_post = Post.objects.create(
+            title='Grandma at the lighthouse', author=self.author,
+            scrapbook=self.private, status=1)
+
+    def results(self, user, text):
+        return load_results(search(user, text))
+
+    def test_anonymous_sees_public_only(self):
+        # Test that anonymous visitors only find public content
+        self.assertCountEqual(
+            self.results(AnonymousUser(), 'lighthouse'),
+            [self.public, self.public_post])
+
+    def test_author_sees_everything(self):
+        # Test that authors find their private and draft content
+        self.assertCountEqual(
+            self.results(self.author, 'lighthouse'),
+            [self.public, self.public_post, self.draft_post, self.private,
+             self.private_post])
+
+    def test_shared_user_sees_shared_content(self):
+        # Test that a scrapbook grant makes its non-draft posts searchable
+        share_scrapbook(self.private, [self.reader], self.author)
+        self.assertCountEqual(
+            self.results(self.reader, 'lighthouse'),
+            [self.public, self.public_post, self.private, self.private_post])
+
+    def test_title_matches_rank_first(self):
+        # Test that a title match outranks a content match
+        results = self.results(AnonymousUser(), 'lighthouse')
+        self.assertEqual(results[0], self.public)
+
+    def test_index_follows_updates_and_deletes(self):
+        # Test that edits and deletions are reflected in the index
+        self.public_post.content = 'A windmill instead'
+        self.public_post.save()
+        Post.objects.filter(id=self.draft_post.id).update(title='Sunset')
+        self.assertEqual(
+            self.results(self.author, 'windmill'), [self.public_post])
+        self.assertEqual(self.results(self.author, 'sunset'), [
+            Post.objects.get(id=self.draft_post.id)])
+        self.public.delete()
+        self.assertEqual(self.results(self.author, 'windmill'), [])
+
+    def test_query_syntax_is_literal(self):
+        # Test that search operators in the query cannot break the query
+        self.assertEqual(self.results(AnonymousUser(), 'light" OR *'), [])
+        self.assertEqual(self.results(AnonymousUser(), '   '), [])
+
+    def test_search_view(self):
+        # Test the search page lists results and keeps the query when paging
+        for i in range(12):
+            Post.objects.create(
+                title=f'Lighthouse {i}', author=self.author,
+                scrapbook=self.public, status=2)
+        response = self.client.get(reverse('search'), {'q': 'lighthouse'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'scrapbook/search.html')
+        self.assertEqual(len(response.context['results']), 12)
+        self.assertContains(response, '14 results')
+        self.assertContains(response, '?q=lighthouse&page=2')
+
+    def test_null_character_in_query(self):
+        # Test that a query containing a NUL character is treated as empty
+        for query in ('\x00', 'light\x00house'):
+            response = self.client.get(reverse('search'), {'q': query})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context['query'], '')
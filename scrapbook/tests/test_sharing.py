@@ -0,0 +1,157 @@
+from importlib import import_module
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.test import TestCase, Client
+from django.urls import reverse
+from scrapbook.models import Scrapbook, Post, SharedAccess
+from scrapbook.sharing import share_scrapbook
+
+collapse_post_grants = import_module(
+    'scrapbook.migrations.0015_scrapbook_level_grants').collapse_post_grants
+
+
+class ShareScrapbookTest(TestCase):
+    """
+    Tests for the bulk sharing service.
+
+    The setUp method creates an author, three recipients and a scrapbook
+    with draft, private and public posts.
+    """
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='author', password='testpass')
+        self.recipients = [
+            User.objects.create_user(
+                username=f'recipient{i}', password='testpass')
+            for i in range(3)]
+        self.scrapbook = Scrapbook.objects.create(
+            title='Test Scrapbook', author=self.author)
+        self.posts = [
+            Post.objects.create(
+                title=f'Post {status}', author=self.author,
+                scrapbook=self.scrapbook, status=status)
+            for status in (0, 1, 2)]
+
+    def test_share_with_many_recipients(self):
+        # Test that each recipient gets a single scrapbook-level grant
+        grants = share_scrapbook(
+            self.scrapbook, self.recipients, self.author)
+        self.assertEqual(
+            {grant.user for grant in grants}, set(self.recipients))
+        self.assertEqual(SharedAccess.objects.count(), 3)
+        self.assertFalse(SharedAccess.objects.filter(
+            post__isnull=False).exists())
+
+    def test_share_is_idempotent(self):
+        # Test that sharing twice does not duplicate any rows
+        share_scrapbook(self.scrapbook, self.recipients, self.author)
+        share_scrapbook(self.scrapbook, self.recipients, self.author)
+        self.assertEqual(SharedAccess.objects.count(), 3)
+
+    def test_query_count_does_not_grow_with_posts(self):
+        # Test that the share is written with a fixed number of queries
+        for i in range(20):
+            Post.objects.create(
+                title=f'Extra Post {i}', author=self.author,
+                scrapbook=self.scrapbook, status=1)
+        with self.assertNumQueries(5):
+            share_scrapbook(self.scrapbook, self.recipients, self.author)
+
+    def test_share_with_no_recipients(self):
+        # Test that sharing with nobody writes nothing
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                share_scrapbook(self.scrapbook, [], self.author), [])
+
+    def test_share_collapses_covered_post_rows(self):
+        # Test that per-post rows covered by the grant are removed while
+        # draft exceptions are kept
+        for post in self.posts:
+            SharedAccess.objects.create(
+                user=self.recipients[0], scrapbook=self.scrapbook,
+                post=post, shared_by=self.author)
+        share_scrapbook(self.scrapbook, self.recipients[:1], self.author)
+        self.assertEqual(
+            set(SharedAccess.objects.values_list('post_id', flat=True)),
+            {None, self.posts[0].id})
+
+    def test_share_content_view_grants_scrapbook(self):
+        # Test that the share view grants the scrapbook and its posts
+        client = Client()
+        client.login(username='author', password='testpass')
+        response = client.post(
+            reverse('share_content') + f'?scrapbook_id={self.scrapbook.id}',
+            {'user': self.recipients[0].id,
+             'scrapbook_id': self.scrapbook.id,
+             'post_id': ''})
+        self.assertEqual(response.status_code, 302)
+        grant = SharedAccess.objects.get(user=self.recipients[0])
+        self.assertIsNone(grant.post)
+        self.assertEqual(grant.shared_by, self.author)
+
+    def test_grant_covers_posts_added_later(self):
+        # Test that posts added after sharing are visible to the recipient
+        share_scrapbook(self.scrapbook, self.recipients[:1], self.author)
+        post = Post.objects.create(
+            title='Later Post', author=self.author,
+            scrapbook=self.scrapbook, status=1)
+        client = Client()
+        client.login(username='recipient0', password='testpass')
+        response = client.get(reverse('post_detail', kwargs={
+            'scrapbook_slug': self.scrapbook.slug, 'post_slug': post.slug}))
+        self.assertEqual(response.status_code, 200)
+        response = client.get(reverse(
+            'shared_scrapbook_detail', kwargs={'slug': self.scrapbook.slug}))
+        self.assertEqual(
+            response.context['shared_posts'],
+            {post.id, self.posts[1].id, self.posts[2].id})
+
+
+class CollapsePostGrantsMigrationTest(TestCase):
+    """
+    Tests for the data migration that collapses per-post shares into
+    scrapbook-level grants.
+    """
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='author', password='testpass')
+        self.reader = User.objects.create_user(
+            username='reader', password='testpass')
+        self.scrapbook = Scrapbook.objects.create(
+            title='Test Scrapbook', author=self.author)
+        self.draft = Post.objects.create(
+            title='Draft Post', author=self.author,
+            scrapbook=self.scrapbook, status=0)
+        self.posts = [
+            Post.objects.create(
+                title=f'Post {i}', author=self.author,
+                scrapbook=self.scrapbook, status=1)
+            for i in range(3)]
+
+    def test_post_rows_collapse_into_grant(self):
+        # Test that fan-out rows become one grant plus draft exceptions
+        for post in self.posts + [self.draft]:
+            SharedAccess.objects.create(
+                user=self.reader, scrapbook=self.scrapbook, post=post,
+                shared_by=self.author)
+        collapse_post_grants(apps, None)
+        self.assertEqual(
+            set(SharedAccess.objects.values_list('post_id', flat=True)),
+            {None, self.draft.id})
+        grant = SharedAccess.objects.get(post__isnull=True)
+        self.assertEqual(grant.user, self.reader)
+        self.assertEqual(grant.shared_by, self.author)
+
+    def test_existing_grant_is_kept(self):
+        # Test that an existing grant is reused rather than duplicated
+        grant = SharedAccess.objects.create(
+            user=self.reader, scrapbook=self.scrapbook,
+            shared_by=self.author)
+        for post in self.posts:
+            SharedAccess.objects.create(
+                user=self.reader, scrapbook=self.scrapbook, post=post,
+                shared_by=self.author)
+        collapse_post_grants(apps, None)
+        self.assertEqual(
+            list(SharedAccess.objects.values_list('id', flat=True)),
+            [grant.id])
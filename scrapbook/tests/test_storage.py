@@ -0,0 +1,85 @@
+import shutil
+import tempfile
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, Client, RequestFactory, override_settings
+from django.urls import reverse
+from scrapbook.models import Post, Scrapbook
+from scrapbook.storage import CloudinaryImageStorage
+from scrapbook.views import serve_image
+
+# A valid 1x1 GIF
+GIF_CONTENT = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xff\xff\xff\x21\xf9\x04\x01\x00\x00\x00\x00\x2c\x00\x00\x00\x00'
+    b'\x01\x00\x01\x00\x00\x02\x02\x4c\x01\x00\x3b'
+)
+
+
+class LocalImageStorageTest(TestCase):
+    """
+    Tests for the local image storage backend.
+
+    The setUp method points MEDIA_ROOT at a temporary directory, selects
+    the local backend and logs in a user.
+    """
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(
+            SCRAPBOOK_IMAGE_STORAGE='local', MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='user1', password='testpass')
+        self.client.login(username='user1', password='testpass')
+
+    def test_upload_and_serve(self):
+        # Test that an uploaded image is stored on disk and served locally
+        response = self.client.post(reverse('create-scrapbook'), {
+            'title': 'Local Scrapbook', 'status': 1,
+            'image': SimpleUploadedFile(
+                'cover.gif', GIF_CONTENT, content_type='image/gif')})
+        self.assertEqual(response.status_code, 302)
+        scrapbook = Scrapbook.objects.get(title='Local Scrapbook')
+        self.assertTrue(scrapbook.image.name.startswith('images/'))
+        self.assertTrue(scrapbook.image.url.startswith('/media/images/'))
+
+        response = serve_image(
+            RequestFactory().get(scrapbook.image.url), scrapbook.image.name)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), GIF_CONTENT)
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_media_route_not_mounted_in_production(self):
+        # Test that MEDIA_URL does not shadow a scrapbook slugged "media"
+        scrapbook = Scrapbook.objects.create(
+            title='Media', slug='media', author=self.user, status=2)
+        post = Post.objects.create(
+            title='Post', author=self.user, scrapbook=scrapbook, status=2)
+        response = self.client.get(f'/media/{post.slug}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['post'], post)
+
+    def test_placeholder_uses_static_image(self):
+        # Test that the default image is served from the static files
+        scrapbook = Scrapbook.objects.create(
+            title='No Image', author=self.user)
+        self.assertEqual(
+            scrapbook.image.url, '/static/images/placeholder.jpg')
+
+
+class CloudinaryImageStorageTest(TestCase):
+    """
+    Tests for the Cloudinary image storage backend.
+    """
+    def test_url_of_existing_image(self):
+        # Test that names stored by CloudinaryField still build their URL
+        url = CloudinaryImageStorage().url('v1712345678/abc123.jpg')
+        self.assertIn('/image/upload/v1712345678/abc123.jpg', url)
+
+    def test_url_of_placeholder(self):
+        # Test that the placeholder keeps its Cloudinary URL
+        url = CloudinaryImageStorage().url('placeholder')
+        self.assertTrue(url.endswith('/image/upload/placeholder'))
@@ -0,0 +1,62 @@
+import json
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from scrapbook.models import Scrapbook
+
+
+@override_settings(SCRAPBOOK_TIMING=True, SCRAPBOOK_TIMING_SAMPLE_RATE=1.0)
+class ServerTimingTest(TestCase):
+    """
+    Tests for the per-request timing middleware.
+
+    The setUp method creates a public scrapbook shown on the home page.
+    """
+    def setUp(self):
+        author = User.objects.create_user(username='author')
+        Scrapbook.objects.create(title='Holiday', author=author, status=2)
+
+    def get_timed(self, url):
+        # Request a page and return the response and its logged timings
+        with self.assertLogs('scrapbook.timing', 'INFO') as logs:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+        fields = json.loads(logs.records[0].getMessage())
+        self.assertEqual(fields['db_queries'], len(queries))
+        return response, fields
+
+    def test_header_and_log_line(self):
+        # Test that the timings are sent in a header and logged
+        response, fields = self.get_timed(reverse('home'))
+        header = response['Server-Timing']
+        self.assertIn(f'db;dur={fields["db_ms"]}', header)
+        self.assertIn(f'desc="{fields["db_queries"]} queries"', header)
+        self.assertIn(f'tpl;dur={fields["template_ms"]}', header)
+        self.assertIn(f'total;dur={fields["total_ms"]}', header)
+        self.assertEqual(fields['path'], '/')
+        self.assertEqual(fields['status'], 200)
+        self.assertGreater(fields['template_ms'], 0)
+        self.assertGreaterEqual(fields['total_ms'], fields['template_ms'])
+
+    def test_card_cache_lookups(self):
+        # Test that card cache misses and hits are counted
+        response, fields = self.get_timed(reverse('home'))
+        self.assertEqual(
+            (fields['cache_hits'], fields['cache_misses']), (0, 1))
+        response, fields = self.get_timed(reverse('home'))
+        self.assertEqual(
+            (fields['cache_hits'], fields['cache_misses']), (1, 0))
+
+    @override_settings(SCRAPBOOK_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_timed(self):
+        # Test that requests outside the sample get no header
+        response = self.client.get(reverse('home'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(SCRAPBOOK_TIMING=False)
+    def test_disabled(self):
+        # Test that the setting turns the timings off
+        response = self.client.get(reverse('home'))
+        self.assertFalse(response.has_header('Server-Timing'))
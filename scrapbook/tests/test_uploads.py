@@ -0,0 +1,145 @@
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopUpload
+from django.forms import ValidationError
+from django.test import TestCase, Client, RequestFactory, override_settings
+from django.urls import reverse
+from scrapbook.models import Scrapbook
+from scrapbook.uploads import (
+    INVALID_IMAGE, ImageUploadHandler, too_large_error, validate_image)
+from scrapbook.views import ScrapbookCreateView
+
+# Upload limit used by the tests, to keep the uploads small
+UPLOAD_LIMIT = 256 * 1024
+
+# A valid 1x1 GIF
+GIF_CONTENT = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xff\xff\xff\x21\xf9\x04\x01\x00\x00\x00\x00\x2c\x00\x00\x00\x00'
+    b'\x01\x00\x01\x00\x00\x02\x02\x4c\x01\x00\x3b'
+)
+
+
+@override_settings(SCRAPBOOK_MAX_UPLOAD_SIZE=UPLOAD_LIMIT)
+class ImageUploadHandlerTest(TestCase):
+    """
+    Tests for the streaming image upload handler.
+    """
+    def setUp(self):
+        self.request = RequestFactory().post('/')
+        self.request.upload_errors = {}
+        self.handler = ImageUploadHandler(self.request)
+        self.handler.new_file('image', 'test.gif', 'image/gif', None)
+
+    def test_accepts_image_chunks(self):
+        # Test that image data is passed on to the next handler
+        self.assertEqual(
+            self.handler.receive_data_chunk(GIF_CONTENT, 0), GIF_CONTENT)
+        self.assertEqual(self.request.upload_errors, {})
+
+    def test_rejects_non_image_header(self):
+        # Test that the first chunk is sniffed for an image signature
+        with self.assertRaises(StopUpload):
+            self.handler.receive_data_chunk(b'%PDF-1.4', 0)
+        self.assertEqual(self.request.upload_errors, {'image': INVALID_IMAGE})
+
+    def test_stops_at_byte_limit(self):
+        # Test that the upload stops as soon as the limit is crossed
+        chunk = GIF_CONTENT.ljust(64 * 1024, b'\0')
+        start = 0
+        with self.assertRaises(StopUpload):
+            while start <= UPLOAD_LIMIT:
+                self.handler.receive_data_chunk(chunk, start)
+                start += len(chunk)
+        self.assertEqual(start, UPLOAD_LIMIT)
+        self.assertEqual(
+            self.request.upload_errors,
+            {'image': too_large_error(UPLOAD_LIMIT)})
+
+
+@override_settings(SCRAPBOOK_MAX_UPLOAD_SIZE=UPLOAD_LIMIT)
+class ValidateImageTest(TestCase):
+    """
+    Tests for the image validator shared by ScrapbookForm and PostForm.
+    """
+    def test_valid_image(self):
+        # Test that a valid image passes
+        validate_image(SimpleUploadedFile('test.gif', GIF_CONTENT))
+
+    def test_truncated_image(self):
+        # Test that an image with a valid header but a broken body fails
+        with self.assertRaisesMessage(ValidationError, INVALID_IMAGE):
+            validate_image(SimpleUploadedFile('test.gif', GIF_CONTENT[:8]))
+
+    def test_too_large(self):
+        # Test that an oversized image fails
+        image = SimpleUploadedFile(
+            'test.gif', GIF_CONTENT + b'\0' * UPLOAD_LIMIT)
+        with self.assertRaisesMessage(
+                ValidationError, too_large_error(UPLOAD_LIMIT)):
+            validate_image(image)
+
+
+@override_settings(SCRAPBOOK_MAX_UPLOAD_SIZE=UPLOAD_LIMIT)
+class ImageUploadViewTest(TestCase):
+    """
+    Tests for the upload handler on the scrapbook and post form views.
+
+    The setUp method creates a user and a scrapbook, and logs the user in.
+    """
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='user1', password='testpass')
+        self.scrapbook = Scrapbook.objects.create(
+            title='Test Scrapbook', author=self.user, status=1)
+        self.client.login(username='user1', password='testpass')
+
+    def test_oversized_upload_is_rejected(self):
+        # Test that an oversized upload is reported on the form
+        image = SimpleUploadedFile(
+            'large.gif', GIF_CONTENT + b'\0' * (2 * UPLOAD_LIMIT),
+            content_type='image/gif')
+        response = self.client.post(reverse('create-scrapbook'), {
+            'title': 'New Scrapbook', 'status': 1, 'image': image})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.context['form'].errors['image'],
+            [too_large_error(UPLOAD_LIMIT)])
+        self.assertFalse(
+            Scrapbook.objects.filter(title='New Scrapbook').exists())
+
+    def test_non_image_upload_is_rejected(self):
+        # Test that a non-image upload is rejected on the post form
+        image = SimpleUploadedFile(
+            'test.pdf', b'%PDF-1.4 not an image',
+            content_type='application/pdf')
+        response = self.client.post(
+            reverse('create-post', kwargs={
+                'scrapbook_slug': self.scrapbook.slug}),
+            {'title': 'New Post', 'status': 1, 'image': image})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.context['form'].errors['image'], [INVALID_IMAGE])
+
+    def test_csrf_is_still_enforced(self):
+        # Test that moving the CSRF check into the view keeps it enforced
+        client = Client(enforce_csrf_checks=True)
+        client.login(username='user1', password='testpass')
+        response = client.post(reverse('create-scrapbook'), {
+            'title': 'New Scrapbook', 'status': 1})
+        self.assertEqual(response.status_code, 403)
+
+    def test_anonymous_upload_is_not_read(self):
+        # Test that an anonymous upload is redirected to the login page
+        # before its body is parsed
+        image = SimpleUploadedFile(
+            'test.gif', GIF_CONTENT, content_type='image/gif')
+        request = RequestFactory().post(reverse('create-scrapbook'), {
+            'title': 'New Scrapbook', 'status': 1, 'image': image})
+        request.user = AnonymousUser()
+        response = ScrapbookCreateView.as_view()(request)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith(settings.LOGIN_URL))
+        self.assertFalse(request._read_started)
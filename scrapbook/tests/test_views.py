@@ -1,6 +1,8 @@
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase, Client
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from scrapbook.models import Scrapbook, Post, SharedAccess
 from scrapbook.forms import ShareContentForm
@@ -486,3 +488,145 @@ class ShareContentViewTest(TestCase):
             })
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "This field is required.")
+
+    def test_share_page_does_not_list_users(self):
+        # Test that the share page renders a typeahead, not every user
+        self.client.login(username='user1', password='testpass')
+        response = self.client.get(
+            reverse('share_content') + f'?scrapbook_id={self.scrapbook.id}')
+        self.assertNotContains(response, '<option')
+        self.assertNotContains(response, 'user2')
+        self.assertContains(response, reverse('recipient_search'))
+
+    @override_settings(SCRAPBOOK_RECIPIENT_LIMIT=2)
+    def test_recipient_search(self):
+        # Test the typeahead matches username prefixes, up to the limit
+        for name in ('user3', 'user4', 'other'):
+            User.objects.create_user(
+                username=name, password='testpass',
+                email=f'{name}@example.com')
+        self.client.login(username='user1', password='testpass')
+        url = reverse('recipient_search')
+        response = self.client.get(url, {'q': 'USER'})
+        self.assertEqual(response.json(), {'results': [
+            {'id': self.user2.id, 'username': 'user2'},
+            {'id': User.objects.get(username='user3').id,
+             'username': 'user3'},
+        ]})
+        # Emails only match queries that contain "@"
+        self.assertEqual(
+            self.client.get(url, {'q': 'oth'}).json()['results'][0][
+                'username'], 'other')
+        self.assertEqual(
+            self.client.get(url, {'q': 'other@ex'}).json()['results'][0][
+                'username'], 'other')
+        self.assertEqual(
+            self.client.get(url, {'q': 'example'}).json(), {'results': []})
+        self.assertEqual(
+            self.client.get(url, {'q': 'u'}).json(), {'results': []})
+        self.assertEqual(
+            self.client.get(url, {'q': 'us\x00'}).json(), {'results': []})
+
+    def test_recipient_search_requires_login(self):
+        # Test that anonymous visitors cannot list users
+        response = self.client.get(reverse('recipient_search'), {'q': 'us'})
+        self.assertEqual(response.status_code, 302)
+
+
+class ScrapbookListQueryTest(TestCase):
+    """
+    Tests for the queries issued by the scrapbook list views.
+
+    The list views should render a page of cards in a fixed number of
+    queries, with the author joined in and the public post count annotated
+    on each scrapbook.
+    """
+    def setUp(self):
+        self.client = Client()
+        self.user1 = User.objects.create_user(
+            username='user1', password='testpass')
+        self.user2 = User.objects.create_user(
+            username='user2', password='testpass')
+
+    def create_scrapbooks(self, count, author, status=2):
+        # Create scrapbooks with one public and one private post each
+        scrapbooks = []
+        for i in range(count):
+            scrapbook = Scrapbook.objects.create(
+                title=f'Scrapbook {author.username} {i}',
+                author=author, status=status)
+            Post.objects.create(
+                title=f'Public Post {i}', author=author,
+                scrapbook=scrapbook, status=2)
+            Post.objects.create(
+                title=f'Private Post {i}', author=author,
+                scrapbook=scrapbook, status=1)
+            scrapbooks.append(scrapbook)
+        return scrapbooks
+
+    def count_queries(self, url):
+        # Return the number of queries issued when rendering the url
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_home_query_count_does_not_grow_with_page_size(self):
+        # Test that a full page costs the same queries as a short page
+        self.create_scrapbooks(1, self.user1)
+        small = self.count_queries(reverse('home'))
+        self.create_scrapbooks(5, self.user2)
+        large = self.count_queries(reverse('home'))
+        self.assertEqual(small, large)
+
+    def test_my_list_query_count_does_not_grow_with_page_size(self):
+        # Test the user's own list renders in a fixed number of queries
+        self.client.login(username='user1', password='testpass')
+        self.create_scrapbooks(1, self.user1, status=1)
+        small = self.count_queries(reverse('my_scrapbook_list'))
+        self.create_scrapbooks(5, self.user1, status=1)
+        large = self.count_queries(reverse('my_scrapbook_list'))
+        self.assertEqual(small, large)
+
+    def test_shared_list_query_count_does_not_grow_with_page_size(self):
+        # Test the shared list renders in a fixed number of queries
+        self.client.login(username='user1', password='testpass')
+        for scrapbook in self.create_scrapbooks(1, self.user2, status=1):
+            SharedAccess.objects.create(
+                user=self.user1, scrapbook=scrapbook, shared_by=self.user2)
+        small = self.count_queries(reverse('shared_scrapbook_list'))
+        for scrapbook in self.create_scrapbooks(5, self.user2, status=1):
+            SharedAccess.objects.create(
+                user=self.user1, scrapbook=scrapbook, shared_by=self.user2)
+        large = self.count_queries(reverse('shared_scrapbook_list'))
+        self.assertEqual(small, large)
+
+    def test_post_count_is_annotated_per_scrapbook(self):
+        # Test that each card carries its own public post count
+        scrapbook1, scrapbook2 = self.create_scrapbooks(2, self.user1)
+        Post.objects.create(
+            title='Another Public Post', author=self.user1,
+            scrapbook=scrapbook1, status=2)
+        response = self.client.get(reverse('home'))
+        counts = {
+            scrapbook.id: scrapbook.post_count
+            for scrapbook in response.context['page_obj']}
+        self.assertEqual(counts, {scrapbook1.id: 2, scrapbook2.id: 1})
+        self.assertContains(response, '2 public posts')
+        self.assertContains(response, '1 public post<')
+
+    def test_shared_list_is_not_duplicated_by_post_shares(self):
+        # Test that per-post shares neither duplicate the scrapbook nor
+        # inflate its post count
+        scrapbook = self.create_scrapbooks(1, self.user2, status=1)[0]
+        SharedAccess.objects.create(
+            user=self.user1, scrapbook=scrapbook, shared_by=self.user2)
+        for post in scrapbook.posts.all():
+            SharedAccess.objects.create(
+                user=self.user1, scrapbook=scrapbook, post=post,
+                shared_by=self.user2)
+        self.client.login(username='user1', password='testpass')
+        response = self.client.get(reverse('shared_scrapbook_list'))
+        page = list(response.context['page_obj'])
+        self.assertEqual(page, [scrapbook])
+        self.assertEqual(page[0].post_count, 1)
@@ -0,0 +1,180 @@
+import json
+import logging
+import random
+import time
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+# Timings of the request being handled, if it was sampled
+_current = ContextVar('scrapbook_request_timing', default=None)
+
+
+class RequestTiming:
+    """
+    The measurements of one request.
+
+    Attributes:
+    queries -- Number of SQL queries run, on all databases.
+    db_time -- Seconds spent running them.
+    template_time -- Seconds spent rendering templates.
+    cache_hits, cache_misses -- Lookups in the card, page and access caches.
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def server_timing(self, total):
+        # The value of the Server-Timing header, durations in milliseconds
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="{self.cache_hits} hits, '
+            f'{self.cache_misses} misses"',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+
+def time_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper counting the queries of the timed request.
+
+    Installed on every connection when it is opened (see scrapbook.signals)
+    rather than per request, because async views run their queries on
+    connections of other threads.
+    """
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.queries += 1
+        timing.db_time += time.perf_counter() - started
+
+
+def record_cache_lookup(hit):
+    """
+    Count a cache lookup of the current request as a hit or a miss.
+
+    Does nothing when the request is not being timed.
+    """
+    timing = _current.get()
+    if timing is not None:
+        if hit:
+            timing.cache_hits += 1
+        else:
+            timing.cache_misses += 1
+
+
+def timing_sampled():
+    # Whether to time this request, see SCRAPBOOK_TIMING
+    if not getattr(settings, 'SCRAPBOOK_TIMING', False):
+        return False
+    return random.random() < getattr(
+        settings, 'SCRAPBOOK_TIMING_SAMPLE_RATE', 1.0)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timing = _current.get()
+        if timing is None:
+            return super().render(context, request)
+        # Templates rendered while another renders are part of its time
+        timing.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timing.template_depth -= 1
+            if not timing.template_depth:
+                timing.template_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, timing each render for
+    ServerTimingMiddleware.
+    """
+    def from_string(self, template_code):
+        return TimedTemplate(
+            super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(
+            super().get_template(template_name).template, self)
+
+
+class ServerTimingMiddleware:
+    """
+    Measure where the time of a request goes.
+
+    Records the number and duration of SQL queries, the template render
+    time, the card, page and access cache hits and misses, and the total
+    time spent in the view and the middleware below this one. They are
+    sent in a Server-Timing header, which browsers show in their developer
+    tools, and logged as a JSON line to the scrapbook.timing logger.
+
+    Enabled by the SCRAPBOOK_TIMING setting, for the fraction of requests
+    given by SCRAPBOOK_TIMING_SAMPLE_RATE. Requests that are not sampled
+    only cost a call to random(). Works under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not timing_sampled():
+            return self.get_response(request)
+
+        timing = RequestTiming()
+        token = _current.set(timing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timing)
+
+    async def __acall__(self, request):
+        if not timing_sampled():
+            return await self.get_response(request)
+
+        timing = RequestTiming()
+        token = _current.set(timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timing)
+
+    def finish(self, request, response, timing):
+        total = time.perf_counter() - timing.started
+        response['Server-Timing'] = timing.server_timing(total)
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'db_queries': timing.queries,
+            'db_ms': round(timing.db_time * 1000, 1),
+            'template_ms': round(timing.template_time * 1000, 1),
+            'cache_hits': timing.cache_hits,
+            'cache_misses': timing.cache_misses,
+        }
+        logger.info(json.dumps(fields), extra={'timing': fields})
+        return response
@@ -0,0 +1,157 @@
+from django import forms
+from django.conf import settings
+from django.db.models.fields.files import FieldFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image
+from .images import HEIF_SUPPORTED
+from .jobs import enqueue
+from .storage import PLACEHOLDER
+
+# Largest image that is stored for a scrapbook or post, after ingest
+MAX_IMAGE_SIZE = 2 * 1024 * 1024  # 2MB
+
+
+def max_upload_size():
+    # Largest upload accepted before the ingest stage downscales it
+    return getattr(settings, 'SCRAPBOOK_MAX_UPLOAD_SIZE', MAX_IMAGE_SIZE)
+
+
+def too_large_error(limit):
+    return (
+        "Image file too large. "
+        f"Size should not exceed {limit / (1024 * 1024):.1f} MB.")
+
+
+IMAGE_TOO_LARGE = too_large_error(MAX_IMAGE_SIZE)
+INVALID_IMAGE = "Upload a valid image or an uncorrupted image."
+
+# Leading bytes of the image formats accepted for upload
+IMAGE_SIGNATURES = (
+    b'\xff\xd8\xff',  # JPEG
+    b'\x89PNG\r\n\x1a\n',  # PNG
+    b'GIF87a', b'GIF89a',  # GIF
+    b'BM',  # BMP
+    b'II*\x00', b'MM\x00*',  # TIFF
+)
+
+# ISO base media brands of HEIF/HEIC photos
+HEIF_BRANDS = (b'heic', b'heix', b'hevc', b'heim', b'heis', b'mif1', b'msf1')
+
+
+def is_image_header(data):
+    # Whether the first bytes of a file look like a supported image
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return True
+    if HEIF_SUPPORTED and data[4:8] == b'ftyp' and data[8:12] in HEIF_BRANDS:
+        return True
+    return data.startswith(IMAGE_SIGNATURES)
+
+
+def validate_image(image):
+    """
+    Validate an uploaded scrapbook or post image.
+
+    Checks the upload size, the file signature and finally that Pillow can
+    parse the whole image. Used by both ScrapbookForm and PostForm,
+    including for uploads that did not pass through ImageUploadHandler.
+
+    Raises a ValidationError if the image is too large or not an image.
+    """
+    limit = max_upload_size()
+    if getattr(image, 'size', 0) > limit:
+        raise forms.ValidationError(too_large_error(limit))
+    try:
+        image.seek(0)
+        valid = is_image_header(image.read(12))
+        if valid:
+            image.seek(0)
+            Image.open(image).verify()
+        image.seek(0)
+    except Exception:
+        valid = False
+    if not valid:
+        raise forms.ValidationError(INVALID_IMAGE)
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """
+    Reject oversized or non-image uploads while they are being received.
+
+    The first chunk of each file is checked for a known image signature,
+    and the upload is stopped as soon as a file grows past the upload limit,
+    without reading the rest of the request body. The reason is recorded
+    in request.upload_errors under the file's field name, for the form to
+    report. Accepted data is passed on to the default handlers unchanged.
+    """
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size or max_upload_size()
+        self.received = 0
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.reject(too_large_error(self.max_size))
+        if start == 0 and not is_image_header(raw_data):
+            self.reject(INVALID_IMAGE)
+        return raw_data
+
+    def file_complete(self, file_size):
+        # Let the next handler build the uploaded file
+        return None
+
+    def reject(self, message):
+        errors = getattr(self.request, 'upload_errors', None)
+        if errors is not None:
+            errors[self.field_name] = message
+        raise StopUpload(connection_reset=True)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ImageUploadMixin:
+    """
+    Install ImageUploadHandler for a view that accepts image uploads.
+
+    Upload handlers can only be changed before the request body is read,
+    which the CSRF middleware would otherwise do, so the CSRF check is run
+    here instead, after the handler is installed. Anonymous requests are
+    passed straight on to the login redirect, without reading the body.
+    Upload errors are passed to the form through the upload_errors keyword
+    argument.
+
+    A valid new image is not stored during the request. The object is
+    saved with its previous image, and a store_image job uploads the new
+    one and builds its renditions, so the request does not wait on the
+    image storage.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        request.upload_errors = {}
+        request.upload_handlers.insert(0, ImageUploadHandler(request))
+        return csrf_protect(super().dispatch)(request, *args, **kwargs)
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['upload_errors'] = self.request.upload_errors
+        return kwargs
+
+    def form_valid(self, form):
+        upload = form.cleaned_data.get('image')
+        if not upload or isinstance(upload, FieldFile):
+            return super().form_valid(form)
+        previous = form.initial.get('image')
+        form.instance.image = getattr(previous, 'name', None) or PLACEHOLDER
+        response = super().form_valid(form)
+        upload.seek(0)
+        enqueue(
+            'store_image', data=upload.read(),
+            model=form.instance._meta.label_lower, pk=form.instance.pk,
+            filename=upload.name)
+        return response
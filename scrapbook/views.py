@@ -3,19 +3,74 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
-from django.core.paginator import Paginator
-from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.db.models import Count, Max, Q
+from django.http import (
+    Http404, HttpResponse, HttpResponseForbidden, JsonResponse)
 from django.shortcuts import render, get_object_or_404, redirect
+from django.conf import settings
 from django.urls import reverse_lazy, reverse
 from django.utils.decorators import method_decorator
+from django.utils.http import urlencode
 from django.views import generic, View
 from django.views.generic.edit import UpdateView, CreateView, DeleteView
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import requires_csrf_token
+from django.views.static import serve
+from .conditional import ConditionalGetMixin
 from .models import Scrapbook, Post, SharedAccess
-from .forms import PostForm, ScrapbookForm, ShareContentForm
+from .page_cache import AnonymousPageCacheMixin
+from .forms import (
+    PostForm, ScrapbookForm, ShareContentForm, search_query)
+from .pagination import (
+    CursorPaginationMixin, cursor_pagination_enabled, paginate)
+from .permissions import get_scrapbook_access
+from .recipients import find_recipients
+from .routers import ReplicaReadMixin
+from .search import load_results, search
+from .uploads import ImageUploadMixin
+
+
+def with_card_data(queryset):
+    """
+    Prepare a scrapbook queryset for rendering as a page of cards.
+
+    The author is joined in so ``{{ scrapbook.author }}`` does not issue a
+    query per card, and each row is annotated with ``post_count``, the
+    number of public posts in that scrapbook.
+    """
+    return queryset.select_related('author').annotate(
+        post_count=Count('posts', filter=Q(posts__status=2)))
 
 
-class ScrapbookListView(generic.ListView):
+def scrapbook_validator(scrapbook, access):
+    """
+    Build the conditional GET validator of a scrapbook detail page.
+
+    Uses a single aggregate query over the scrapbook's posts. The post
+    count is included so that deleting a post also changes the validator.
+    """
+    posts = scrapbook.posts.aggregate(
+        newest=Max('updated_on'), count=Count('id'))
+    last_modified = max(
+        filter(None, (scrapbook.updated_on, posts['newest'])))
+    return (
+        (access.level, scrapbook.updated_on.isoformat(),
+         posts['newest'] and posts['newest'].isoformat(), posts['count']),
+        last_modified)
+
+
+def post_validator(post, access):
+    # Build the conditional GET validator of a post detail page
+    last_modified = max(post.updated_on, post.scrapbook.updated_on)
+    return (
+        (access.level, post.scrapbook.updated_on.isoformat(),
+         post.updated_on.isoformat()),
+        last_modified)
+
+
+class ScrapbookListView(
+        ReplicaReadMixin, AnonymousPageCacheMixin, CursorPaginationMixin,
+        generic.ListView):
     """
     View for displaying all public scrapbooks.
 
@@ -26,9 +81,8 @@ class ScrapbookListView(generic.ListView):
     paginate_by -- The number of scrapbooks displayed per page.
 
     Methods:
-    get_queryset -- Filter scrapbooks to only show public scrapbooks.
-    get_context_data -- Add the number of posts in each scrapbook to the
-    context.
+    get_queryset -- Filter scrapbooks to only show public scrapbooks, with
+    the author and public post count of each scrapbook.
 
     Template:
     scrapbook/index.html
@@ -41,16 +95,11 @@ class ScrapbookListView(generic.ListView):
     def get_queryset(self):
         # Filter scrapbooks to only show public scrapbooks
         queryset = Scrapbook.objects.filter(status=2).order_by('-created_on')
-        return queryset
+        return with_card_data(queryset)
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['post_count'] = Post.objects.filter(
-            scrapbook__in=self.get_queryset(), status=2).count()
-        return context
 
-
-class ScrapbookMyListView(LoginRequiredMixin, generic.ListView):
+class ScrapbookMyListView(
+        LoginRequiredMixin, CursorPaginationMixin, generic.ListView):
     """
     View for displaying the user's scrapbooks.
 
@@ -62,9 +111,8 @@ class ScrapbookMyListView(LoginRequiredMixin, generic.ListView):
     login_url -- The URL to redirect to if the user is not logged in.
 
     Methods:
-    get_queryset -- Filter scrapbooks to only show the user's scrapbooks.
-    get_context_data -- Add the number of posts in each scrapbook to the
-    context.
+    get_queryset -- Filter scrapbooks to only show the user's scrapbooks,
+    with the author and public post count of each scrapbook.
 
     Template:
     scrapbook/scrapbook_mylist.html
@@ -79,16 +127,11 @@ class ScrapbookMyListView(LoginRequiredMixin, generic.ListView):
         # Filter scrapbooks to only show the user's scrapbooks
         queryset = Scrapbook.objects.filter(
             author=self.request.user).order_by('-created_on')
-        return queryset
-
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['post_count'] = Post.objects.filter(
-            scrapbook__in=self.get_queryset(), status=2).count()
-        return context
+        return with_card_data(queryset)
 
 
-class ScrapbookSharedListView(LoginRequiredMixin, generic.ListView):
+class ScrapbookSharedListView(
+        LoginRequiredMixin, CursorPaginationMixin, generic.ListView):
     """
     View for displaying the user's shared scrapbooks.
 
@@ -100,9 +143,8 @@ class ScrapbookSharedListView(LoginRequiredMixin, generic.ListView):
     login_url -- The URL to redirect to if the user is not logged in.
 
     Methods:
-    get_queryset -- Filter scrapbooks to only show the shared scrapbooks.
-    get_context_data -- Add the number of posts in each scrapbook to the
-    context.
+    get_queryset -- Filter scrapbooks to only show the shared scrapbooks,
+    with the author and public post count of each scrapbook.
 
     Template:
     scrapbook/scrapbook_sharedlist.html
@@ -114,19 +156,52 @@ class ScrapbookSharedListView(LoginRequiredMixin, generic.ListView):
     login_url = '/accounts/login/'
 
     def get_queryset(self):
-        # Filter scrapbooks to only show the shared scrapbooks
+        # Filter scrapbooks to only show the shared scrapbooks. A subquery
+        # is used rather than a join so that one scrapbook shared through
+        # several SharedAccess rows is neither duplicated nor over-counted.
         queryset = Scrapbook.objects.filter(
-            sharedaccess__user=self.request.user).distinct()
-        return queryset
+            id__in=SharedAccess.objects.filter(
+                user=self.request.user).values('scrapbook')
+        ).order_by('-created_on')
+        return with_card_data(queryset)
+
+
+class SearchView(generic.ListView):
+    """
+    View for searching the scrapbooks and posts the user may view.
+
+    Attributes:
+    template_name -- The template used to render the view.
+    paginate_by -- The number of results displayed per page.
+
+    Methods:
+    get_queryset -- Search for the ``q`` query parameter, best match first.
+    get_context_data -- Add the scrapbooks and posts of the current page and
+    the query to the context.
+
+    Template:
+    scrapbook/search.html
+    """
+    template_name = 'scrapbook/search.html'
+    paginate_by = 12  # Show 12 results per page
+
+    def get_queryset(self):
+        self.query = search_query(self.request)
+        return search(self.request.user, self.query)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['post_count'] = Post.objects.filter(
-            scrapbook__in=self.get_queryset(), status=2).count()
+        context.update({
+            'query': self.query,
+            'results': load_results(context['page_obj']),
+            'page_query': urlencode({'q': self.query}),
+        })
         return context
 
 
-class ScrapbookDetailView(generic.DetailView):
+class ScrapbookDetailView(
+        ReplicaReadMixin, AnonymousPageCacheMixin, ConditionalGetMixin,
+        generic.DetailView):
     """
     View for displaying a scrapbook and its posts.
 
@@ -135,32 +210,27 @@ class ScrapbookDetailView(generic.DetailView):
     template_name -- The template used to render the view.
 
     Methods:
-    get_object -- Get the scrapbook object.
+    get_object -- Get the scrapbook object and resolve the user's access
+    to it.
     handle_no_permission -- Handle cases where the user does not have
     permission to view the scrapbook.
+    get_validator -- Build the conditional GET validator from the scrapbook,
+    its posts and the user's access.
     get_context_data -- Add the posts in the scrapbook to the context.
 
     Template:
     scrapbook/scrapbook_detail.html
     """
     model = Scrapbook
+    queryset = Scrapbook.objects.select_related('author')
     template_name = 'scrapbook/scrapbook_detail.html'
 
     def get_object(self, queryset=None):
         scrapbook = super().get_object(queryset)
-        user = self.request.user
-        if (
-            scrapbook.status != 2 and
-            (not user.is_authenticated or scrapbook.author != user)
-        ):
-            if (
-                not user.is_authenticated or
-                not SharedAccess.objects.filter(
-                    user=user,
-                    scrapbook=scrapbook).exists()
-            ):
-                raise PermissionDenied(
-                    "You do not have permission to view this scrapbook.")
+        self.access = get_scrapbook_access(self.request, scrapbook)
+        if not self.access.can_view():
+            raise PermissionDenied(
+                "You do not have permission to view this scrapbook.")
         return scrapbook
 
     def handle_no_permission(self):
@@ -169,29 +239,24 @@ class ScrapbookDetailView(generic.DetailView):
         return HttpResponseForbidden(
             "You do not have permission to view this scrapbook.")
 
+    def get_validator(self):
+        return scrapbook_validator(self.object, self.access)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        scrapbook = self.get_object()
+        scrapbook = self.object
         posts = scrapbook.posts.all()
-        paginator = Paginator(posts, 6)  # Show 6 posts per page
-
-        page_number = self.request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+        page_obj = paginate(self.request, posts, 6)  # Show 6 posts per page
         ordering = ["-created_on"]
 
-        # Get shared access for the current user and scrapbook
-        sharedaccess = False
-        if self.request.user.is_authenticated:
-            sharedaccess = SharedAccess.objects.filter(
-                user=self.request.user, scrapbook=scrapbook).exists()
-
         context.update({
             'scrapbook': scrapbook,
             'page_obj': page_obj,
             'posts': page_obj.object_list,
             'is_paginated': page_obj.has_other_pages(),
             'ordering': ordering,
-            'sharedaccess': sharedaccess,
+            'cursor_pagination': cursor_pagination_enabled(self.request),
+            'sharedaccess': self.access.is_shared,
         })
         return context
 
@@ -210,7 +275,7 @@ def handle_post_request(request, scrapbook):
         'scrapbook:scrapbook_detail', kwargs={'slug': scrapbook.slug}))
 
 
-class ScrapbookCreateView(LoginRequiredMixin, CreateView):
+class ScrapbookCreateView(ImageUploadMixin, LoginRequiredMixin, CreateView):
     """
     View for creating a new scrapbook.
 
@@ -248,7 +313,7 @@ class ScrapbookCreateView(LoginRequiredMixin, CreateView):
         return context
 
 
-class ScrapbookUpdateView(LoginRequiredMixin, UpdateView):
+class ScrapbookUpdateView(ImageUploadMixin, LoginRequiredMixin, UpdateView):
     """
     View for updating a scrapbook.
 
@@ -320,7 +385,7 @@ class ScrapbookDeleteView(LoginRequiredMixin, DeleteView):
         return reverse_lazy('my_scrapbook_list')
 
 
-class PostCreateView(LoginRequiredMixin, CreateView):
+class PostCreateView(ImageUploadMixin, LoginRequiredMixin, CreateView):
     """
     View for creating a new post.
 
@@ -368,7 +433,7 @@ class PostCreateView(LoginRequiredMixin, CreateView):
         return context
 
 
-class PostUpdateView(LoginRequiredMixin, UpdateView):
+class PostUpdateView(ImageUploadMixin, LoginRequiredMixin, UpdateView):
     """
     View for updating a post.
 
@@ -460,7 +525,9 @@ class PostDeleteView(LoginRequiredMixin, DeleteView):
                 'slug': self.object.scrapbook.slug})
 
 
-class PostDetailView(generic.DetailView):
+class PostDetailView(
+        ReplicaReadMixin, AnonymousPageCacheMixin, ConditionalGetMixin,
+        generic.DetailView):
     """
     View for displaying a post.
 
@@ -469,9 +536,11 @@ class PostDetailView(generic.DetailView):
     template_name -- The template used to render the view.
 
     Methods:
-    get_object -- Get the post object.
+    get_object -- Get the post object and check the user's access to it.
     handle_no_permission -- Handle cases where the user does not have
     permission to view the post.
+    get_validator -- Build the conditional GET validator from the post, its
+    scrapbook and the user's access.
 
     Template:
     scrapbook/post_detail.html
@@ -483,18 +552,13 @@ class PostDetailView(generic.DetailView):
         scrapbook_slug = self.kwargs['scrapbook_slug']
         post_slug = self.kwargs['post_slug']
         post = get_object_or_404(
-            Post, slug=post_slug, scrapbook__slug=scrapbook_slug)
-        user = self.request.user
-        if post.status != 2 and post.author != user:
-            if (
-                not user.is_authenticated or
-                not SharedAccess.objects.filter(
-                    user=user, scrapbook=post.scrapbook
-                ).exists()
-            ):
-                raise PermissionDenied(
-                    "You do not have permission to view this post."
-                )
+            Post.objects.select_related('scrapbook', 'author'),
+            slug=post_slug, scrapbook__slug=scrapbook_slug)
+        self.access = get_scrapbook_access(self.request, post.scrapbook)
+        if not self.access.can_view_post(post):
+            raise PermissionDenied(
+                "You do not have permission to view this post."
+            )
         return post
 
     def handle_no_permission(self):
@@ -503,6 +567,9 @@ class PostDetailView(generic.DetailView):
         return HttpResponseForbidden(
             "You do not have permission to view this post.")
 
+    def get_validator(self):
+        return post_validator(self.object, self.access)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['scrapbook'] = self.object.scrapbook
@@ -555,9 +622,7 @@ class ShareContentView(View):
             shared_by=request.user,
             scrapbook=scrapbook)
         if form.is_valid():
-            shared_access = form.save(commit=False)
-            shared_access.shared_by = request.user
-            shared_access.save()
+            form.save()
             messages.success(
                 request, "Scrapbook and its posts shared successfully.")
             return redirect('scrapbook_detail', slug=scrapbook.slug)
@@ -572,7 +637,21 @@ class ShareContentView(View):
                 'posts': posts})
 
 
-class ScrapbookSharedDetailView(LoginRequiredMixin, generic.DetailView):
+@login_required
+def recipient_search(request):
+    """
+    Return the users whose username starts with the ``q`` query parameter,
+    as JSON, for the recipient typeahead of the share form.
+
+    Response: {"results": [{"id": 1, "username": "..."}, ...]}
+    """
+    results = find_recipients(request.user, search_query(request))
+    return JsonResponse({'results': results})
+
+
+class ScrapbookSharedDetailView(
+        LoginRequiredMixin, ReplicaReadMixin, ConditionalGetMixin,
+        generic.DetailView):
     """
     View for displaying a shared scrapbook and its posts.
 
@@ -582,27 +661,29 @@ class ScrapbookSharedDetailView(LoginRequiredMixin, generic.DetailView):
     login_url -- The URL to redirect to if the user is not logged in.
 
     Methods:
-    get_object -- Get the scrapbook object.
+    get_object -- Get the scrapbook object and resolve the user's access
+    to it.
     handle_no_permission -- Handle cases where the user does not have
     permission to view the scrapbook.
+    get_validator -- Build the conditional GET validator from the scrapbook,
+    its posts and the user's access.
     get_context_data -- Add the posts in the scrapbook to the context.
 
     Template:
     scrapbook/scrapbook_shareddetail.html
     """
     model = Scrapbook
+    queryset = Scrapbook.objects.select_related('author')
     template_name = 'scrapbook/scrapbook_shareddetail.html'
     login_url = '/accounts/login/'
 
     def get_object(self, queryset=None):
         scrapbook = super().get_object(queryset)
-        if scrapbook.status != 2 and scrapbook.author != self.request.user:
-            if not SharedAccess.objects.filter(
-                user=self.request.user, scrapbook=scrapbook
-            ).exists():
-                raise PermissionDenied(
-                    "You do not have permission to view this scrapbook."
-                )
+        self.access = get_scrapbook_access(self.request, scrapbook)
+        if not self.access.can_view():
+            raise PermissionDenied(
+                "You do not have permission to view this scrapbook."
+            )
         return scrapbook
 
     def handle_no_permission(self):
@@ -611,37 +692,38 @@ class ScrapbookSharedDetailView(LoginRequiredMixin, generic.DetailView):
         return HttpResponseForbidden(
             "You do not have permission to view this scrapbook.")
 
+    def get_validator(self):
+        return scrapbook_validator(self.object, self.access)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        scrapbook = self.get_object()
+        scrapbook = self.object
         posts = scrapbook.posts.exclude(status=0)  # Exclude draft posts
-        paginator = Paginator(posts, 6)  # Show 6 posts per page
-
-        page_number = self.request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+        page_obj = paginate(self.request, posts, 6)  # Show 6 posts per page
         ordering = ["-created_on"]
 
-        # Get shared access for the current user and scrapbook
-        sharedaccess = SharedAccess.objects.filter(
-            user=self.request.user, scrapbook=scrapbook).exists()
-
-        # Get shared posts for the current user and scrapbook
-        shared_posts = SharedAccess.objects.filter(
-            user=self.request.user,
-            scrapbook=scrapbook).values_list('post', flat=True)
-
         context.update({
             'scrapbook': scrapbook,
             'page_obj': page_obj,
             'posts': page_obj.object_list,
             'is_paginated': page_obj.has_other_pages(),
             'ordering': ordering,
-            'sharedaccess': sharedaccess,
-            'shared_posts': shared_posts,
+            'cursor_pagination': cursor_pagination_enabled(self.request),
+            'sharedaccess': self.access.is_shared,
+            'shared_posts': {
+                post.id for post in page_obj.object_list
+                if self.access.is_post_shared(post)},
         })
         return context
 
 
+@cache_control(public=True, max_age=31536000, immutable=True)
+def serve_image(request, path):
+    # Serve a locally stored image during development. Image names are
+    # never reused, so they can be cached indefinitely.
+    return serve(request, path, document_root=settings.MEDIA_ROOT)
+
+
 def custom_permission_denied_view(request, exception):
     # Return a custom 403 error page
     return render(request, '403.html', status=403)
@@ -0,0 +1,18 @@
+// This script applies the admin's autocomplete list filters. Choosing an
+// object reloads the changelist filtered by it, back on the first page.
+'use strict';
+{
+    const $ = django.jQuery;
+    $(document).ready(function() {
+        $('.autocomplete-filter select').on('change', function() {
+            const params = new URLSearchParams(window.location.search);
+            params.delete('p');
+            if (this.value) {
+                params.set(this.name, this.value);
+            } else {
+                params.delete(this.name);
+            }
+            window.location.search = params.toString();
+        });
+    });
+}
@@ -0,0 +1,66 @@
+// This script turns the recipient field of the share form into a typeahead.
+// As the user types, matching usernames are fetched from the server and
+// the chosen user's id is stored in the hidden input that is submitted.
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('.recipient-picker').forEach(function(picker) {
+        const idInput = picker.querySelector('.recipient-id');
+        const searchInput = picker.querySelector('.recipient-search');
+        const results = picker.querySelector('.recipient-results');
+        const minLength = parseInt(picker.dataset.minLength, 10);
+        let timer = null;
+        let controller = null;
+
+        function clearResults() {
+            results.replaceChildren();
+            searchInput.setAttribute('aria-expanded', 'false');
+        }
+
+        function choose(user) {
+            idInput.value = user.id;
+            searchInput.value = user.username;
+            clearResults();
+        }
+
+        function showResults(users) {
+            clearResults();
+            users.forEach(function(user) {
+                const item = document.createElement('li');
+                item.className = 'list-group-item list-group-item-action';
+                item.setAttribute('role', 'option');
+                item.textContent = user.username;
+                item.addEventListener('mousedown', function(event) {
+                    // Choose before the input loses focus
+                    event.preventDefault();
+                    choose(user);
+                });
+                results.appendChild(item);
+            });
+            searchInput.setAttribute('aria-expanded', users.length ? 'true' : 'false');
+        }
+
+        searchInput.addEventListener('input', function() {
+            // Typing invalidates any earlier choice
+            idInput.value = '';
+            clearTimeout(timer);
+            const query = searchInput.value.trim();
+            if (query.length < minLength) {
+                clearResults();
+                return;
+            }
+            // Wait for a pause in typing, and drop any slower earlier request
+            timer = setTimeout(function() {
+                if (controller) {
+                    controller.abort();
+                }
+                controller = new AbortController();
+                const url = picker.dataset.searchUrl + '?q=' + encodeURIComponent(query);
+                fetch(url, {signal: controller.signal, headers: {'Accept': 'application/json'}})
+                    .then(function(response) { return response.json(); })
+                    .then(function(data) { showResults(data.results); })
+                    .catch(function() {});
+            }, 200);
+        });
+
+        searchInput.addEventListener('blur', clearResults);
+    });
+});